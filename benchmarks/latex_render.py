@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+#
+# Microbenchmark of gigaleaf's dataframe renderer against `pandas.DataFrame.to_latex`.
+#
+# Usage:
+#   python benchmarks/latex_render.py --cells 10000 100000 1000000 --columns 10
+#
+# Each table has a mix of integer, float, text and boolean columns, with some missing values and characters that must
+# be escaped. Pass `--floats` to only use float columns, e.g. for large numeric tables. The rendered tables are
+# compared to check that both renderers produce the same output.
+#
+
+from typing import Any, Callable, List, Optional
+import argparse
+import time
+
+import numpy
+import pandas
+
+from gigaleaf.latex import render_dataframe
+
+
+def make_dataframe(rows: int, columns: int, floats: bool = False) -> Any:
+    """Create a dataframe with a mix of column types, or only float columns"""
+    rng = numpy.random.default_rng(0)
+    data = dict()
+    for i in range(columns):
+        kind = 1 if floats else i % 4
+        if kind == 0:
+            data[f"int_{i}"] = rng.integers(-1000000, 1000000, rows)
+        elif kind == 1:
+            values = rng.normal(size=rows)
+            values[::17] = numpy.nan
+            data[f"float_{i}"] = values
+        elif kind == 2:
+            data[f"text_{i}"] = numpy.array(['alpha', 'beta_1', 'R&D', '50%', 'x^2'], dtype=object)[
+                rng.integers(0, 5, rows)]
+        else:
+            data[f"bool_{i}"] = rng.integers(0, 2, rows).astype(bool)
+
+    return pandas.DataFrame(data)
+
+
+def benchmark(render: Callable[[], str], repeats: int) -> float:
+    """Render a table several times and return the best time in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        render()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare gigaleaf's dataframe renderer to DataFrame.to_latex")
+    parser.add_argument('--cells', type=int, nargs='+', default=[10000, 100000, 1000000],
+                        help="number of cells in each table")
+    parser.add_argument('--columns', type=int, default=10, help="number of columns in each table")
+    parser.add_argument('--float-format', default=None, help="format string for floats, e.g. %%.3f")
+    parser.add_argument('--escape', action='store_true', help="escape special LaTeX characters")
+    parser.add_argument('--floats', action='store_true', help="only use float columns")
+    parser.add_argument('--repeats', type=int, default=3, help="runs per table, the best is reported")
+    opts = parser.parse_args(args)
+
+    kwargs = {'float_format': opts.float_format, 'escape': opts.escape}
+    options: List[Any] = ['display.max_colwidth', None]
+    try:
+        # Newer versions of pandas render through Styler, which refuses tables larger than this
+        pandas.get_option('styler.render.max_elements')
+        options += ['styler.render.max_elements', 2 * max(opts.cells) + opts.columns]
+    except KeyError:
+        pass
+
+    print(f"{'cells':>10} {'rows':>10} {'to_latex s':>12} {'gigaleaf s':>12} {'speedup':>8} {'identical':>10}")
+    for cells in opts.cells:
+        rows = max(1, cells // opts.columns)
+        df = make_dataframe(rows, opts.columns, opts.floats)
+
+        with pandas.option_context(*options):
+            pandas_time = benchmark(lambda: df.to_latex(**kwargs), opts.repeats)
+            identical = df.to_latex(**kwargs) == render_dataframe(df, **kwargs)
+        gigaleaf_time = benchmark(lambda: render_dataframe(df, **kwargs), opts.repeats)
+
+        print(f"{rows * opts.columns:>10} {rows:>10} {pandas_time:>12.3f} {gigaleaf_time:>12.3f} "
+              f"{pandas_time / gigaleaf_time:>7.1f}x {str(identical):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+#
+# End-to-end benchmark of linking and syncing, run entirely offline.
+#
+# Usage:
+#   python benchmarks/sync_benchmark.py --images 50 --image-kb 512 --csvs 20 --csv-rows 5000 --dataframes 10
+#   python benchmarks/sync_benchmark.py --compare benchmarks/results/0.1.5.json
+#
+# A synthetic Gigantum Project is generated in a temporary directory, with a local bare git repository standing in
+# for the Overleaf remote, so no credentials or network access are needed. Each run measures:
+#
+#   link      linking every file (cold, nothing cached)
+#   first     the first sync, which copies and renders every file
+#   noop      a sync where nothing changed
+#   partial   a sync after re-writing a fraction of the files (--change-fraction)
+#   unlink    unlinking every file and syncing the removal
+#
+# The whole sequence is repeated (--repeats) on a fresh project and the best time of each phase is kept. Results are
+# written to benchmarks/results/<gigaleaf version>.json, so runs from different versions can be compared with
+# --compare.
+#
+
+from typing import Any, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+import argparse
+import json
+import os
+import platform
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+try:
+    import pandas  # type: ignore
+except ImportError:
+    pandas = None
+
+import gigaleaf
+from gigaleaf import Gigaleaf
+from gigaleaf.gigantum import Gigantum
+
+
+PHASES = ('link', 'first', 'noop', 'partial', 'unlink')
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git(args: List[str], cwd: str) -> str:
+    """Run a git command quietly and return its output"""
+    return subprocess.run(['git'] + args, cwd=cwd, check=True, capture_output=True).stdout.decode()
+
+
+def write_png(filename: str, size_kb: int, seed: int) -> None:
+    """Write a valid RGB PNG of roughly `size_kb` KiB with incompressible pixel data"""
+    width = 256
+    height = max(1, (size_kb * 1024) // (width * 3))
+    raw = b"".join([b"\x00" + os.urandom(width * 3) for _ in range(height)])
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    text = chunk(b"tEXt", b"Comment\x00" + f"synthetic image {seed}".encode())
+    with open(filename, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + text + chunk(b"IDAT", zlib.compress(raw, 1)) +
+                chunk(b"IEND", b""))
+
+
+def write_csv(filename: str, rows: int, seed: int) -> None:
+    """Write a CSV with a header and `rows` rows of numbers"""
+    with open(filename, 'wt') as f:
+        f.write("id,name,value,score\n")
+        for i in range(rows):
+            f.write(f"{i},item_{seed}_{i},{(i * 7919 + seed) % 10007},{((i + seed) * 0.37) % 1:.6f}\n")
+
+
+def write_dataframe(filename: str, rows: int, seed: int) -> None:
+    """Pickle a DataFrame with `rows` rows"""
+    df = pandas.DataFrame({"id": range(rows),
+                           "value": [(i * 7919 + seed) % 10007 for i in range(rows)],
+                           "score": [((i + seed) * 0.37) % 1 for i in range(rows)]})
+    df.to_pickle(filename)
+
+
+class SyntheticProject:
+    """A generated Gigantum Project, with a local bare repository as its Overleaf remote"""
+    def __init__(self, base_dir: str, opts: argparse.Namespace) -> None:
+        self.opts = opts
+        self.root = os.path.join(base_dir, 'project')
+        self.remote = os.path.join(base_dir, 'remote.git')
+        self.output_dir = os.path.join(self.root, 'output')
+        self.files: List[Tuple[str, str]] = list()
+
+        # The Overleaf remote, with an initial commit like a new Overleaf Project
+        seed_dir = os.path.join(base_dir, 'seed')
+        git(['init', '-q', '--bare', self.remote], base_dir)
+        git(['clone', '-q', self.remote, seed_dir], base_dir)
+        with open(os.path.join(seed_dir, 'main.tex'), 'wt') as f:
+            f.write("\\documentclass{article}\n\\begin{document}\n\\end{document}\n")
+        git(['add', 'main.tex'], seed_dir)
+        git(['-c', 'user.name=bench', '-c', 'user.email=bench@example.com', 'commit', '-q', '-m', 'init'], seed_dir)
+        git(['push', '-q', 'origin', 'HEAD'], seed_dir)
+
+        # The Gigantum Project
+        for d in ['.gigantum', 'code', 'output']:
+            os.makedirs(os.path.join(self.root, d))
+        with open(os.path.join(self.root, '.gigantum', 'overleaf.json'), 'wt') as f:
+            json.dump({"overleaf_git_url": self.remote, "gigaleaf_version": gigaleaf.__version__}, f)
+        with open(os.path.join(self.root, '.gitignore'), 'wt') as f:
+            f.write("output/untracked/\n")
+        git(['init', '-q'], self.root)
+        git(['add', '-A'], self.root)
+        git(['-c', 'user.name=bench', '-c', 'user.email=bench@example.com', 'commit', '-q', '-m', 'init'], self.root)
+
+        for i in range(opts.images):
+            self.files.append(('image', f"fig_{i}.png"))
+        for i in range(opts.csvs):
+            self.files.append(('csv', f"table_{i}.csv"))
+        for i in range(opts.dataframes):
+            self.files.append(('dataframe', f"df_{i}.pkl"))
+
+        for i, (kind, name) in enumerate(self.files):
+            self.write(kind, name, seed=i)
+
+    def write(self, kind: str, name: str, seed: int) -> None:
+        """Write (or re-write) one of the linked files"""
+        filename = os.path.join(self.output_dir, name)
+        if kind == 'image':
+            write_png(filename, self.opts.image_kb, seed)
+        elif kind == 'csv':
+            write_csv(filename, self.opts.csv_rows, seed)
+        else:
+            write_dataframe(filename, self.opts.dataframe_rows, seed)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum([os.path.getsize(os.path.join(self.output_dir, name)) for _, name in self.files])
+
+    @contextmanager
+    def activate(self) -> Any:
+        """Point gigaleaf at this project for the duration of the block"""
+        cwd = os.getcwd()
+        Gigantum.set_project_root(self.root)
+        os.chdir(os.path.join(self.root, 'code'))
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+            Gigantum.set_project_root(None)
+
+
+def run_once(opts: argparse.Namespace) -> Tuple[Dict[str, float], Dict[str, Dict[str, float]], int]:
+    """Run every phase on a fresh project
+
+    Returns:
+        the seconds taken by each phase, the sync timings of each phase, and the size of the linked files in bytes
+    """
+    base_dir = tempfile.mkdtemp(prefix='gigaleaf-bench-')
+    try:
+        project = SyntheticProject(base_dir, opts)
+        seconds: Dict[str, float] = dict()
+        timings: Dict[str, Dict[str, float]] = dict()
+        with project.activate():
+            gl = Gigaleaf()
+            gl.trace_hooks = []
+
+            def timed_sync(phase: str) -> None:
+                start = time.perf_counter()
+                report = gl.sync(workers=opts.workers)
+                seconds[phase] = time.perf_counter() - start
+                timings[phase] = report.timings
+
+            start = time.perf_counter()
+            for kind, name in project.files:
+                relative_path = f"../output/{name}"
+                if kind == 'image':
+                    gl.link_image(relative_path)
+                elif kind == 'csv':
+                    gl.link_csv(relative_path)
+                else:
+                    gl.link_dataframe(relative_path, to_latex_kwargs={"index": False})
+            seconds['link'] = time.perf_counter() - start
+
+            timed_sync('first')
+            timed_sync('noop')
+
+            changed = project.files[:max(1, int(len(project.files) * opts.change_fraction))]
+            for i, (kind, name) in enumerate(changed):
+                project.write(kind, name, seed=len(project.files) + i)
+            timed_sync('partial')
+
+            start = time.perf_counter()
+            for kind, name in project.files:
+                relative_path = f"../output/{name}"
+                if kind == 'image':
+                    gl.unlink_image(relative_path)
+                elif kind == 'csv':
+                    gl.unlink_csv(relative_path)
+                else:
+                    gl.unlink_dataframe(relative_path)
+            gl.sync(workers=opts.workers)
+            seconds['unlink'] = time.perf_counter() - start
+
+        return seconds, timings, project.total_bytes
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+def get_revision() -> Optional[str]:
+    """Get the git revision of the gigaleaf source being benchmarked, if it is a git checkout"""
+    try:
+        return git(['rev-parse', '--short', 'HEAD'], os.path.dirname(os.path.abspath(__file__))).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    """Print each phase with its throughput, and the change from the baseline if there is one"""
+    n_files = results['config']['n_files']
+    size_mb = results['total_bytes'] / (1024 * 1024)
+    header = f"{'phase':<10} {'seconds':>10} {'files/s':>10} {'MB/s':>10}"
+    if baseline:
+        header += f" {'baseline':>10} {'change':>8}"
+    print(header)
+
+    for phase in PHASES:
+        seconds = results['phases'][phase]
+        line = f"{phase:<10} {seconds:>10.3f} {n_files / seconds:>10.1f} {size_mb / seconds:>10.1f}"
+        if baseline and phase in baseline['phases']:
+            base = baseline['phases'][phase]
+            line += f" {base:>10.3f} {(seconds - base) / base * 100:>+7.1f}%"
+        print(line)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark linking and syncing against a local git remote")
+    parser.add_argument('--images', type=int, default=20, help="number of linked images")
+    parser.add_argument('--image-kb', type=int, default=256, help="size of each image, in KiB")
+    parser.add_argument('--csvs', type=int, default=20, help="number of linked CSV files")
+    parser.add_argument('--csv-rows', type=int, default=1000, help="rows in each CSV file")
+    parser.add_argument('--dataframes', type=int, default=10 if pandas is not None else 0,
+                        help="number of linked dataframes (requires pandas)")
+    parser.add_argument('--dataframe-rows', type=int, default=1000, help="rows in each dataframe")
+    parser.add_argument('--change-fraction', type=float, default=0.1,
+                        help="fraction of files re-written before the partial sync")
+    parser.add_argument('--workers', type=int, default=None, help="workers passed to sync()")
+    parser.add_argument('--repeats', type=int, default=3, help="runs of the whole sequence, the best is reported")
+    parser.add_argument('--output', default=None,
+                        help="file to write results to (default: benchmarks/results/<version>.json)")
+    parser.add_argument('--compare', default=None, help="results file to compare against")
+    opts = parser.parse_args(args)
+
+    if opts.dataframes and pandas is None:
+        parser.error("--dataframes requires pandas")
+
+    best: Dict[str, float] = dict()
+    best_timings: Dict[str, Dict[str, float]] = dict()
+    total_bytes = 0
+    for _ in range(opts.repeats):
+        seconds, timings, total_bytes = run_once(opts)
+        for phase, value in seconds.items():
+            if value < best.get(phase, float('inf')):
+                best[phase] = value
+                if phase in timings:
+                    best_timings[phase] = timings[phase]
+
+    results = {"version": gigaleaf.__version__,
+               "revision": get_revision(),
+               "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": sys.version.split()[0],
+               "platform": platform.platform(),
+               "config": {"images": opts.images, "image_kb": opts.image_kb, "csvs": opts.csvs,
+                          "csv_rows": opts.csv_rows, "dataframes": opts.dataframes,
+                          "dataframe_rows": opts.dataframe_rows, "change_fraction": opts.change_fraction,
+                          "workers": opts.workers, "repeats": opts.repeats,
+                          "n_files": opts.images + opts.csvs + opts.dataframes},
+               "total_bytes": total_bytes,
+               "phases": best,
+               "timings": best_timings}
+
+    baseline = None
+    if opts.compare:
+        with open(opts.compare, 'rt') as f:
+            baseline = json.load(f)
+        # The number of repeats doesn't change what is measured
+        ignored = {'repeats'}
+        if {k: v for k, v in baseline['config'].items() if k not in ignored} != \
+                {k: v for k, v in results['config'].items() if k not in ignored}:
+            print(f"Warning: {opts.compare} was run with a different configuration")
+
+    print_results(results, baseline)
+
+    output = opts.output or os.path.join(RESULTS_DIR, f"{gigaleaf.__version__}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'wt') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+from typing import Callable, Optional
+from concurrent.futures import Future, CancelledError
+import threading
+
+from gigaleaf.report import SyncReport
+
+
+class SyncFuture:
+    """A handle to a sync that runs in the background
+
+    A sync that has not started yet is cancelled immediately. A running sync is cancelled at the next safe point: after
+    pulling, or after updating linked files but before committing. Files already written to the Overleaf Project are
+    committed by the next sync.
+    """
+    def __init__(self) -> None:
+        self._future: "Future[SyncReport]" = Future()
+        self._cancel_event = threading.Event()
+
+    @property
+    def status(self) -> str:
+        """The status of the sync, one of `pending`, `running`, `cancelled`, `failed` or `done`
+
+        Returns:
+            str
+        """
+        if self._future.cancelled():
+            return 'cancelled'
+        elif self._future.running():
+            return 'running'
+        elif not self._future.done():
+            return 'pending'
+        elif isinstance(self._future.exception(), CancelledError):
+            return 'cancelled'
+        elif self._future.exception() is not None:
+            return 'failed'
+        else:
+            return 'done'
+
+    @property
+    def cancel_requested(self) -> bool:
+        """True if `cancel()` has been called
+
+        Returns:
+            bool
+        """
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> bool:
+        """Method to cancel the sync
+
+        Returns:
+            True if the sync was cancelled or will be cancelled at the next safe point, False if it already finished
+        """
+        if self._future.done():
+            return self.status == 'cancelled'
+
+        self._cancel_event.set()
+        self._future.cancel()
+        return True
+
+    def cancelled(self) -> bool:
+        """True if the sync was cancelled"""
+        return self.status == 'cancelled'
+
+    def done(self) -> bool:
+        """True if the sync finished, failed or was cancelled"""
+        return self._future.done()
+
+    def result(self, timeout: Optional[float] = None) -> SyncReport:
+        """Method to wait for the sync to finish and get its report
+
+        Args:
+            timeout: the maximum number of seconds to wait. Waits forever if omitted.
+
+        Returns:
+            SyncReport
+
+        Raises:
+            concurrent.futures.CancelledError: if the sync was cancelled
+            concurrent.futures.TimeoutError: if the sync did not finish in time
+            ValueError: if the sync failed
+        """
+        return self._future.result(timeout)
+
+    def exception(self, timeout: Optional[float] = None) -> Optional[BaseException]:
+        """Method to wait for the sync to finish and get the exception it raised
+
+        Args:
+            timeout: the maximum number of seconds to wait. Waits forever if omitted.
+
+        Returns:
+            the exception, or None if the sync succeeded
+        """
+        return self._future.exception(timeout)
+
+    def add_done_callback(self, fn: Callable[["SyncFuture"], None]) -> None:
+        """Method to call a function when the sync finishes, with this handle as its only argument
+
+        Args:
+            fn: the function to call
+
+        Returns:
+            None
+        """
+        self._future.add_done_callback(lambda _: fn(self))
+
+    def check_cancelled(self) -> None:
+        """Method called by the sync at each safe point, to stop if cancellation was requested
+
+        Returns:
+            None
+
+        Raises:
+            concurrent.futures.CancelledError
+        """
+        if self._cancel_event.is_set():
+            raise CancelledError("Sync was cancelled")
+
+    def run(self, fn: Callable[["SyncFuture"], SyncReport]) -> None:
+        """Method to run the sync in the calling thread, storing its result or exception in this handle
+
+        Args:
+            fn: the function that runs the sync, called with this handle so it can check for cancellation
+
+        Returns:
+            None
+        """
+        if not self._future.set_running_or_notify_cancel():
+            return
+
+        try:
+            report = fn(self)
+        except BaseException as err:
+            self._future.set_exception(err)
+        else:
+            self._future.set_result(report)
@@ -0,0 +1,157 @@
+from typing import Dict, Any, Optional
+import os
+import json
+import time
+import threading
+
+from gigaleaf.hashing import hash_file, DEFAULT_ALGORITHM, LEGACY_ALGORITHM, DEFAULT_BUFFER_SIZE
+
+
+# Files modified this recently are not cached, because a write within the same mtime tick would go undetected
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+class ChangeCache:
+    """A persistent cache of file content hashes, keyed by the file's size, mtime and inode
+
+    The cache is stored in the untracked Overleaf directory so it is never synced. If a file's size, mtime and inode
+    are unchanged since it was last hashed, the cached hash is returned instead of reading the file again.
+    """
+    def __init__(self, cache_file: str, verify: bool = False) -> None:
+        """Load the cache from disk on instance creation
+
+        Args:
+            cache_file: absolute path to the file the cache is stored in
+            verify: if True, ignore cached entries and re-hash every file (the cache is still updated)
+        """
+        self.cache_file = cache_file
+        self.verify = verify
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Drop the lock when pickled, e.g. when a linked file is sent to a process pool"""
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Re-create the lock when unpickled"""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Method to load the cache from disk
+
+        Returns:
+            dictionary of cache entries keyed by absolute file path
+        """
+        if not os.path.isfile(self.cache_file):
+            return dict()
+
+        try:
+            with open(self.cache_file, 'rt') as cf:
+                data: Dict[str, Any] = json.load(cf)
+        except ValueError:
+            # A corrupt cache is simply rebuilt
+            return dict()
+
+        entries: Dict[str, Dict[str, Any]] = data.get('entries', dict())
+        return entries
+
+    def get_hash(self, filename: str, algorithm: str = DEFAULT_ALGORITHM,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE) -> str:
+        """Method to get the content hash of a file, reading the file only if it has changed
+
+        Args:
+            filename: absolute path to the file
+            algorithm: the name of the hash algorithm to use
+            buffer_size: the number of bytes to read at a time if the file must be hashed
+
+        Returns:
+            hex digest of the file contents
+        """
+        stat = os.stat(filename)
+        content_hash = self.get_cached_hash(filename, stat, algorithm)
+        if content_hash is not None:
+            return content_hash
+
+        content_hash = hash_file(filename, algorithm, buffer_size)
+        self.set_hash(filename, content_hash, stat, algorithm)
+        return content_hash
+
+    def get_cached_hash(self, filename: str, stat: os.stat_result, algorithm: str = DEFAULT_ALGORITHM) -> Optional[str]:
+        """Method to get the cached content hash of a file without reading it
+
+        Args:
+            filename: absolute path to the file
+            stat: the result of `os.stat()` for the file
+            algorithm: the name of the hash algorithm
+
+        Returns:
+            hex digest of the file contents, or None if the file has changed since it was cached, was cached with a
+            different algorithm, or the cache is being verified
+        """
+        if self.verify:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(filename)
+
+        if entry is None or entry.get('algorithm', LEGACY_ALGORITHM) != algorithm:
+            return None
+        elif entry['signature'] == [stat.st_size, stat.st_mtime_ns, stat.st_ino]:
+            return str(entry['hash'])
+        else:
+            return None
+
+    def set_hash(self, filename: str, content_hash: str, stat: Optional[os.stat_result] = None,
+                 algorithm: str = DEFAULT_ALGORITHM) -> None:
+        """Method to record the content hash of a file
+
+        Args:
+            filename: absolute path to the file
+            content_hash: the hash of the file's contents
+            stat: the result of `os.stat()` taken before the file was hashed. If omitted, the file is stat'd now.
+            algorithm: the name of the hash algorithm used to compute `content_hash`
+
+        Returns:
+            None
+        """
+        if stat is None:
+            stat = os.stat(filename)
+
+        with self._lock:
+            if time.time_ns() - stat.st_mtime_ns < RACY_WINDOW_NS:
+                # Too recent to trust, so make sure the next lookup re-hashes it
+                if filename in self._entries:
+                    del self._entries[filename]
+                    self._dirty = True
+                return
+
+            self._entries[filename] = {'signature': [stat.st_size, stat.st_mtime_ns, stat.st_ino],
+                                       'hash': content_hash,
+                                       'algorithm': algorithm}
+            self._dirty = True
+
+    def save(self) -> None:
+        """Method to write the cache to disk if it has changed
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+
+            cache_dir = os.path.dirname(self.cache_file)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+
+            # Write to a temporary file and move into place so an interrupted sync can't corrupt the cache
+            tmp_file = self.cache_file + '.tmp'
+            with open(tmp_file, 'wt') as cf:
+                json.dump({'entries': self._entries}, cf)
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
@@ -0,0 +1,47 @@
+from typing import List, Optional
+import argparse
+
+from gigaleaf.gigaleaf import Gigaleaf
+from gigaleaf.watch import DEFAULT_POLL_INTERVAL
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the `gigaleaf` command, run from inside a Gigantum Project
+
+    Args:
+        argv: command line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser(prog='gigaleaf', description="Link Gigantum Project outputs to an Overleaf Project")
+    parser.add_argument('--project-root', default=None,
+                        help="Path to the Gigantum Project (default: $GIGALEAF_PROJECT_ROOT or /mnt/labbook)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    sync_parser = subparsers.add_parser('sync', help="Sync all linked files with Overleaf once")
+    sync_parser.add_argument('--workers', type=int, default=None,
+                             help="Maximum number of threads used to update linked files")
+    sync_parser.add_argument('--verify', action='store_true', help="Re-hash every linked file")
+
+    watch_parser = subparsers.add_parser('watch', help="Sync linked files with Overleaf whenever they change")
+    watch_parser.add_argument('--debounce', type=float, default=2.0,
+                              help="Seconds without changes to wait before syncing (default: 2)")
+    watch_parser.add_argument('--max-delay', type=float, default=30.0,
+                              help="Maximum seconds to wait before syncing while files keep changing (default: 30)")
+    watch_parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                              help="Seconds between checks when inotify is not available (default: 1)")
+    watch_parser.add_argument('--workers', type=int, default=None,
+                              help="Maximum number of threads used to update linked files")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return
+
+    gigaleaf = Gigaleaf(project_root=args.project_root)
+    if args.command == 'sync':
+        gigaleaf.sync(workers=args.workers, verify=args.verify)
+    elif args.command == 'watch':
+        gigaleaf.watch(debounce=args.debounce, max_delay=args.max_delay, poll_interval=args.poll_interval,
+                       workers=args.workers)
@@ -0,0 +1,217 @@
+from typing import Optional, Dict, Any, Set, List
+import os
+import json
+import threading
+
+from gigaleaf.gigantum import Gigantum
+from gigaleaf.cache import ChangeCache
+from gigaleaf.manifest import Manifest
+from gigaleaf.hashing import resolve_hash_algorithm, DEFAULT_ALGORITHM, DEFAULT_BUFFER_SIZE
+from gigaleaf.imageopt import ImageOptions
+from gigaleaf.datastore import resolve_data_object, remove_object
+
+
+class SyncContext:
+    """Class to hold values that are resolved once per sync and shared by every linked file
+
+    Resolving the Gigantum revision starts a git subprocess, so it is looked up lazily the first time it is needed and
+    then reused for the rest of the sync.
+
+    The context also records every file gigaleaf writes or removes in the Overleaf Project, so only those files need to
+    be staged when committing. Changes that are not committed yet (e.g. from `unlink()` or a failed sync) are persisted
+    in an untracked file until the next commit.
+    """
+    def __init__(self, change_cache: Optional[ChangeCache] = None, hash_algorithm: str = DEFAULT_ALGORITHM,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, image_options: Optional[ImageOptions] = None,
+                 copy_strategy: str = 'auto') -> None:
+        """Resolve paths on instance creation
+
+        Args:
+            change_cache: optional cache used to skip hashing files that have not changed on disk
+            hash_algorithm: the hash algorithm used for new content hashes
+            buffer_size: the number of bytes to read at a time when hashing or copying files
+            image_options: how images are optimized before they are copied. If omitted, images are copied as they are.
+            copy_strategy: how files are copied into the data directory, `auto` to use the cheapest strategy the
+                           filesystem supports, or one of `gigaleaf.transfer.COPY_STRATEGIES`
+        """
+        self.project_root = Gigantum.get_project_root()
+        self.overleaf_root_directory = Gigantum.get_overleaf_root_directory()
+        self.overleaf_repo_directory = os.path.join(self.overleaf_root_directory, 'project')
+        self.data_directory = os.path.join(self.overleaf_repo_directory, 'gigantum', 'data')
+        self.subfiles_directory = os.path.join(self.overleaf_repo_directory, 'gigantum', 'subfiles')
+        # Scratch space for partially written files, outside the Overleaf repository but on the same filesystem
+        self.tmp_directory = os.path.join(self.overleaf_root_directory, 'tmp')
+        # Optimized images, keyed by the content hash of the original
+        self.image_cache_directory = os.path.join(self.overleaf_root_directory, 'image_cache')
+        # Tables rendered to LaTeX, keyed by the content hash of the data
+        self.render_cache_directory = os.path.join(self.overleaf_root_directory, 'render_cache')
+        self.image_options = image_options if image_options is not None else ImageOptions()
+        self.change_cache = change_cache
+        self.hash_algorithm = resolve_hash_algorithm(hash_algorithm)
+        self.buffer_size = buffer_size
+        self.copy_strategy = copy_strategy
+        self.pending_changes_file = os.path.join(self.overleaf_root_directory, 'pending_changes.json')
+
+        self._changes: Set[str] = set()
+        # Data objects that linked files stopped using, removed at the end of the sync if nothing else uses them
+        self._released_data_objects: Set[str] = set()
+        self._revision: Optional[str] = None
+        self._manifest: Optional[Manifest] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Drop the lock, manifest, change cache and recorded changes when pickled, e.g. when a linked file is sent to
+        a process pool
+
+        Linked files sent to another process only render their subfile, so they don't need the (possibly large)
+        manifest or change cache. Files written in another process are recorded by the calling process.
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_manifest'] = None
+        state['change_cache'] = None
+        state['_changes'] = set()
+        state['_released_data_objects'] = set()
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Re-create the lock when unpickled"""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def revision(self) -> str:
+        """The current git revision of the Gigantum Project repository, looked up once per sync
+
+        Returns:
+            str
+        """
+        with self._lock:
+            if self._revision is None:
+                self._revision = Gigantum.get_current_revision()
+            return self._revision
+
+    @property
+    def manifest(self) -> Manifest:
+        """The metadata manifest of the Overleaf Project, loaded once per sync
+
+        Returns:
+            Manifest
+        """
+        with self._lock:
+            if self._manifest is None:
+                self._manifest = Manifest(self.overleaf_repo_directory)
+            return self._manifest
+
+    def record_change(self, filename: str) -> None:
+        """Method to record that a file in the Overleaf Project was written or removed
+
+        Args:
+            filename: absolute path to the file
+
+        Returns:
+            None
+        """
+        relative_path = os.path.relpath(filename, self.overleaf_repo_directory).replace(os.sep, '/')
+        with self._lock:
+            self._changes.add(relative_path)
+
+    def release_data_object(self, data_object: str) -> None:
+        """Method to record that a linked file no longer uses a data object
+
+        Args:
+            data_object: path of the object relative to the data directory
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._released_data_objects.add(data_object)
+
+    def remove_released_data_objects(self) -> List[str]:
+        """Method to remove the released data objects that no linked file in the manifest uses any more
+
+        This is done once all linked files are updated, so an object is never removed while another linked file with
+        the same contents is still being updated.
+
+        Returns:
+            the data objects that were removed
+        """
+        with self._lock:
+            released = set(self._released_data_objects)
+            self._released_data_objects.clear()
+        if not released:
+            return list()
+
+        referenced = {resolve_data_object(data.get('data_object'), data['gigantum_relative_path'])
+                      for _, data in self.manifest}
+        removed = list()
+        for data_object in sorted(released - referenced):
+            if remove_object(self.data_directory, data_object):
+                self.record_change(os.path.join(self.data_directory, data_object))
+                removed.append(data_object)
+        return removed
+
+    def save_manifest(self) -> None:
+        """Method to save the manifest, recording the files it changed
+
+        Returns:
+            None
+        """
+        for filename in self.manifest.save():
+            self.record_change(filename)
+
+    def get_changes(self) -> List[str]:
+        """Method to get every file that has changed but is not committed yet, including those from earlier runs
+
+        Returns:
+            sorted list of paths relative to the root of the Overleaf git repository
+        """
+        changes = set(self._load_pending_changes())
+        with self._lock:
+            changes.update(self._changes)
+        return sorted(changes)
+
+    def _load_pending_changes(self) -> List[str]:
+        """Method to load the changes persisted by `save_changes()`
+
+        Returns:
+            list of paths relative to the root of the Overleaf git repository
+        """
+        if not os.path.isfile(self.pending_changes_file):
+            return list()
+
+        with open(self.pending_changes_file, 'rt') as pf:
+            pending: List[str] = json.load(pf)
+        return pending
+
+    def save_changes(self) -> None:
+        """Method to persist the recorded changes, so they are committed by the next sync if this run does not commit
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if not self._changes:
+                return
+
+        changes = self.get_changes()
+        if not os.path.isdir(self.overleaf_root_directory):
+            os.makedirs(self.overleaf_root_directory)
+
+        tmp_file = self.pending_changes_file + '.tmp'
+        with open(tmp_file, 'wt') as pf:
+            json.dump(changes, pf)
+        os.replace(tmp_file, self.pending_changes_file)
+
+    def clear_changes(self) -> None:
+        """Method to forget all recorded changes, once they have been committed
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._changes.clear()
+
+        if os.path.isfile(self.pending_changes_file):
+            os.remove(self.pending_changes_file)
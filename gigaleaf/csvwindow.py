@@ -0,0 +1,255 @@
+from typing import Any, BinaryIO, Deque, Dict, List, Optional, Tuple
+from collections import deque
+from dataclasses import dataclass, asdict
+import csv
+import hashlib
+import io
+import json
+import random
+
+from gigaleaf import tracing
+from gigaleaf.hashing import new_hasher, DEFAULT_ALGORITHM, DEFAULT_BUFFER_SIZE
+
+
+# CSV files are decoded as UTF-8, passing through any bytes that are not valid UTF-8 unchanged
+CSV_ENCODING = 'utf-8'
+CSV_ERRORS = 'surrogateescape'
+
+# Bump when the output of `write_csv_window()` changes, so trimmed files are regenerated
+WINDOW_VERSION = 2
+
+# Rows are sampled with a fixed seed, so the same file always gives the same sample
+SAMPLE_SEED = 0
+
+
+@dataclass
+class CsvWindow:
+    """Dataclass to store which part of a CSV file is copied into the Overleaf Project
+
+    The header row is always kept. If any of `head`, `tail` or `sample` are set, only the rows they select are kept, in
+    their original order.
+    """
+    # Keep the first rows
+    head: Optional[int] = None
+    # Keep the last rows
+    tail: Optional[int] = None
+    # Keep this many rows picked at random from the rest of the file
+    sample: Optional[int] = None
+    # Keep only these columns, in this order
+    columns: Optional[List[str]] = None
+    # Drop the rows that would make the file larger than this many bytes
+    max_bytes: Optional[int] = None
+
+    @property
+    def key(self) -> Optional[str]:
+        """A short string identifying the window, used to detect when it changes
+
+        Returns:
+            the key, or None if the whole file is copied
+        """
+        settings = {k: v for k, v in asdict(self).items() if v is not None}
+        if not settings:
+            return None
+
+        digest = hashlib.md5(json.dumps(settings, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+        return f"v{WINDOW_VERSION}-{digest[:12]}"
+
+    @property
+    def selects_rows(self) -> bool:
+        """True if only some rows are kept, regardless of the byte budget
+
+        Returns:
+            bool
+        """
+        return self.head is not None or self.tail is not None or self.sample is not None
+
+
+def get_csv_window(head: Optional[int] = None, tail: Optional[int] = None, sample: Optional[int] = None,
+                   columns: Optional[List[str]] = None, max_bytes: Optional[int] = None) -> Optional[CsvWindow]:
+    """Method to create and validate a CSV window
+
+    Args:
+        head: the number of rows to keep from the start of the file
+        tail: the number of rows to keep from the end of the file
+        sample: the number of rows to keep from the rest of the file, picked at random
+        columns: the names of the columns to keep
+        max_bytes: the maximum size of the trimmed file
+
+    Returns:
+        CsvWindow, or None if the whole file is copied
+    """
+    for name, value in [('head', head), ('tail', tail), ('sample', sample)]:
+        if value is not None and value < 0:
+            raise ValueError(f"Invalid {name}: {value}. It must be zero or a positive number.")
+
+    if max_bytes is not None and max_bytes <= 0:
+        raise ValueError(f"Invalid max_bytes: {max_bytes}. It must be a positive number.")
+
+    if columns is not None and len(columns) == 0:
+        raise ValueError("Invalid columns: at least one column must be selected.")
+
+    window = CsvWindow(head=head, tail=tail, sample=sample,
+                       columns=list(columns) if columns is not None else None, max_bytes=max_bytes)
+    if window.key is None:
+        return None
+    return window
+
+
+def load_csv_window(data: Optional[Dict[str, Any]]) -> Optional[CsvWindow]:
+    """Method to load a CSV window stored in the metadata of a linked file
+
+    Args:
+        data: the window as a dictionary, or None
+
+    Returns:
+        CsvWindow, or None if the whole file is copied
+    """
+    if not data:
+        return None
+
+    return get_csv_window(**data)
+
+
+class _HashingReader(io.RawIOBase):
+    """A file-like object that hashes and counts the bytes read from a binary file"""
+    def __init__(self, raw: BinaryIO, algorithm: str) -> None:
+        self._raw = raw
+        self.hasher = new_hasher(algorithm)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        num_bytes = self._raw.readinto(b)  # type: ignore
+        if num_bytes:
+            self.hasher.update(memoryview(b)[:num_bytes])
+            tracing.count('bytes_read', num_bytes)
+        return int(num_bytes or 0)
+
+
+class _RowWriter:
+    """Helper to write CSV rows to a binary file, hashing the output and enforcing the byte budget"""
+    def __init__(self, dst: BinaryIO, algorithm: str, indices: Optional[List[int]],
+                 max_bytes: Optional[int]) -> None:
+        self._dst = dst
+        self._indices = indices
+        self._max_bytes = max_bytes
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self.hasher = new_hasher(algorithm)
+        self.bytes_written = 0
+        self.rows_written = 0
+        self.full = False
+
+    def write(self, row: List[str]) -> bool:
+        """Method to write a row, unless it would exceed the byte budget
+
+        Args:
+            row: the values in the row, before columns are selected
+
+        Returns:
+            True if the row was written, False if the budget is used up
+        """
+        if self.full:
+            return False
+
+        if self._indices is not None:
+            row = [row[i] if i < len(row) else '' for i in self._indices]
+
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerow(row)
+        data = self._buffer.getvalue().encode(CSV_ENCODING, CSV_ERRORS)
+
+        # The header is always written, so the table has its column names
+        if self._max_bytes is not None and self.rows_written > 0 and \
+                self.bytes_written + len(data) > self._max_bytes:
+            self.full = True
+            return False
+
+        self._dst.write(data)
+        self.hasher.update(data)
+        self.bytes_written += len(data)
+        self.rows_written += 1
+        return True
+
+
+def write_csv_window(src: str, dst: str, window: CsvWindow, algorithm: str = DEFAULT_ALGORITHM,
+                     buffer_size: int = DEFAULT_BUFFER_SIZE) -> Tuple[str, str]:
+    """Method to write the part of a CSV file selected by a window, reading the file once
+
+    Only the rows that are kept are held in memory: the head is written as it is read, and the tail and sample are
+    bounded by their size.
+
+    Args:
+        src: absolute path to the CSV file
+        dst: absolute path to write the trimmed file to
+        window: which part of the file to keep
+        algorithm: the name of the hash algorithm to use
+        buffer_size: the number of bytes to read at a time
+
+    Returns:
+        a tuple of the hex digest of the whole source file and the hex digest of the trimmed file
+    """
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        source = _HashingReader(fs, algorithm)
+        text = io.TextIOWrapper(io.BufferedReader(source, buffer_size), encoding=CSV_ENCODING, errors=CSV_ERRORS,
+                                newline='')
+        reader = csv.reader(text)
+
+        header = next(reader, None)
+        if header is None:
+            # Empty file
+            return source.hasher.hexdigest(), new_hasher(algorithm).hexdigest()
+
+        indices = None
+        if window.columns is not None:
+            missing = [c for c in window.columns if c not in header]
+            if missing:
+                raise ValueError(f"Columns not found in {src}: {', '.join(missing)}")
+            indices = [header.index(c) for c in window.columns]
+
+        writer = _RowWriter(fd, algorithm, indices, window.max_bytes)
+        writer.write(header)
+
+        head = window.head if window.head is not None else (0 if window.selects_rows else None)
+        tail: Deque[Tuple[int, List[str]]] = deque(maxlen=window.tail or 0)
+        sample: List[Tuple[int, List[str]]] = list()
+        rng = random.Random(SAMPLE_SEED)
+        num_candidates = 0
+
+        for index, row in enumerate(reader):
+            if head is None or index < head:
+                if not writer.write(row) and not window.selects_rows:
+                    break
+                continue
+            elif window.tail is None and window.sample is None:
+                # Only the head is kept, the rest of the file is only hashed
+                break
+
+            candidate: Optional[Tuple[int, List[str]]] = (index, row)
+            if window.tail:
+                # Rows that might still be in the tail can't be sampled. A row is only offered to the sample once it is
+                # pushed out of the tail.
+                candidate = tail[0] if len(tail) == tail.maxlen else None
+                tail.append((index, row))
+            if window.sample and candidate is not None:
+                # Reservoir sampling, so the file is only read once
+                num_candidates += 1
+                if len(sample) < window.sample:
+                    sample.append(candidate)
+                else:
+                    slot = rng.randrange(num_candidates)
+                    if slot < window.sample:
+                        sample[slot] = candidate
+
+        # Hash the rest of the file
+        while text.read(buffer_size):
+            pass
+
+        for _, row in sorted(sample + list(tail), key=lambda item: item[0]):
+            if not writer.write(row):
+                break
+
+    tracing.count('bytes_written', writer.bytes_written)
+    return source.hasher.hexdigest(), writer.hasher.hexdigest()
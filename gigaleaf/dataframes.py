@@ -0,0 +1,206 @@
+from typing import Any, Iterator, List, Optional
+from pathlib import Path
+
+try:
+    import pandas  # type: ignore
+except ImportError:
+    pandas = None
+
+try:
+    import pyarrow  # type: ignore
+    import pyarrow.ipc  # type: ignore
+    import pyarrow.feather  # type: ignore
+    import pyarrow.parquet  # type: ignore
+except ImportError:
+    pyarrow = None
+
+
+# Supported dataframe file formats, by file suffix. Files with other suffixes are read as pickles.
+DATAFRAME_FORMATS = {'.pkl': 'pickle',
+                     '.pickle': 'pickle',
+                     '.parquet': 'parquet',
+                     '.pq': 'parquet',
+                     '.feather': 'feather',
+                     '.arrow': 'arrow',
+                     '.arrows': 'arrow',
+                     '.ipc': 'arrow'}
+
+# The number of rows to read at a time from a Parquet file when only the first rows are needed
+PARQUET_BATCH_SIZE = 65536
+
+
+def get_dataframe_format(filename: str) -> str:
+    """Method to get the format of a dataframe file from its suffix
+
+    Files with any other suffix (e.g. `.p` or `.bin`) are read as pickles, as they always have been.
+
+    Args:
+        filename: path to the dataframe file
+
+    Returns:
+        `pickle`, `parquet`, `feather` or `arrow`
+    """
+    return DATAFRAME_FORMATS.get(Path(filename).suffix.lower(), 'pickle')
+
+
+def _check_columns(available: List[str], columns: Optional[List[str]], filename: str) -> None:
+    """Helper to check that the selected columns exist
+
+    Args:
+        available: the names of the columns in the file
+        columns: the names of the selected columns, or None for all columns
+        filename: path to the dataframe file, for the error message
+
+    Returns:
+        None
+    """
+    if columns is None:
+        return
+
+    missing = [c for c in columns if c not in available]
+    if missing:
+        raise ValueError(f"Columns not found in {filename}: {', '.join(missing)}")
+
+
+def _read_parquet(filename: str, columns: Optional[List[str]], max_rows: Optional[int], memory_map: bool) -> Any:
+    """Helper to read the selected part of a Parquet file into an Arrow table
+
+    Only the selected columns are decoded, and only the row groups needed for the first `max_rows` rows are read.
+
+    Args:
+        filename: absolute path to the file
+        columns: the names of the columns to read, or None for all columns
+        max_rows: the maximum number of rows to read, or None for all rows
+        memory_map: if True, memory-map the file instead of reading it into buffers
+
+    Returns:
+        pyarrow.Table
+    """
+    parquet_file = pyarrow.parquet.ParquetFile(filename, memory_map=memory_map)
+    _check_columns(parquet_file.schema_arrow.names, columns, filename)
+    if max_rows is None:
+        return parquet_file.read(columns=columns)
+
+    batches = list()
+    num_rows = 0
+    for batch in parquet_file.iter_batches(batch_size=min(max_rows, PARQUET_BATCH_SIZE) or 1, columns=columns):
+        if num_rows >= max_rows:
+            break
+        batches.append(batch)
+        num_rows += batch.num_rows
+
+    if not batches:
+        return parquet_file.schema_arrow.empty_table().select(columns or parquet_file.schema_arrow.names)
+    return pyarrow.Table.from_batches(batches).slice(0, max_rows)
+
+
+def _iter_ipc_batches(reader: Any) -> Iterator[Any]:
+    """Helper to lazily iterate over the record batches of an Arrow IPC file or stream
+
+    Args:
+        reader: a pyarrow IPC file or stream reader
+
+    Returns:
+        iterator of pyarrow.RecordBatch
+    """
+    if hasattr(reader, 'get_batch'):
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        yield from reader
+
+
+def _read_arrow(filename: str, columns: Optional[List[str]], max_rows: Optional[int], memory_map: bool) -> Any:
+    """Helper to read the selected part of a Feather or Arrow IPC file into a dataframe
+
+    Record batches are read one at a time, stopping once `max_rows` rows have been read. When memory-mapped, the data
+    of uncompressed files is not copied until it is converted to a dataframe.
+
+    Args:
+        filename: absolute path to the file
+        columns: the names of the columns to read, or None for all columns
+        max_rows: the maximum number of rows to read, or None for all rows
+        memory_map: if True, memory-map the file instead of reading it into buffers
+
+    Returns:
+        pandas.DataFrame
+    """
+    source = pyarrow.memory_map(filename, 'r') if memory_map else pyarrow.OSFile(filename, 'rb')
+    with source:
+        try:
+            # Feather version 2 files are Arrow IPC files
+            reader = pyarrow.ipc.open_file(source)
+        except pyarrow.ArrowInvalid:
+            source.seek(0)
+            try:
+                reader = pyarrow.ipc.open_stream(source)
+            except pyarrow.ArrowInvalid:
+                # Feather version 1 files can only be read whole
+                table = pyarrow.feather.read_table(filename, columns=columns, memory_map=memory_map)
+                return (table.slice(0, max_rows) if max_rows is not None else table).to_pandas()
+
+        _check_columns(reader.schema.names, columns, filename)
+        indices = [reader.schema.get_field_index(c) for c in columns] if columns is not None else None
+        batches = list()
+        num_rows = 0
+        for batch in _iter_ipc_batches(reader):
+            if max_rows is not None and num_rows >= max_rows:
+                break
+            if indices is not None:
+                batch = pyarrow.RecordBatch.from_arrays([batch.column(i) for i in indices], names=columns)
+            batches.append(batch)
+            num_rows += batch.num_rows
+
+        if batches:
+            table = pyarrow.Table.from_batches(batches)
+        else:
+            schema = reader.schema
+            if columns is not None:
+                schema = pyarrow.schema([schema.field(c) for c in columns])
+            table = schema.empty_table()
+
+        if max_rows is not None:
+            table = table.slice(0, max_rows)
+
+        # Convert while the file is still mapped
+        return table.to_pandas()
+
+
+def read_dataframe(filename: str, columns: Optional[List[str]] = None, max_rows: Optional[int] = None,
+                   memory_map: bool = True) -> Any:
+    """Method to read the selected part of a dataframe file, only materializing that part in memory
+
+    Pickled dataframes must be loaded whole before columns and rows are selected. Parquet, Feather and Arrow IPC files
+    are read lazily and require pyarrow.
+
+    Args:
+        filename: absolute path to the dataframe file
+        columns: the names of the columns to read, or None for all columns
+        max_rows: the maximum number of rows to read, or None for all rows
+        memory_map: if True, memory-map Parquet, Feather and Arrow files instead of reading them into buffers
+
+    Returns:
+        pandas.DataFrame
+    """
+    if pandas is None:
+        raise EnvironmentError("Dataframe file support requires pandas. Please run `pip install gigaleaf[pandas]`")
+
+    file_format = get_dataframe_format(filename)
+    if file_format == 'pickle':
+        with open(filename, 'rb') as f:
+            df = pandas.read_pickle(f)
+        _check_columns(list(df.columns), columns, filename)
+        if columns is not None:
+            df = df[columns]
+        if max_rows is not None:
+            df = df.head(max_rows)
+        return df
+
+    if pyarrow is None:
+        raise EnvironmentError("Parquet, Feather and Arrow file support requires pyarrow. "
+                               "Please run `pip install gigaleaf[arrow]`")
+
+    if file_format == 'parquet':
+        return _read_parquet(filename, columns, max_rows, memory_map).to_pandas()
+    else:
+        return _read_arrow(filename, columns, max_rows, memory_map)
@@ -0,0 +1,90 @@
+from typing import Optional
+import os
+
+
+# Copies of linked files are stored in this directory inside `gigantum/data`, under the digest of their contents
+OBJECTS_DIRECTORY = 'objects'
+
+
+def get_object_name(digest: str, suffix: str) -> str:
+    """Method to get where data with a given digest is stored in the data directory
+
+    Objects are spread over sub-directories named by the first two characters of the digest, like git. The suffix is
+    kept so LaTeX can tell the file type, e.g. for `\\includegraphics`.
+
+    Args:
+        digest: hex digest of the data
+        suffix: the suffix of the linked file, e.g. `.png`
+
+    Returns:
+        path relative to the data directory, e.g. `objects/3f/3fa2...9c.png`
+    """
+    return f"{OBJECTS_DIRECTORY}/{digest[:2]}/{digest}{suffix.lower()}"
+
+
+def resolve_data_object(data_object: Optional[str], gigantum_relative_path: str) -> str:
+    """Method to get where a linked file's data is stored in the data directory
+
+    Files copied by older versions of gigaleaf are stored under their basename, until they are next updated.
+
+    Args:
+        data_object: the data object recorded in the linked file's metadata, if any
+        gigantum_relative_path: the path of the linked file, relative to the Gigantum Project root
+
+    Returns:
+        path relative to the data directory
+    """
+    if data_object is not None:
+        return data_object
+
+    return os.path.basename(gigantum_relative_path)
+
+
+def store_object(src: str, data_directory: str, data_object: str) -> bool:
+    """Method to move a file into the data directory as an object, unless an object with the same contents exists
+
+    Args:
+        src: absolute path to the file to store. It is moved, or removed if the object already exists.
+        data_directory: absolute path to the data directory
+        data_object: the name of the object, from `get_object_name()`
+
+    Returns:
+        True if the object was written, False if it already existed
+    """
+    filename = os.path.join(data_directory, data_object)
+    if os.path.isfile(filename):
+        # Objects are named by their contents, so the existing object is identical
+        os.remove(src)
+        return False
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    os.replace(src, filename)
+    return True
+
+
+def remove_object(data_directory: str, data_object: str) -> bool:
+    """Method to remove an object from the data directory, along with any directories it leaves empty
+
+    Args:
+        data_directory: absolute path to the data directory
+        data_object: path of the object relative to the data directory
+
+    Returns:
+        True if the object was removed, False if it did not exist
+    """
+    filename = os.path.join(data_directory, data_object)
+    if not os.path.isfile(filename):
+        return False
+
+    os.remove(filename)
+    parent = os.path.dirname(filename)
+    objects_directory = os.path.join(data_directory, OBJECTS_DIRECTORY)
+    while parent.startswith(objects_directory + os.sep) or parent == objects_directory:
+        try:
+            os.rmdir(parent)
+        except OSError:
+            # Not empty
+            break
+        parent = os.path.dirname(parent)
+
+    return True
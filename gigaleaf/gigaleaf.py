@@ -1,21 +1,72 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union, Sequence, Callable, List, Set, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from dataclasses import asdict
+import contextlib
+import functools
+import glob
+import inspect
+import threading
+import time
+import asyncio
 import shutil
+import os
 
 from gigaleaf.overleaf import Overleaf
 from gigaleaf.gigantum import Gigantum
 
-from gigaleaf.linkedfiles.image import ImageFile
+from gigaleaf.linkedfiles.image import ImageFile, IMAGE_SUFFIXES
+from gigaleaf.linkedfiles.linkedfile import LinkedFile
 from gigaleaf.linkedfiles.csv import CsvFile
 from gigaleaf.linkedfiles.dataframe import DataframeFile
 from gigaleaf.linkedfiles import load_linked_file, load_all_linked_files
+from gigaleaf.cache import ChangeCache
+from gigaleaf.context import SyncContext
+from gigaleaf.imageopt import get_image_options
+from gigaleaf.csvwindow import get_csv_window
+from gigaleaf.dataframes import DATAFRAME_FORMATS
+from gigaleaf.pipeline import update_linked_files, get_default_workers
+from gigaleaf.report import SyncReport
+from gigaleaf.background import SyncFuture
+from gigaleaf.manifest import MANIFEST_FILENAME
+from gigaleaf.watch import create_watcher, get_stat_signature, DEFAULT_POLL_INTERVAL
+from gigaleaf import tracing
+from gigaleaf.tracing import TraceHook, get_default_trace_hooks
 
 
 class Gigaleaf:
     """Class to link Gigantum Project outputs to an Overleaf Project"""
-    def __init__(self) -> None:
+    def __init__(self, project_root: Optional[str] = None) -> None:
+        """
+        Args:
+            project_root: path to the Gigantum Project. Defaults to the `GIGALEAF_PROJECT_ROOT` environment variable,
+                          or `/mnt/labbook` inside Gigantum.
+        """
+        if project_root is not None:
+            Gigantum.set_project_root(project_root)
+
         self.overleaf = Overleaf()
         self.gigantum = Gigantum(self.overleaf.overleaf_repo_directory)
+        self.image_options = get_image_options(self.overleaf.config.optimize_images,
+                                               self.overleaf.config.image_max_dpi)
+
+        # Syncs run one at a time on a background thread, created the first time a sync is started
+        self._sync_executor: Optional[ThreadPoolExecutor] = None
+        self._sync_lock = threading.Lock()
+        self._last_sync: Optional[SyncFuture] = None
+
+        # Destinations for the timings of each sync
+        self.trace_hooks: List[TraceHook] = get_default_trace_hooks()
+
+        # The context shared by every link made inside `batch()`, or None outside a batch
+        self._batch_context: Optional[SyncContext] = None
+
+        if self.gigantum.created_files:
+            # Make sure files created while setting up the Overleaf Project are committed by the next sync
+            context = SyncContext()
+            for filename in self.gigantum.created_files:
+                context.record_change(filename)
+            context.save_changes()
 
     def link_image(self, relative_path: str, caption: Optional[str] = None, label: Optional[str] = None,
                    width: str = "0.5\\textwidth", alignment: str = 'center') -> None:
@@ -46,7 +97,7 @@ class Gigaleaf:
                                   "width": width,
                                   "alignment": alignment}
 
-        ImageFile.link(relative_path, **kwargs)
+        ImageFile.link(relative_path, self._batch_context, **kwargs)
 
     def unlink_image(self, relative_path: str) -> None:
         """Method to unlink an image file from your Overleaf project.
@@ -57,20 +108,41 @@ class Gigaleaf:
         Returns:
             None
         """
+        self._check_not_in_batch('unlink')
         metadata_filename = ImageFile.get_metadata_filename(relative_path)
-        metadata_abs_filename = Path(Gigantum.get_overleaf_root_directory(),
-                                     'project', 'gigantum', 'metadata', metadata_filename)
-        img_file = load_linked_file(metadata_abs_filename.as_posix())
+        img_file = load_linked_file(metadata_filename)
         img_file.unlink()
 
     def link_csv(self, relative_path: str, caption: Optional[str] = None,
-                 label: Optional[str] = None) -> None:
+                 label: Optional[str] = None, head: Optional[int] = None, tail: Optional[int] = None,
+                 sample: Optional[int] = None, columns: Optional[List[str]] = None,
+                 max_bytes: Optional[int] = None, render: str = 'csvsimple', column_format: Optional[str] = None,
+                 formats: Optional[Dict[str, str]] = None, escape: bool = True,
+                 shard_rows: Optional[int] = None) -> None:
         """Method to link a csv file to your Overleaf project for automatic updating
 
+        By default the whole file is copied. For large files, set `head`, `tail` or `sample` to only copy some rows,
+        `columns` to only copy some columns, or `max_bytes` to limit the size of the copy. The header row is always
+        copied.
+
         Args:
             relative_path: relative path to the file from the current working dir, e.g. `../output/my_table.csv`
             caption: The caption for the table in the auto-generated latex subfile
             label: The label for the table in the auto-generated latex subfile
+            head: The number of rows to copy from the start of the file
+            tail: The number of rows to copy from the end of the file
+            sample: The number of rows to copy from the rest of the file, picked at random (but the same every sync)
+            columns: The names of the columns to copy, in the order they should appear
+            max_bytes: The maximum size of the copy. Rows that don't fit are dropped.
+            render: `csvsimple` to typeset the table from the CSV file when Overleaf compiles the document, or
+                    `tabular` to render it to a booktabs tabular environment during the sync, which compiles faster
+            column_format: The tabular column specification, e.g. `lrr`. If omitted, columns of numbers are right
+                           aligned. Only used when `render` is `tabular`.
+            formats: Python format specifications for the numbers in each column, by column name, e.g.
+                     `{"p-value": ".3f"}`. Only used when `render` is `tabular`.
+            escape: If True, special LaTeX characters in the table are escaped. Only used when `render` is `tabular`.
+            shard_rows: If set, split the table into `longtable` shards of this many rows, each in its own subfile.
+                        Requires `render` to be `tabular`.
 
         Returns:
             None
@@ -79,10 +151,25 @@ class Gigaleaf:
             safe_filename = ImageFile.get_safe_filename(relative_path)
             label = f"table:{Path(safe_filename).stem}"
 
+        if render not in ['csvsimple', 'tabular']:
+            raise ValueError(f"Unsupported render mode: {render}. Supported modes are: csvsimple, tabular")
+        if shard_rows is not None and render != 'tabular':
+            raise ValueError("Sharding a table requires rendering it with render='tabular'")
+        if shard_rows is not None and shard_rows < 1:
+            raise ValueError(f"Invalid shard_rows: {shard_rows}. It must be a positive number.")
+
+        window = get_csv_window(head=head, tail=tail, sample=sample, columns=columns, max_bytes=max_bytes)
+
         kwargs: Dict[str, Any] = {"caption": caption,
-                                  "label": label}
+                                  "label": label,
+                                  "window": asdict(window) if window is not None else None,
+                                  "render": render,
+                                  "column_format": column_format,
+                                  "formats": formats,
+                                  "escape": escape,
+                                  "shard_rows": shard_rows}
 
-        CsvFile.link(relative_path, **kwargs)
+        CsvFile.link(relative_path, self._batch_context, **kwargs)
 
     def unlink_csv(self, relative_path: str) -> None:
         """Method to unlink a csv file from your Overleaf project.
@@ -93,19 +180,32 @@ class Gigaleaf:
         Returns:
             None
         """
+        self._check_not_in_batch('unlink')
         metadata_filename = ImageFile.get_metadata_filename(relative_path)
-        metadata_abs_filename = Path(Gigantum.get_overleaf_root_directory(),
-                                     'project', 'gigantum', 'metadata', metadata_filename)
-        csv_file = load_linked_file(metadata_abs_filename.as_posix())
+        csv_file = load_linked_file(metadata_filename)
         csv_file.unlink()
 
-    def link_dataframe(self, relative_path: str, to_latex_kwargs: Dict[str, Any]) -> None:
+    def link_dataframe(self, relative_path: str, to_latex_kwargs: Dict[str, Any], columns: Optional[List[str]] = None,
+                       max_rows: Optional[int] = None, memory_map: bool = True, renderer: str = 'pandas',
+                       shard_rows: Optional[int] = None) -> None:
         """Method to link a dataframe file to your Overleaf project for automatic updating
 
+        The dataframe can be pickled with `pandas.DataFrame.to_pickle`, or saved as a Parquet (`.parquet`), Feather
+        (`.feather`) or Arrow IPC (`.arrow`) file. Columnar files require pyarrow, and only the selected columns and
+        rows are loaded when rendering.
+
         Args:
-            relative_path: relative path to the file from the current working dir, e.g. `../output/my_table.csv`
+            relative_path: relative path to the file from the current working dir, e.g. `../output/my_table.pkl`
             to_latex_kwargs: a dictionary of key word arguments to pass into the pandas.DataFrame.to_latex method
                              (https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.to_latex.html)
+            columns: the names of the columns to render. If omitted, all columns are rendered.
+            max_rows: the maximum number of rows to render, from the start of the dataframe
+            memory_map: if True, memory-map columnar files instead of reading them into memory
+            renderer: `pandas` (the default) to render the table with `to_latex`, or `gigaleaf` to use gigaleaf's
+                      renderer, which is much faster for large tables and supports the common `to_latex` arguments
+                      (index, float_format, columns, header, escape, column_format, na_rep, caption and label)
+            shard_rows: if set, split the table into `longtable` shards of this many rows, each in its own subfile.
+                        Requires the `gigaleaf` renderer.
 
         Returns:
             None
@@ -114,9 +214,23 @@ class Gigaleaf:
         if 'buf' in to_latex_kwargs:
             del to_latex_kwargs['buf']
 
-        kwargs = {"to_latex_kwargs": to_latex_kwargs}
+        if renderer not in ['gigaleaf', 'pandas']:
+            raise ValueError(f"Unsupported renderer: {renderer}. Supported renderers are: gigaleaf, pandas")
+        if max_rows is not None and max_rows < 0:
+            raise ValueError(f"Invalid max_rows: {max_rows}. It must be zero or a positive number.")
+        if shard_rows is not None and renderer != 'gigaleaf':
+            raise ValueError("Sharding a table requires rendering it with renderer='gigaleaf'")
+        if shard_rows is not None and shard_rows < 1:
+            raise ValueError(f"Invalid shard_rows: {shard_rows}. It must be a positive number.")
+
+        kwargs: Dict[str, Any] = {"to_latex_kwargs": to_latex_kwargs,
+                                  "columns": columns,
+                                  "max_rows": max_rows,
+                                  "memory_map": memory_map,
+                                  "renderer": renderer,
+                                  "shard_rows": shard_rows}
 
-        DataframeFile.link(relative_path, **kwargs)
+        DataframeFile.link(relative_path, self._batch_context, **kwargs)
 
     def unlink_dataframe(self, relative_path: str) -> None:
         """Method to unlink a dataframe file from your Overleaf project.
@@ -127,36 +241,451 @@ class Gigaleaf:
         Returns:
             None
         """
+        self._check_not_in_batch('unlink')
         metadata_filename = ImageFile.get_metadata_filename(relative_path)
-        metadata_abs_filename = Path(Gigantum.get_overleaf_root_directory(),
-                                     'project', 'gigantum', 'metadata', metadata_filename)
-        dataframe_file = load_linked_file(metadata_abs_filename.as_posix())
+        dataframe_file = load_linked_file(metadata_filename)
         dataframe_file.unlink()
 
-    def sync(self) -> None:
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Context manager to link many files at once
+
+        Links made inside the block share one context, so the Gigantum revision is looked up once and the metadata of
+        every link is saved together when the block exits. If the block raises an exception, none of its links are
+        saved. Files can't be unlinked or synced inside a batch. Nested batches are part of the outermost batch.
+
+            with gl.batch():
+                for filename in figures:
+                    gl.link_image(filename)
+
+        Returns:
+            None
+        """
+        if self._batch_context is not None:
+            yield
+            return
+
+        context = SyncContext(ChangeCache(os.path.join(Gigantum.get_overleaf_root_directory(), 'change_cache.json')),
+                              hash_algorithm=self.overleaf.config.hash_algorithm,
+                              buffer_size=self.overleaf.config.hash_buffer_size)
+        self._batch_context = context
+        try:
+            yield
+        finally:
+            self._batch_context = None
+
+        context.save_manifest()
+        context.save_changes()
+        if context.change_cache is not None:
+            context.change_cache.save()
+
+    def link_many(self, paths_or_glob: Union[str, Sequence[str]], hash_files: bool = False,
+                  workers: Optional[int] = None, **settings: Any) -> List[str]:
+        """Method to link many files to your Overleaf project at once, e.g. every figure from a parameter sweep
+
+        Each file is linked with `link_image()`, `link_csv()` or `link_dataframe()`, depending on its type, with the
+        same settings. Every path is checked before anything is linked, and the links are saved together as in
+        `batch()`.
+
+        Args:
+            paths_or_glob: a glob pattern relative to the current working dir, e.g. `../output/sweep/*.png`, or a list
+                           of relative paths
+            hash_files: if True, hash the files in parallel now, so the next sync can use the cached hashes
+            workers: the number of threads used to hash the files. Defaults to `get_default_workers()`
+            **settings: the arguments for the link methods, e.g. `caption` or `width`. Every file must accept them, so
+                        e.g. `width` can only be set when linking images. A label must be unique, so `label` can only
+                        be set when linking a single file.
+
+        Returns:
+            the metadata filenames of the linked files, e.g. `fig1_png.json`
+        """
+        if isinstance(paths_or_glob, str):
+            relative_paths = sorted([p for p in glob.glob(paths_or_glob, recursive=True) if os.path.isfile(p)])
+            if not relative_paths:
+                raise ValueError(f"No files match {paths_or_glob}")
+        else:
+            relative_paths = list(paths_or_glob)
+
+        if settings.get('label') and len(relative_paths) > 1:
+            raise ValueError("A label can't be shared by several linked files. Omit it to label each file by its name.")
+
+        # Check every path first, so nothing is linked if any of them is invalid
+        errors = list()
+        link_methods: List[Callable[..., None]] = list()
+        metadata_filenames: Dict[str, str] = dict()
+        project_root = Path(Gigantum.get_project_root()).resolve()
+        for relative_path in relative_paths:
+            file_path = Path(relative_path).resolve()
+            metadata_filename = LinkedFile.get_metadata_filename(relative_path)
+            link_method = self._get_link_method(relative_path)
+            if not file_path.is_file():
+                errors.append(f"{relative_path} does not exist")
+            elif project_root not in file_path.parents:
+                errors.append(f"{relative_path} is not in the Gigantum Project")
+            elif link_method is None:
+                errors.append(f"{relative_path} is not an image, CSV or dataframe file")
+            elif metadata_filename in metadata_filenames:
+                errors.append(f"{relative_path} has the same name as {metadata_filenames[metadata_filename]}")
+            else:
+                # Settings are shared, so check they suit the link method for this type of file, e.g. a dataframe
+                # needs `to_latex_kwargs` and only images have a `width`
+                try:
+                    inspect.signature(link_method).bind(relative_path, **settings)
+                except TypeError as err:
+                    errors.append(f"{relative_path} can't be linked with {link_method.__name__}(): {err}")
+            metadata_filenames.setdefault(metadata_filename, relative_path)
+            if link_method is not None:
+                link_methods.append(link_method)
+        if errors:
+            raise ValueError(f"Failed to link {len(errors)} file(s):\n" + "\n".join([f"  {e}" for e in errors]))
+
+        with self.batch():
+            for relative_path, link_method in zip(relative_paths, link_methods):
+                link_method(relative_path, **settings)
+
+            if hash_files:
+                self._hash_linked_files(list(metadata_filenames.keys()), workers)
+
+        return list(metadata_filenames.keys())
+
+    def _hash_linked_files(self, metadata_filenames: List[str], workers: Optional[int] = None) -> None:
+        """Method to hash linked files in parallel inside a batch, caching the hashes for the next sync
+
+        Files are hashed with the algorithm the sync will look their hash up with.
+
+        Args:
+            metadata_filenames: the metadata filenames of the linked files to hash
+            workers: the number of threads to use. Defaults to `get_default_workers()`
+
+        Returns:
+            None
+        """
+        context = self._batch_context
+        if context is None or context.change_cache is None:
+            raise ValueError("Linked files can only be hashed inside a batch")
+        change_cache = context.change_cache
+
+        def hash_linked_file(metadata_filename: str) -> None:
+            data = context.manifest.get(metadata_filename)
+            if data is not None:
+                change_cache.get_hash(os.path.join(context.project_root, data['gigantum_relative_path']),
+                                      data['hash_algorithm'], context.buffer_size)
+
+        with ThreadPoolExecutor(max_workers=workers or get_default_workers()) as executor:
+            list(executor.map(hash_linked_file, metadata_filenames))
+
+    def _get_link_method(self, relative_path: str) -> Optional[Callable[..., None]]:
+        """Method to get the method that links a file, from its suffix
+
+        Args:
+            relative_path: relative path to the file
+
+        Returns:
+            the link method, or None if the file type is not supported
+        """
+        suffix = Path(relative_path).suffix.lower()
+        if suffix == '.csv':
+            return self.link_csv
+        elif suffix in DATAFRAME_FORMATS:
+            return self.link_dataframe
+        elif suffix in IMAGE_SUFFIXES:
+            return self.link_image
+        else:
+            return None
+
+    def _check_not_in_batch(self, action: str) -> None:
+        """Method to raise an error if a batch is in progress, for actions that can't be part of a batch
+
+        Args:
+            action: what was attempted, for the error message, e.g. `sync`
+
+        Returns:
+            None
+        """
+        if self._batch_context is not None:
+            raise ValueError(f"Can't {action} inside a batch. Do it after the batch is finished.")
+
+    def sync(self, workers: Optional[int] = None, verify: bool = False,
+             block: bool = True) -> Union[SyncReport, SyncFuture]:
         """Method to synchronize your Gigantum and Overleaf projects.
 
         When you call this method, gigaleaf will do the following:
 
-            * Pull changes from the Overleaf project
+            * Pull changes from the Overleaf project, if the remote has changed since the last sync
             * Check all linked files for changes. If changes exist it will update files in the Overleaf project
-            * Commit changes to the Overleaf project
-            * Push changes to the Overleaf project
+            * Commit changes to the Overleaf project, if there are any. Only files written by gigaleaf are staged.
+            * Push changes to the Overleaf project, if there are any
+
+        Linked files are updated in parallel. If any linked file fails to update, nothing is committed and a
+        ValueError listing every failure is raised.
+
+        Syncs run one at a time. If you start a sync while another is waiting to start, you get the waiting sync
+        instead of a new one, so overlapping calls never queue duplicate pushes.
+
+        Args:
+            workers: The maximum number of threads (and processes) used to update linked files. Set to 1 to update
+                     files serially. Defaults to a value based on the number of CPUs available.
+            verify: If True, re-hash every linked file instead of trusting the cached hash of files whose size,
+                    modification time and inode have not changed since the last sync.
+            block: If False, return immediately with a SyncFuture while the sync runs in the background
+
+        Returns:
+            SyncReport, or a SyncFuture if `block` is False
+        """
+        handle = self._start_sync(workers, verify)
+        if block:
+            return handle.result()
+
+        return handle
+
+    async def sync_async(self, workers: Optional[int] = None, verify: bool = False) -> SyncReport:
+        """Method to synchronize your Gigantum and Overleaf projects without blocking the asyncio event loop
+
+        The sync runs on a background thread, exactly like `sync(block=False)`. Cancelling the awaiting task cancels
+        the sync.
+
+        Args:
+            workers: The maximum number of threads (and processes) used to update linked files
+            verify: If True, re-hash every linked file instead of trusting the cached hash
+
+        Returns:
+            SyncReport
+        """
+        handle = self._start_sync(workers, verify)
+        try:
+            return await asyncio.wrap_future(handle._future)
+        except asyncio.CancelledError:
+            handle.cancel()
+            raise
+
+    def _start_sync(self, workers: Optional[int], verify: bool,
+                    metadata_filenames: Optional[Sequence[str]] = None) -> SyncFuture:
+        """Method to start a sync on the background thread, or join the sync that is waiting to start
+
+        Args:
+            workers: The maximum number of threads (and processes) used to update linked files
+            verify: If True, re-hash every linked file instead of trusting the cached hash
+            metadata_filenames: if set, only these linked files are updated. Syncs of a subset of linked files are
+                                never joined.
+
+        Returns:
+            SyncFuture
+        """
+        self._check_not_in_batch('sync')
+        with self._sync_lock:
+            if metadata_filenames is None and self._last_sync is not None and \
+                    self._last_sync.status == 'pending' and not self._last_sync.cancel_requested:
+                # A sync that has not started yet will see every change made so far
+                return self._last_sync
+
+            if self._sync_executor is None:
+                self._sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gigaleaf-sync')
+
+            handle = SyncFuture()
+            self._sync_executor.submit(handle.run, functools.partial(self._sync, workers=workers, verify=verify,
+                                                                     metadata_filenames=metadata_filenames))
+            if metadata_filenames is None:
+                self._last_sync = handle
+            return handle
+
+    def add_trace_hook(self, hook: TraceHook) -> None:
+        """Method to send the timings of every sync to another destination, e.g. a `JsonTraceHook`
+
+        By default, timings are logged to the `gigaleaf` logger and, if it is installed, reported to OpenTelemetry.
+
+        Args:
+            hook: the trace hook to add
 
         Returns:
             None
         """
-        print("Syncing with Overleaf. Please wait...")
-        self.overleaf.pull()
+        self.trace_hooks.append(hook)
+
+    def _sync(self, handle: SyncFuture, workers: Optional[int] = None, verify: bool = False,
+              metadata_filenames: Optional[Sequence[str]] = None) -> SyncReport:
+        """Method to run a sync and collect its timings. See `sync()`.
+
+        Args:
+            handle: the handle of the sync, checked for cancellation
+            workers: The maximum number of threads (and processes) used to update linked files
+            verify: If True, re-hash every linked file instead of trusting the cached hash
+            metadata_filenames: if set, only these linked files are updated
 
-        linked_files = load_all_linked_files(self.overleaf.overleaf_repo_directory)
-        for lf in linked_files:
-            lf.update()
+        Returns:
+            SyncReport
+        """
+        tracer = tracing.start_trace()
+        try:
+            with tracer.span('sync'):
+                report = self._run_sync(handle, workers, verify, metadata_filenames)
+        finally:
+            tracing.stop_trace()
+            for hook in self.trace_hooks:
+                try:
+                    hook.emit(tracer)
+                except Exception as err:
+                    print(f"Failed to report sync timings with {type(hook).__name__}: {err}")
+
+        report.timings = tracer.get_timings()
+        report.counters = dict(tracer.counters)
+        report.spans = list(tracer.spans)
+        return report
 
-        self.overleaf.commit()
+    def _run_sync(self, handle: SyncFuture, workers: Optional[int] = None, verify: bool = False,
+                  metadata_filenames: Optional[Sequence[str]] = None) -> SyncReport:
+        """Method to run a sync. See `sync()`.
 
-        self.overleaf.push()
+        Args:
+            handle: the handle of the sync, checked for cancellation before each step that changes the Overleaf
+                    Project
+            workers: The maximum number of threads (and processes) used to update linked files
+            verify: If True, re-hash every linked file instead of trusting the cached hash
+            metadata_filenames: if set, only these linked files are updated. Files that are no longer linked are
+                                skipped.
+
+        Returns:
+            SyncReport
+        """
+        print("Syncing with Overleaf. Please wait...")
+        with tracing.span('pull'):
+            pull_skipped, pull_time_saved = self.overleaf.pull_if_changed()
+        handle.check_cancelled()
+
+        with tracing.span('load'):
+            context = SyncContext(ChangeCache(os.path.join(Gigantum.get_overleaf_root_directory(),
+                                                           'change_cache.json'), verify=verify),
+                                  hash_algorithm=self.overleaf.config.hash_algorithm,
+                                  buffer_size=self.overleaf.config.hash_buffer_size,
+                                  image_options=self.image_options,
+                                  copy_strategy=self.overleaf.config.copy_strategy)
+            if metadata_filenames is None:
+                linked_files = load_all_linked_files(self.overleaf.overleaf_repo_directory, context)
+            else:
+                linked_files = [load_linked_file(m, context) for m in metadata_filenames if m in context.manifest]
+        report = SyncReport(results=update_linked_files(linked_files, workers=workers), pull_skipped=pull_skipped,
+                            pull_time_saved=pull_time_saved)
+        with tracing.span('save'):
+            context.remove_released_data_objects()
+            context.save_manifest()
+            if context.change_cache is not None:
+                context.change_cache.save()
+            # Persist what was written, so it is still committed by a later sync if this one fails
+            context.save_changes()
+        if report.errors:
+            errors = "\n".join([f"  {filename}: {err}" for filename, err in report.errors.items()])
+            raise ValueError(f"Failed to update {len(report.errors)} linked file(s):\n{errors}")
+
+        handle.check_cancelled()
+
+        # Only stage the files gigaleaf wrote, and skip the commit entirely if there are none
+        changes = context.get_changes()
+        if changes:
+            with tracing.span('commit', files=len(changes)):
+                report.committed = self.overleaf.commit(changes, context.revision)
+        # Also push commits left behind by an earlier sync whose push failed
+        if report.committed or self.overleaf.has_unpushed_commits():
+            with tracing.span('push'):
+                self.overleaf.push()
+        # Only forget the changes once they are on Overleaf, so a failed push is retried by the next sync
+        if changes:
+            context.clear_changes()
         print("Sync complete.")
+        return report
+
+    def watch(self, debounce: float = 2.0, max_delay: float = 30.0, poll_interval: float = DEFAULT_POLL_INTERVAL,
+              workers: Optional[int] = None, stop_event: Optional[threading.Event] = None,
+              callback: Optional[Callable[[SyncReport], None]] = None) -> None:
+        """Method to watch all linked files and sync automatically when they change, until interrupted
+
+        Changes are detected with inotify if the optional `inotify_simple` package is installed, otherwise by polling
+        the size and modification time of each file. Bursts of writes, e.g. from a running notebook, are collected
+        until no file has changed for `debounce` seconds, and then synced in one batch. Only the linked files that
+        changed are updated. If links are added, removed or edited while watching, all linked files are synced.
+
+        Args:
+            debounce: the number of seconds without changes to wait before syncing
+            max_delay: the maximum number of seconds to wait before syncing while files keep changing
+            poll_interval: the number of seconds between checks, if polling
+            workers: The maximum number of threads (and processes) used to update linked files
+            stop_event: optional event to stop watching, e.g. from another thread
+            callback: optional function called with the report of each sync
+
+        Returns:
+            None
+        """
+        manifest_filename = os.path.join(self.overleaf.overleaf_repo_directory, 'gigantum', MANIFEST_FILENAME)
+        sources = self._get_linked_sources()
+        watcher = create_watcher(list(sources) + [manifest_filename], poll_interval)
+        manifest_signature = get_stat_signature(manifest_filename)
+
+        # The linked files that changed, or None if every linked file must be synced
+        pending: Optional[Set[str]] = set()
+        first_change = last_change = 0.0
+
+        print(f"Watching {len(sources)} linked file(s) for changes. Press Ctrl+C to stop.")
+        try:
+            while stop_event is None or not stop_event.is_set():
+                timeout = 1.0
+                if pending is None or pending:
+                    timeout = min(timeout, max(0.0, min(last_change + debounce, first_change + max_delay) -
+                                               time.monotonic()))
+
+                changed = watcher.wait(timeout)
+                if manifest_filename in changed:
+                    changed.discard(manifest_filename)
+                    # Syncs update the manifest too, so only links edited outside of this watch count as a change
+                    if get_stat_signature(manifest_filename) != manifest_signature:
+                        pending = None
+                        first_change = first_change or time.monotonic()
+                        last_change = time.monotonic()
+
+                changed_files = [m for f in changed for m in sources.get(f, list())]
+                if changed_files and pending is not None:
+                    if not pending:
+                        first_change = time.monotonic()
+                    pending.update(changed_files)
+                    last_change = time.monotonic()
+
+                if pending is not None and not pending:
+                    continue
+
+                now = time.monotonic()
+                if now - last_change < debounce and now - first_change < max_delay:
+                    continue
+
+                try:
+                    report = self._start_sync(workers, False, sorted(pending) if pending is not None else None).result()
+                    if callback is not None:
+                        callback(report)
+                except ValueError as err:
+                    print(f"Sync failed, waiting for the next change: {err}")
+
+                if pending is None:
+                    # The set of linked files may have changed
+                    watcher.close()
+                    sources = self._get_linked_sources()
+                    watcher = create_watcher(list(sources) + [manifest_filename], poll_interval)
+
+                manifest_signature = get_stat_signature(manifest_filename)
+                pending = set()
+                first_change = 0.0
+        except KeyboardInterrupt:
+            print("Stopped watching. Run .sync() to sync any changes that were not synced yet.")
+        finally:
+            watcher.close()
+
+    def _get_linked_sources(self) -> Dict[str, List[str]]:
+        """Method to get the source file of every linked file in the Gigantum Project
+
+        Returns:
+            dictionary of absolute source file path to the metadata filenames of the linked files
+        """
+        context = SyncContext()
+        sources: Dict[str, List[str]] = dict()
+        for metadata_filename, data in context.manifest:
+            source_filename = os.path.join(context.project_root, data['gigantum_relative_path'])
+            sources.setdefault(source_filename, list()).append(metadata_filename)
+        return sources
 
     def delete(self) -> None:
         """Removes the link between a Gigantum Project from an Overleaf Project
@@ -167,22 +696,22 @@ class Gigaleaf:
         gigaleaf_config_file = Path(self.overleaf.overleaf_config_file)
         if gigaleaf_config_file.is_file():
             print("Removing integration from Overleaf and Gigantum projects. Please wait...")
-            self.overleaf.pull()
+            self.overleaf.pull_if_changed()
 
             gigantum_overleaf_dir = Path(self.overleaf.overleaf_repo_directory, 'gigantum')
             if gigantum_overleaf_dir.is_dir():
+                # Stage the removal of every file in the Gigantum dir, plus any that were removed but not committed
+                context = SyncContext()
+                for root, _, filenames in os.walk(gigantum_overleaf_dir.as_posix()):
+                    for filename in filenames:
+                        context.record_change(os.path.join(root, filename))
+
                 # Remove Gigantum dir from Overleaf Project if it exists (maybe you haven't synced yet)
                 shutil.rmtree(gigantum_overleaf_dir.as_posix())
 
-                # Commit and Push
-                try:
-                    self.overleaf.commit()
+                # Commit and Push. If you haven't synced yet, removing the dir doesn't change the repository.
+                if self.overleaf.commit(context.get_changes()):
                     self.overleaf.push()
-                except ValueError as err:
-                    if "Your branch is up to date with 'origin/master'" not in str(err):
-                        # If you haven't synced yet, you'll get a git error because removing the dir doesn't actually
-                        # change the repository state. If you get any other error, raise.
-                        raise
 
             # Remove Overleaf Project dir and credentials from Gigantum Project
             overleaf_root_dir = Path(self.gigantum.get_overleaf_root_directory())
@@ -1,21 +1,51 @@
+from typing import List, Optional
 import os
 from pathlib import Path
 
 from gigaleaf.utils import call_subprocess
 
 
+# The root of the Project inside a Gigantum container
+DEFAULT_PROJECT_ROOT = "/mnt/labbook"
+
+# Environment variable to set the project root, e.g. when running outside Gigantum on a compute node
+PROJECT_ROOT_ENV_VAR = "GIGALEAF_PROJECT_ROOT"
+
+
 class Gigantum:
+    # The project root set with `set_project_root()`, which takes precedence over the environment variable
+    _project_root: Optional[str] = None
+
     def __init__(self, overleaf_project_root: str):
-        self.setup_gigantum_in_overleaf(overleaf_project_root)
+        # Files written to the Overleaf Project while setting it up, which must be committed by the next sync
+        self.created_files = self.setup_gigantum_in_overleaf(overleaf_project_root)
 
     @staticmethod
     def get_project_root() -> str:
         """Method to get the project root directory
 
+        The root is the directory set with `set_project_root()`, or the `GIGALEAF_PROJECT_ROOT` environment variable,
+        or `/mnt/labbook` inside Gigantum.
+
         Returns:
             str
         """
-        return "/mnt/labbook"
+        if Gigantum._project_root is not None:
+            return Gigantum._project_root
+
+        return os.environ.get(PROJECT_ROOT_ENV_VAR) or DEFAULT_PROJECT_ROOT
+
+    @staticmethod
+    def set_project_root(project_root: Optional[str]) -> None:
+        """Method to set the project root directory, for every instance of gigaleaf in this process
+
+        Args:
+            project_root: path to the project root, or None to use the environment variable or default again
+
+        Returns:
+            None
+        """
+        Gigantum._project_root = os.path.abspath(project_root) if project_root is not None else None
 
     @staticmethod
     def get_gigantum_directory() -> str:
@@ -45,14 +75,13 @@ class Gigantum:
         return call_subprocess(['git', 'rev-parse', 'HEAD'], Gigantum.get_project_root()).strip()
 
     @staticmethod
-    def setup_gigantum_in_overleaf(overleaf_project_root: str) -> None:
+    def setup_gigantum_in_overleaf(overleaf_project_root: str) -> List[str]:
         """Method to populate the gigantum directory structure and readme in the Overleaf Project
 
         Returns:
-            None
+            absolute paths of the files that were created
         """
         directories = [Path(overleaf_project_root, 'gigantum'),
-                       Path(overleaf_project_root, 'gigantum', 'metadata'),
                        Path(overleaf_project_root, 'gigantum', 'data'),
                        Path(overleaf_project_root, 'gigantum', 'subfiles'),
                        ]
@@ -61,9 +90,14 @@ class Gigantum:
             if not d.is_dir():
                 d.mkdir()
 
-        if not Path(overleaf_project_root, 'gigantum', 'README.txt').is_file():
+        created_files = list()
+        readme_file = Path(overleaf_project_root, 'gigantum', 'README.txt')
+        if not readme_file.is_file():
             readme = Path(Path(__file__).parent.absolute(), 'resources', 'gigantum_readme.txt').read_text()
-            Path(overleaf_project_root, 'gigantum', 'README.txt').write_text(readme)
+            readme_file.write_text(readme)
+            created_files.append(readme_file.as_posix())
+
+        return created_files
 
     @staticmethod
     def commit_overleaf_config_file(config_file_path: str) -> None:
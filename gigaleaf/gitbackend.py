@@ -0,0 +1,329 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Any
+from abc import ABC, abstractmethod
+import io
+import os
+
+from gigaleaf.utils import call_subprocess
+
+try:
+    from dulwich import porcelain  # type: ignore
+    from dulwich.client import get_transport_and_path, default_urllib3_manager  # type: ignore
+    from dulwich.repo import Repo  # type: ignore
+except ImportError:
+    porcelain = None
+
+
+# Messages printed by `git commit` when the index does not differ from HEAD
+NOTHING_TO_COMMIT_MESSAGES = ("nothing to commit", "nothing added to commit", "no changes added to commit")
+
+# The supported git backends, selected with `git_backend` in overleaf.json
+GIT_BACKENDS = ('subprocess', 'dulwich')
+
+
+class GitBackend(ABC):
+    """Abstract class for the git operations gigaleaf runs against the Overleaf Project repository"""
+    def __init__(self, repo_directory: str, git_url: str, get_credentials: Callable[[], Tuple[str, str]]) -> None:
+        """
+        Args:
+            repo_directory: absolute path to the local Overleaf Project repository
+            git_url: the URL of the Overleaf Project git remote
+            get_credentials: function returning the Overleaf email and password. It is called the first time the
+                             remote is accessed.
+        """
+        self.repo_directory = repo_directory
+        self.git_url = git_url
+        self._get_credentials = get_credentials
+        self._credentials: Optional[Tuple[str, str]] = None
+
+    @property
+    def credentials(self) -> Tuple[str, str]:
+        """The Overleaf email and password, loaded once and then kept in memory
+
+        Returns:
+            a tuple containing the email address and password
+        """
+        if self._credentials is None:
+            self._credentials = self._get_credentials()
+        return self._credentials
+
+    @abstractmethod
+    def clone(self, clone_args: Sequence[str], sparse_checkout: bool = False) -> str:
+        """Method to clone the Overleaf Project into the repository directory
+
+        Args:
+            clone_args: extra arguments for `git clone`, e.g. `['--depth', '1']`
+            sparse_checkout: if True, only check out the files in the root and the `gigantum` directory
+
+        Returns:
+            the output from git
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def pull(self) -> str:
+        """Method to pull changes from the Overleaf remote
+
+        Returns:
+            the output from git
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def push(self) -> str:
+        """Method to push changes to the Overleaf remote
+
+        Returns:
+            the output from git
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stage(self, paths: Sequence[str]) -> None:
+        """Method to stage a set of files. Files that exist are added and files that don't are removed from the index.
+
+        Args:
+            paths: paths to files, relative to the root of the repository
+
+        Returns:
+            None
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def commit(self, message: str) -> bool:
+        """Method to commit the staged changes
+
+        Args:
+            message: the commit message
+
+        Returns:
+            True if a commit was created, False if the index does not differ from HEAD
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_remote_head(self) -> Optional[str]:
+        """Method to get the commit the remote's HEAD points to, without fetching anything
+
+        Returns:
+            the commit hash, or None if the remote has no commits yet
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_head(self) -> str:
+        """Method to get the commit the local HEAD points to
+
+        Returns:
+            the commit hash
+        """
+        raise NotImplementedError
+
+
+class SubprocessGitBackend(GitBackend):
+    """Git backend that runs the `git` command line tool, with credentials provided by `gigaleaf_askpass`"""
+    def __init__(self, repo_directory: str, git_url: str, get_credentials: Callable[[], Tuple[str, str]]) -> None:
+        super().__init__(repo_directory, git_url, get_credentials)
+
+        # Environment variables for git subprocesses, built the first time they are needed
+        self._git_env: Optional[Dict[str, str]] = None
+
+    def _get_git_env(self) -> Dict[str, str]:
+        """Method to get the environment variables for git subprocesses, including the credentials for askpass
+
+        Returns:
+            dictionary of environment variables
+        """
+        if self._git_env is None:
+            email, password = self.credentials
+            env_vars = dict(os.environ)
+            env_vars['OVERLEAF_EMAIL'] = email
+            env_vars['OVERLEAF_PASSWORD'] = password
+            env_vars['GIT_ASKPASS'] = "gigaleaf_askpass"
+            self._git_env = env_vars
+
+        return self._git_env
+
+    def _git(self, cmd_tokens: List[str], input_data: Optional[bytes] = None) -> str:
+        """Execute a git command in the repository directory
+
+        Args:
+            cmd_tokens: List of command tokens, e.g., ['status', '--porcelain']
+            input_data: optional bytes to write to the stdin of the git process
+
+        Returns:
+            Decoded stdout of called process after completing
+        """
+        return call_subprocess(['git'] + cmd_tokens, self.repo_directory, check=True, shell=False,
+                               env=self._get_git_env(), input_data=input_data)
+
+    def clone(self, clone_args: Sequence[str], sparse_checkout: bool = False) -> str:
+        args = list(clone_args)
+        if sparse_checkout:
+            # Only check out the files in the root of the project
+            args.append('--sparse')
+
+        output = self._git(['clone'] + args + [self.git_url, self.repo_directory])
+        if sparse_checkout:
+            output += self._git(['sparse-checkout', 'set', 'gigantum'])
+
+        return output
+
+    def pull(self) -> str:
+        return self._git(['pull'])
+
+    def push(self) -> str:
+        return self._git(['push'])
+
+    def stage(self, paths: Sequence[str]) -> None:
+        # Paths are sent on stdin, so any number of files are staged with a single git process
+        input_data = b"".join([os.fsencode(p) + b"\0" for p in paths])
+        self._git(['update-index', '--add', '--remove', '-z', '--stdin'], input_data=input_data)
+
+    def commit(self, message: str) -> bool:
+        try:
+            self._git(['commit', '-m', message])
+        except ValueError as err:
+            # git exits with an error if the staged files are identical to the last commit
+            if any(msg in str(err) for msg in NOTHING_TO_COMMIT_MESSAGES):
+                return False
+            raise
+
+        return True
+
+    def get_remote_head(self) -> Optional[str]:
+        tokens = self._git(['ls-remote', 'origin', 'HEAD']).split()
+        return tokens[0] if tokens else None
+
+    def get_head(self) -> str:
+        return self._git(['rev-parse', 'HEAD']).strip()
+
+
+class DulwichGitBackend(SubprocessGitBackend):
+    """Git backend that runs git operations in-process with dulwich, a pure-Python git implementation
+
+    Credentials are passed directly to dulwich rather than through `gigaleaf_askpass`, and a single HTTP connection
+    pool is shared by every request to the remote. Cloning is a one time operation that needs all the clone modes, so
+    it is still done by the `git` command line tool.
+    """
+    def __init__(self, repo_directory: str, git_url: str, get_credentials: Callable[[], Tuple[str, str]]) -> None:
+        if porcelain is None:
+            raise ValueError("The dulwich git backend requires dulwich. Install it with `pip install dulwich`.")
+
+        super().__init__(repo_directory, git_url, get_credentials)
+        self._pool_manager: Any = None
+
+    def _get_transport_kwargs(self) -> Dict[str, Any]:
+        """Method to get the arguments used to connect to the remote, creating the shared connection pool if needed
+
+        Returns:
+            dictionary of keyword arguments for dulwich
+        """
+        if self._pool_manager is None:
+            self._pool_manager = default_urllib3_manager(None)
+
+        email, password = self.credentials
+        return {"username": email, "password": password, "pool_manager": self._pool_manager}
+
+    def _run(self, operation: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> str:
+        """Helper to run a dulwich porcelain function, collecting its output and surfacing errors as a ValueError
+
+        Args:
+            operation: name of the operation, used in error messages
+            fn: the porcelain function
+            *args: positional arguments for `fn`
+            **kwargs: keyword arguments for `fn`
+
+        Returns:
+            the decoded output of the operation
+        """
+        outstream = io.BytesIO()
+        errstream = io.BytesIO()
+        try:
+            fn(*args, outstream=outstream, errstream=errstream, **kwargs)
+        except Exception as err:
+            raise ValueError(f"An error occurred in a git operation:\noperation: {operation}\n"
+                             f"error: {type(err).__name__}: {err}\noutput: {errstream.getvalue().decode()}")
+
+        return outstream.getvalue().decode() + errstream.getvalue().decode()
+
+    def pull(self) -> str:
+        return self._run('pull', porcelain.pull, self.repo_directory, 'origin', **self._get_transport_kwargs())
+
+    def push(self) -> str:
+        return self._run('push', porcelain.push, self.repo_directory, 'origin', **self._get_transport_kwargs())
+
+    def stage(self, paths: Sequence[str]) -> None:
+        with Repo(self.repo_directory) as repo:
+            # Remove files that no longer exist from the index, then add the rest
+            to_add = list()
+            index = repo.open_index()
+            for path in paths:
+                filename = os.path.join(self.repo_directory, path)
+                if os.path.lexists(filename):
+                    to_add.append(filename)
+                elif os.fsencode(path) in index:
+                    del index[os.fsencode(path)]
+            index.write()
+
+            if to_add:
+                porcelain.add(repo, to_add)
+
+    def commit(self, message: str) -> bool:
+        with Repo(self.repo_directory) as repo:
+            tree_id = repo.open_index().commit(repo.object_store)
+            if tree_id == repo[repo.head()].tree:
+                return False
+
+            porcelain.commit(repo, message.encode())
+            return True
+
+    def get_remote_head(self) -> Optional[str]:
+        client, path = get_transport_and_path(self.git_url, **self._get_transport_kwargs())
+        try:
+            result = client.get_refs(path)
+        except Exception as err:
+            raise ValueError(f"An error occurred in a git operation:\noperation: ls-remote\n"
+                             f"error: {type(err).__name__}: {err}")
+
+        # Newer versions of dulwich wrap the refs in a result object
+        refs = getattr(result, 'refs', result)
+        head = refs.get(b'HEAD')
+        return head.decode() if head is not None else None
+
+    def get_head(self) -> str:
+        with Repo(self.repo_directory) as repo:
+            return str(repo.head().decode())
+
+
+def get_git_backend(name: str, repo_directory: str, git_url: str, get_credentials: Callable[[], Tuple[str, str]],
+                    clone_mode: str = 'full', sparse_checkout: bool = False) -> GitBackend:
+    """Method to create the configured git backend, falling back to the subprocess backend if it can't be used
+
+    The dulwich backend does not support partial clones, shallow clones or sparse checkouts, so it is only used for
+    full clones.
+
+    Args:
+        name: the name of the backend, one of `GIT_BACKENDS`
+        repo_directory: absolute path to the local Overleaf Project repository
+        git_url: the URL of the Overleaf Project git remote
+        get_credentials: function returning the Overleaf email and password
+        clone_mode: the clone mode of the repository
+        sparse_checkout: True if the repository uses a sparse checkout
+
+    Returns:
+        GitBackend
+    """
+    if name not in GIT_BACKENDS:
+        raise ValueError(f"Unsupported git backend: {name}. Supported backends are: {', '.join(GIT_BACKENDS)}")
+
+    if name == 'dulwich':
+        if porcelain is None:
+            print("The dulwich git backend is not available. Install it with `pip install gigaleaf[dulwich]`. "
+                  "Using the git command line tool instead.")
+        elif clone_mode != 'full' or sparse_checkout:
+            print("The dulwich git backend only supports full clones. Using the git command line tool instead.")
+        else:
+            return DulwichGitBackend(repo_directory, git_url, get_credentials)
+
+    return SubprocessGitBackend(repo_directory, git_url, get_credentials)
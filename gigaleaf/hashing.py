@@ -0,0 +1,136 @@
+from typing import Callable, Dict, List, Any
+import hashlib
+
+from gigaleaf import tracing
+
+try:
+    import xxhash  # type: ignore
+except ImportError:
+    xxhash = None
+
+
+# The algorithm used for new content hashes
+DEFAULT_ALGORITHM = 'blake2b'
+
+# The algorithm used by older versions of gigaleaf, assumed for metadata that does not record an algorithm
+LEGACY_ALGORITHM = 'md5'
+
+# The number of bytes read at a time when hashing or copying files
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
+def _blake2b() -> Any:
+    """Helper to create a BLAKE2b hasher with a 256 bit digest"""
+    return hashlib.blake2b(digest_size=32)
+
+
+_ALGORITHMS: Dict[str, Callable[[], Any]] = {'md5': hashlib.md5,
+                                             'sha256': hashlib.sha256,
+                                             'blake2b': _blake2b}
+if xxhash is not None:
+    _ALGORITHMS['xxh64'] = xxhash.xxh64
+    if hasattr(xxhash, 'xxh3_64'):
+        _ALGORITHMS['xxh3_64'] = xxhash.xxh3_64
+
+
+def get_hash_algorithms() -> List[str]:
+    """Method to get the names of all hash algorithms available in this environment
+
+    Returns:
+        list of algorithm names
+    """
+    return sorted(_ALGORITHMS.keys())
+
+
+def resolve_hash_algorithm(algorithm: str) -> str:
+    """Method to get the algorithm to use for new hashes, falling back to the default if it is not available
+
+    For example, a project may be configured to use xxhash, but a collaborator may not have it installed.
+
+    Args:
+        algorithm: the name of the requested algorithm
+
+    Returns:
+        the name of an available algorithm
+    """
+    if algorithm in _ALGORITHMS:
+        return algorithm
+
+    print(f"Hash algorithm `{algorithm}` is not available. Using `{DEFAULT_ALGORITHM}` instead.")
+    return DEFAULT_ALGORITHM
+
+
+def new_hasher(algorithm: str = DEFAULT_ALGORITHM) -> Any:
+    """Method to create a new hasher object for an algorithm
+
+    Args:
+        algorithm: the name of the algorithm
+
+    Returns:
+        a hasher object with `update()` and `hexdigest()` methods
+    """
+    try:
+        return _ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}. Available algorithms are: "
+                         f"{', '.join(get_hash_algorithms())}")
+
+
+def hash_file(filename: str, algorithm: str = DEFAULT_ALGORITHM, buffer_size: int = DEFAULT_BUFFER_SIZE) -> str:
+    """Method to hash a file's contents
+
+    Args:
+        filename: absolute path to the file to hash
+        algorithm: the name of the hash algorithm to use
+        buffer_size: the number of bytes to read at a time
+
+    Returns:
+        hex digest of the file contents
+    """
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    total_bytes = 0
+    with open(filename, 'rb') as fh:
+        while True:
+            num_bytes = fh.readinto(buffer)
+            if not num_bytes:
+                break
+            hasher.update(view[:num_bytes])
+            total_bytes += num_bytes
+
+    tracing.count('bytes_read', total_bytes)
+    return str(hasher.hexdigest())
+
+
+def copy_and_hash_file(src: str, dst: str, algorithm: str = DEFAULT_ALGORITHM,
+                       buffer_size: int = DEFAULT_BUFFER_SIZE) -> str:
+    """Method to copy a file and hash its contents in a single pass
+
+    The hash is computed over the same buffers that are written to `dst`, so it always describes the copied data.
+
+    Args:
+        src: absolute path to the file to copy
+        dst: absolute path to write the copy to
+        algorithm: the name of the hash algorithm to use
+        buffer_size: the number of bytes to read at a time
+
+    Returns:
+        hex digest of the copied data
+    """
+    hasher = new_hasher(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    total_bytes = 0
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        while True:
+            num_bytes = fs.readinto(buffer)
+            if not num_bytes:
+                break
+            hasher.update(view[:num_bytes])
+            fd.write(view[:num_bytes])
+            total_bytes += num_bytes
+
+    tracing.count('bytes_read', total_bytes)
+    tracing.count('bytes_written', total_bytes)
+    return str(hasher.hexdigest())
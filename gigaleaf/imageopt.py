@@ -0,0 +1,217 @@
+from typing import List, Optional, Tuple
+from dataclasses import dataclass
+import io
+import zlib
+
+try:
+    from PIL import Image  # type: ignore
+except ImportError:
+    Image = None
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Ancillary chunks that only hold metadata (e.g. the software that wrote the file) and don't affect how the image is
+# displayed
+METADATA_CHUNKS = (b"tEXt", b"zTXt", b"iTXt", b"tIME", b"eXIf")
+
+# The maximum size of each IDAT chunk written
+IDAT_CHUNK_SIZE = 1024 * 1024
+
+# Bump when the output of the optimizer changes, so cached results are not reused
+OPTIMIZER_VERSION = 1
+
+
+@dataclass
+class ImageOptions:
+    """Dataclass to store how images are optimized before they are copied into the Overleaf Project"""
+    # Losslessly recompress PNG files and strip their metadata chunks
+    optimize: bool = False
+    # If set, downsample PNG files with a higher resolution to this many dots per inch. Requires Pillow.
+    max_dpi: Optional[int] = None
+
+    @property
+    def key(self) -> Optional[str]:
+        """A short string identifying the options, used to name cached results
+
+        Returns:
+            the key, or None if images are copied as they are
+        """
+        if not self.optimize and self.max_dpi is None:
+            return None
+
+        key = f"v{OPTIMIZER_VERSION}"
+        if self.optimize:
+            key += "-z"
+        if self.max_dpi is not None:
+            key += f"-dpi{self.max_dpi}"
+        return key
+
+
+def get_image_options(optimize: bool = False, max_dpi: Optional[int] = None) -> ImageOptions:
+    """Method to create the image options, dropping downsampling if Pillow is not installed
+
+    Args:
+        optimize: if True, losslessly recompress PNG files and strip their metadata
+        max_dpi: if set, downsample PNG files to this many dots per inch
+
+    Returns:
+        ImageOptions
+    """
+    if max_dpi is not None and max_dpi <= 0:
+        raise ValueError(f"Invalid image_max_dpi: {max_dpi}. It must be a positive number.")
+
+    if max_dpi is not None and Image is None:
+        print("Downsampling images requires Pillow. Install it with `pip install gigaleaf[images]`. "
+              "Images will not be downsampled.")
+        max_dpi = None
+
+    return ImageOptions(optimize=optimize, max_dpi=max_dpi)
+
+
+def read_png_chunks(data: bytes) -> List[Tuple[bytes, bytes]]:
+    """Method to split a PNG file into its chunks
+
+    Args:
+        data: the contents of the PNG file
+
+    Returns:
+        list of (chunk type, chunk data) tuples
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Not a PNG file")
+
+    chunks = list()
+    view = memoryview(data)
+    offset = len(PNG_SIGNATURE)
+    while offset < len(data):
+        if offset + 8 > len(data):
+            raise ValueError("Truncated PNG chunk header")
+        length = int.from_bytes(view[offset:offset + 4], 'big')
+        chunk_type = bytes(view[offset + 4:offset + 8])
+        end = offset + 8 + length + 4
+        if end > len(data):
+            raise ValueError(f"Truncated PNG chunk: {chunk_type!r}")
+        chunks.append((chunk_type, bytes(view[offset + 8:offset + 8 + length])))
+        offset = end
+        if chunk_type == b"IEND":
+            break
+
+    return chunks
+
+
+def write_png_chunks(chunks: List[Tuple[bytes, bytes]]) -> bytes:
+    """Method to assemble a PNG file from its chunks
+
+    Args:
+        chunks: list of (chunk type, chunk data) tuples
+
+    Returns:
+        the contents of the PNG file
+    """
+    parts = [PNG_SIGNATURE]
+    for chunk_type, chunk_data in chunks:
+        parts.append(len(chunk_data).to_bytes(4, 'big'))
+        parts.append(chunk_type)
+        parts.append(chunk_data)
+        parts.append(zlib.crc32(chunk_type + chunk_data).to_bytes(4, 'big'))
+    return b"".join(parts)
+
+
+def recompress_png(data: bytes, strip_metadata: bool = True) -> bytes:
+    """Method to losslessly shrink a PNG file by recompressing its image data at the highest zlib level
+
+    The filtered scanlines are kept exactly as they are, so the decoded pixels are identical. Only the DEFLATE stream
+    is rebuilt, trying a few zlib strategies and keeping the smallest.
+
+    Args:
+        data: the contents of the PNG file
+        strip_metadata: if True, also remove chunks that only hold metadata, e.g. text and timestamps
+
+    Returns:
+        the contents of the optimized PNG file, or `data` if it could not be made smaller
+    """
+    chunks = read_png_chunks(data)
+    image_data = [chunk_data for chunk_type, chunk_data in chunks if chunk_type == b"IDAT"]
+    if not image_data:
+        raise ValueError("PNG file has no image data")
+    try:
+        raw = zlib.decompress(b"".join(image_data))
+    except zlib.error as err:
+        raise ValueError(f"Invalid PNG image data: {err}")
+
+    candidates = list()
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidates.append(compressor.compress(raw) + compressor.flush())
+    compressed = min(candidates, key=len)
+
+    optimized_chunks = list()
+    idat_written = False
+    for chunk_type, chunk_data in chunks:
+        if chunk_type == b"IDAT":
+            if not idat_written:
+                # All the image data is written where the first IDAT chunk was
+                for start in range(0, max(len(compressed), 1), IDAT_CHUNK_SIZE):
+                    optimized_chunks.append((b"IDAT", compressed[start:start + IDAT_CHUNK_SIZE]))
+                idat_written = True
+        elif not (strip_metadata and chunk_type in METADATA_CHUNKS):
+            optimized_chunks.append((chunk_type, chunk_data))
+
+    optimized = write_png_chunks(optimized_chunks)
+    return optimized if len(optimized) < len(data) else data
+
+
+def downsample_png(data: bytes, max_dpi: int) -> bytes:
+    """Method to reduce the resolution of a PNG file to at most `max_dpi`, keeping its physical size
+
+    Images that don't record their resolution, or are already at or below `max_dpi`, are not changed. Requires Pillow.
+
+    Args:
+        data: the contents of the PNG file
+        max_dpi: the maximum resolution in dots per inch
+
+    Returns:
+        the contents of the downsampled PNG file, or `data` if it was not changed
+    """
+    if Image is None:
+        raise ValueError("Downsampling images requires Pillow. Install it with `pip install Pillow`.")
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            dpi = img.info.get('dpi')
+            if not dpi or max(dpi) <= max_dpi:
+                return data
+
+            scale = max_dpi / max(dpi)
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            if img.mode in ('1', 'P'):
+                # Palette images can only be resized with nearest neighbor sampling, so convert them first
+                img = img.convert('RGBA')
+            resample = getattr(Image, 'Resampling', Image).LANCZOS
+
+            output = io.BytesIO()
+            img.resize(size, resample).save(output, format='PNG', dpi=(dpi[0] * scale, dpi[1] * scale))
+            return output.getvalue()
+    except (OSError, SyntaxError) as err:
+        # Pillow raises these for files it can't decode
+        raise ValueError(f"Invalid PNG file: {err}")
+
+
+def optimize_image(data: bytes, options: ImageOptions) -> bytes:
+    """Method to apply the image options to a PNG file
+
+    Raises ValueError if the file is not a valid PNG file.
+
+    Args:
+        data: the contents of the PNG file
+        options: how to optimize the image
+
+    Returns:
+        the contents of the optimized PNG file
+    """
+    if options.max_dpi is not None:
+        data = downsample_png(data, options.max_dpi)
+    if options.optimize:
+        data = recompress_png(data)
+    return data
@@ -0,0 +1,505 @@
+from typing import Any, Dict, Iterable, List, Optional
+from dataclasses import dataclass
+import csv
+import hashlib
+import json
+import re
+
+from gigaleaf.csvwindow import CSV_ENCODING
+
+try:
+    import numpy
+    import pandas  # type: ignore
+except ImportError:
+    numpy = None  # type: ignore
+    pandas = None
+
+
+# Bump when the output of the renderers changes, so cached tables are regenerated
+RENDERER_VERSION = 1
+
+# The `DataFrame.to_latex` arguments supported by `render_dataframe()`. Others are rendered with `to_latex`.
+SUPPORTED_TO_LATEX_KWARGS = {'index', 'float_format', 'columns', 'header', 'escape', 'column_format', 'na_rep',
+                             'caption', 'label'}
+
+# Float formats that are formatted for a whole column at once, e.g. `%.2f`, and the most digits they can have
+FIXED_POINT_FORMAT = re.compile(r'%\.(\d+)f')
+MAX_FIXED_POINT_DIGITS = 15
+
+# Characters with a special meaning in LaTeX, and how to typeset them literally
+LATEX_ESCAPES = str.maketrans({
+    '\\': r'\textbackslash{}',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+    '\r': ' ',
+    '\n': ' ',
+})
+
+# The same escapes as written by `DataFrame.to_latex`, so both dataframe renderers produce identical tables
+DATAFRAME_LATEX_ESCAPES = str.maketrans({
+    '\\': '\\textbackslash ',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': '\\textasciitilde ',
+    '^': '\\textasciicircum ',
+})
+
+
+def escape_latex(text: str) -> str:
+    """Method to escape a string so LaTeX typesets it literally
+
+    Args:
+        text: the string to escape
+
+    Returns:
+        the escaped string
+    """
+    return text.translate(LATEX_ESCAPES)
+
+
+def get_render_key(column_format: Optional[str], formats: Optional[Dict[str, str]], escape: bool) -> str:
+    """Method to get a short string identifying how a table is rendered, used to name cached tables
+
+    Args:
+        column_format: the tabular column specification, or None to pick one from the data
+        formats: format specifications for the values in each column, by column name
+        escape: if True, special LaTeX characters are escaped
+
+    Returns:
+        the key
+    """
+    settings = {'column_format': column_format, 'formats': formats, 'escape': escape}
+    digest = hashlib.md5(json.dumps(settings, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+    return f"v{RENDERER_VERSION}-{digest[:12]}"
+
+
+def _is_number(value: str) -> bool:
+    """Helper to check if a value is a number, so its column is right aligned
+
+    Args:
+        value: the value from the table
+
+    Returns:
+        bool
+    """
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _format_value(value: str, spec: Optional[str]) -> str:
+    """Helper to apply a format specification to a numeric value, leaving other values as they are
+
+    Args:
+        value: the value from the table
+        spec: a Python format specification, e.g. `.2f` or `,d`
+
+    Returns:
+        the formatted value
+    """
+    if spec is None:
+        return value
+
+    try:
+        number = float(value)
+        if number.is_integer() and spec.endswith(('d', 'n')):
+            return format(int(number), spec)
+        return format(number, spec)
+    except ValueError:
+        # Not a number, or the specification doesn't apply to this value
+        return value
+
+
+@dataclass
+class TableLines:
+    """The rendered lines of a booktabs table, before they are wrapped in a `tabular` or `longtable` environment"""
+    # The column specification, e.g. `lrr`
+    column_format: str
+    # The header rows, each ending with `\\`
+    header: List[str]
+    # The body rows, each ending with `\\`
+    rows: List[str]
+
+
+def _get_table_lines(rows: Iterable[List[str]], column_format: Optional[str] = None,
+                     formats: Optional[Dict[str, str]] = None, escape: bool = True) -> Optional[TableLines]:
+    """Helper to render table rows to lines, as they are read
+
+    Args:
+        rows: the header row followed by the data rows
+        column_format: the tabular column specification, or None to pick one from the data
+        formats: Python format specifications for the numbers in each column, by column name
+        escape: if True, special LaTeX characters in the values are escaped
+
+    Returns:
+        TableLines, or None if there is no header row
+    """
+    iterator = iter(rows)
+    header = next(iterator, None)
+    if header is None:
+        return None
+
+    num_columns = len(header)
+    specs = [formats.get(name) if formats else None for name in header]
+    numeric = [True] * num_columns
+    escaper = escape_latex if escape else str
+
+    lines = list()
+    for row in iterator:
+        # Pad or truncate ragged rows to the width of the header
+        row = (row + [''] * num_columns)[:num_columns]
+        for i, value in enumerate(row):
+            if numeric[i] and value != '' and not _is_number(value):
+                numeric[i] = False
+        lines.append(" & ".join([escaper(_format_value(v, s)) for v, s in zip(row, specs)]) + " \\\\")
+
+    if column_format is None:
+        column_format = "".join(['r' if n else 'l' for n in numeric])
+
+    return TableLines(column_format, [" & ".join([escaper(value) for value in header]) + " \\\\"], lines)
+
+
+def render_tabular(rows: Iterable[List[str]], column_format: Optional[str] = None,
+                   formats: Optional[Dict[str, str]] = None, escape: bool = True) -> str:
+    """Method to render table rows as a booktabs `tabular` environment
+
+    The rows are rendered as they are read, so only the rendered lines are held in memory.
+
+    Args:
+        rows: the header row followed by the data rows
+        column_format: the tabular column specification, e.g. `lrr`. If omitted, columns that only hold numbers are
+                       right aligned and all others are left aligned.
+        formats: Python format specifications for the numbers in each column, by column name, e.g. `{"p": ".3f"}`
+        escape: if True, special LaTeX characters in the values are escaped
+
+    Returns:
+        the tabular environment
+    """
+    table = _get_table_lines(rows, column_format, formats, escape)
+    if table is None:
+        return "\\begin{tabular}{l}\n\\end{tabular}"
+
+    lines = ["\\toprule"] + table.header + ["\\midrule"] + table.rows + ["\\bottomrule"]
+    return f"\\begin{{tabular}}{{{table.column_format}}}\n" + "\n".join(lines) + "\n\\end{tabular}"
+
+
+def render_csv_tabular(filename: str, column_format: Optional[str] = None, formats: Optional[Dict[str, str]] = None,
+                       escape: bool = True) -> str:
+    """Method to render a CSV file as a booktabs `tabular` environment, reading the file once
+
+    Args:
+        filename: absolute path to the CSV file
+        column_format: the tabular column specification, e.g. `lrr`. If omitted, it is picked from the data.
+        formats: Python format specifications for the numbers in each column, by column name
+        escape: if True, special LaTeX characters in the values are escaped
+
+    Returns:
+        the tabular environment
+    """
+    # Bytes that are not valid text can't be typeset, so they are replaced
+    with open(filename, 'rt', encoding=CSV_ENCODING, errors='replace', newline='') as f:
+        return render_tabular(csv.reader(f), column_format, formats, escape)
+
+
+def get_csv_table_lines(filename: str, column_format: Optional[str] = None, formats: Optional[Dict[str, str]] = None,
+                        escape: bool = True) -> TableLines:
+    """Method to render a CSV file to table lines, reading the file once
+
+    Args:
+        filename: absolute path to the CSV file
+        column_format: the tabular column specification, e.g. `lrr`. If omitted, it is picked from the data.
+        formats: Python format specifications for the numbers in each column, by column name
+        escape: if True, special LaTeX characters in the values are escaped
+
+    Returns:
+        TableLines
+    """
+    with open(filename, 'rt', encoding=CSV_ENCODING, errors='replace', newline='') as f:
+        table = _get_table_lines(csv.reader(f), column_format, formats, escape)
+
+    return table if table is not None else TableLines(column_format or 'l', [], [])
+
+
+def can_render_dataframe(df: Any, to_latex_kwargs: Dict[str, Any]) -> bool:
+    """Method to check if `render_dataframe()` supports a dataframe and the arguments it would be given
+
+    Args:
+        df: the pandas.DataFrame to render
+        to_latex_kwargs: the arguments for `DataFrame.to_latex`
+
+    Returns:
+        True if it is supported, False if the table should be rendered with `to_latex`
+    """
+    if pandas is None or not set(to_latex_kwargs.keys()) <= SUPPORTED_TO_LATEX_KWARGS:
+        return False
+
+    if isinstance(df.columns, pandas.MultiIndex) or isinstance(df.index, pandas.MultiIndex):
+        return False
+
+    columns = to_latex_kwargs.get('columns')
+    selected = df[columns] if columns is not None else df
+    # Dates, durations and complex numbers are formatted differently by pandas
+    return all([dtype.kind not in 'mMc' for dtype in selected.dtypes]) and df.index.dtype.kind not in 'mMc'
+
+
+def _format_fixed_point(array: Any, digits: int) -> List[str]:
+    """Helper to format a column of floating point numbers like the `%.<digits>f` format, for the whole column at once
+
+    Each number is rounded to an integer number of units of the last digit, and the digits of all the numbers are
+    written into one byte matrix with integer arithmetic. Multiplying by the scale is only off by up to one ulp, so the
+    rounding is only trusted away from ties. Numbers that are too close to a tie to be sure, too large to round exactly,
+    or not finite are formatted one at a time with `%`, which rounds the exact binary value. This gives output identical
+    to `%` formatting.
+
+    Args:
+        array: numpy.ndarray of floating point numbers
+        digits: the number of digits after the decimal point
+
+    Returns:
+        the formatted values
+    """
+    # Widening is exact, and `%` formats the same double
+    array = numpy.asarray(array, dtype=numpy.float64)
+    with numpy.errstate(over='ignore', invalid='ignore'):
+        scaled = numpy.abs(array) * (10.0 ** digits)
+        floor = numpy.floor(scaled)
+        fraction = scaled - floor
+        exact = (numpy.abs(fraction - 0.5) > 2 * numpy.spacing(scaled)) & (scaled < 2.0 ** 53)
+    rounded = numpy.where(exact, floor + (fraction > 0.5), 0).astype(numpy.int64)
+
+    # Right-align every number in a fixed-width row of ASCII characters, padded with spaces
+    num_int_digits = len(str(int(rounded.max()) // (10 ** digits))) if len(rounded) else 1
+    width = 1 + num_int_digits + (digits + 1 if digits > 0 else 0) + 1
+    chars = numpy.full((len(rounded), width), ord(' '), dtype=numpy.uint8)
+    remainder = rounded
+    position = width - 2
+    for _ in range(digits):
+        chars[:, position] = ord('0') + remainder % 10
+        remainder = remainder // 10
+        position -= 1
+    if digits > 0:
+        chars[:, position] = ord('.')
+        position -= 1
+    # There is always at least one digit before the decimal point
+    chars[:, position] = ord('0') + remainder % 10
+    remainder = remainder // 10
+    sign_position = numpy.full(len(rounded), position - 1)
+    position -= 1
+    for _ in range(num_int_digits - 1):
+        more = remainder > 0
+        chars[:, position] = numpy.where(more, ord('0') + remainder % 10, ord(' '))
+        sign_position -= more
+        remainder = remainder // 10
+        position -= 1
+    # Like `%`, negative numbers that round to zero (and -0.0) keep their sign
+    negative = numpy.flatnonzero(numpy.signbit(array))
+    chars[negative, sign_position[negative]] = ord('-')
+
+    # Splitting on the padding gives the numbers without it
+    formatted: List[str] = chars.tobytes().decode('ascii').split()
+    fmt = f"%.{digits}f"
+    for i in numpy.flatnonzero(~exact).tolist():
+        formatted[i] = fmt % array[i]
+    return formatted
+
+
+def _format_floats(array: Any, float_format: Any) -> Any:
+    """Helper to format floating point numbers like `to_latex`
+
+    Args:
+        array: numpy.ndarray of floating point numbers
+        float_format: a `%` format string or a function to format floating point numbers, or None for the default
+
+    Returns:
+        numpy.ndarray of the formatted values, with dtype object
+    """
+    if callable(float_format):
+        return numpy.array([float_format(v) for v in array.tolist()], dtype=object)
+
+    fmt = float_format if float_format is not None else f"%.{pandas.get_option('display.precision')}f"
+    match = FIXED_POINT_FORMAT.fullmatch(fmt)
+    if match is not None and int(match.group(1)) <= MAX_FIXED_POINT_DIGITS:
+        return numpy.array(_format_fixed_point(array, int(match.group(1))), dtype=object)
+
+    # Other formats, e.g. `%.3e`, are applied one value at a time
+    return numpy.array([fmt % v for v in array.tolist()], dtype=object)
+
+
+def _format_values(values: Any, float_format: Any, na_rep: str, escape: bool) -> List[str]:
+    """Helper to format a whole column of values at once
+
+    Integers, booleans and text are converted and escaped with NumPy and pandas operations over the whole column.
+    Floating point numbers are formatted for the whole column with `_format_fixed_point()` when the format is a plain
+    fixed-point format like the default `%.6f`. Other float formats, and functions, are applied one value at a time.
+
+    Args:
+        values: a pandas.Series or pandas.Index
+        float_format: a `%` format string or a function to format floating point numbers, or None for the default
+        na_rep: the string to use for missing values
+        escape: if True, special LaTeX characters in text values are escaped
+
+    Returns:
+        the formatted values
+    """
+    if not isinstance(values.dtype, numpy.dtype):
+        # Extension types, e.g. nullable integers, keep their values as Python objects
+        array = values.to_numpy(dtype=object)
+    else:
+        array = values.to_numpy()
+
+    kind = array.dtype.kind
+    if kind == 'f':
+        missing = numpy.isnan(array)
+        formatted = _format_floats(array, float_format)
+        formatted[missing] = na_rep
+    elif kind in 'iu':
+        formatted = array.astype(str).astype(object)
+    elif kind == 'b':
+        formatted = numpy.where(array, 'True', 'False').astype(object)
+    else:
+        missing = pandas.isna(array)
+        strings = pandas.Series(array, dtype=object).astype(str)
+        if escape:
+            strings = strings.str.translate(DATAFRAME_LATEX_ESCAPES)
+        formatted = strings.to_numpy(dtype=object)
+        if pandas.api.types.infer_dtype(array, skipna=True) not in ('string', 'empty'):
+            # Like pandas, format numbers in columns of mixed values as in a column of floating point numbers
+            is_float = numpy.array([isinstance(v, float) for v in array.tolist()], dtype=bool) & ~missing
+            if is_float.any():
+                formatted[is_float] = _format_floats(array[is_float].astype(float), float_format)
+        formatted[missing] = na_rep
+
+    return list(formatted.tolist())
+
+
+def get_dataframe_table_lines(df: Any, index: bool = True, float_format: Any = None,
+                              columns: Optional[List[str]] = None, header: Any = True, escape: Optional[bool] = None,
+                              column_format: Optional[str] = None, na_rep: str = 'NaN') -> TableLines:
+    """Method to render a dataframe to table lines, formatting each column at once
+
+    The arguments have the same meaning as for `render_dataframe()`.
+
+    Returns:
+        TableLines
+    """
+    legacy_pandas = int(pandas.__version__.split('.')[0]) < 2
+    if escape is None:
+        # pandas escapes by default before version 2
+        escape = legacy_pandas
+
+    if columns is not None:
+        # Since version 2, pandas hides the other columns instead of reordering them
+        df = df[columns] if legacy_pandas else df[[c for c in df.columns if c in columns]]
+
+    def escaper(text: str) -> str:
+        return text.translate(DATAFRAME_LATEX_ESCAPES) if escape else text
+
+    cells = [_format_values(df.iloc[:, i], float_format, na_rep, escape) for i in range(df.shape[1])]
+    names = [str(c) for c in df.columns]
+    alignments = ['r' if pandas.api.types.is_numeric_dtype(dtype) else 'l' for dtype in df.dtypes]
+    if index:
+        # `to_latex` does not apply float_format to the index
+        cells.insert(0, _format_values(df.index, None, na_rep, escape))
+        names.insert(0, '')
+        alignments.insert(0, 'l')
+
+    header_lines = list()
+    if header is not False:
+        if header is not True:
+            names = ([''] if index else []) + [str(h) for h in header]
+        header_lines.append(" & ".join([escaper(n) for n in names]) + " \\\\")
+    if index and df.index.name is not None:
+        header_lines.append(" & ".join([escaper(str(df.index.name))] + [''] * df.shape[1]) + " \\\\")
+
+    rows = [" & ".join(row) + " \\\\" for row in zip(*cells)] if cells else []
+    return TableLines(column_format or ''.join(alignments), header_lines, rows)
+
+
+def render_dataframe(df: Any, index: bool = True, float_format: Any = None, columns: Optional[List[str]] = None,
+                     header: Any = True, escape: Optional[bool] = None, column_format: Optional[str] = None,
+                     na_rep: str = 'NaN', caption: Optional[str] = None, label: Optional[str] = None) -> str:
+    """Method to render a dataframe as a booktabs `tabular` environment, like `DataFrame.to_latex`
+
+    Each column is formatted and escaped at once with NumPy and pandas operations, and rows are joined in bulk, which
+    is much faster than `to_latex` for large tables. Floating point numbers are only formatted for the whole column
+    with fixed-point formats like the default, see `_format_values()`. The arguments have the same meaning as for
+    `to_latex`.
+
+    Args:
+        df: the pandas.DataFrame to render
+        index: if True, render the index as the first column
+        float_format: a `%` format string (e.g. `%.2f`) or a function to format floating point numbers
+        columns: the names of the columns to render, or None for all columns
+        header: True to render the column names, False to omit them, or a list of names to use instead
+        escape: if True, special LaTeX characters in the column names, index and text values are escaped. If omitted,
+                the default of the installed version of pandas is used.
+        column_format: the tabular column specification. If omitted, numeric columns are right aligned.
+        na_rep: the string to use for missing values
+        caption: if set, wrap the table in a `table` environment with this caption
+        label: if set, wrap the table in a `table` environment with this label
+
+    Returns:
+        the rendered table
+    """
+    table = get_dataframe_table_lines(df, index, float_format, columns, header, escape, column_format, na_rep)
+    lines = [f"\\begin{{tabular}}{{{table.column_format}}}", "\\toprule"] + table.header + ["\\midrule"]
+    lines += table.rows + ["\\bottomrule", "\\end{tabular}"]
+
+    if caption is not None or label is not None:
+        wrapper = ["\\begin{table}"]
+        if caption is not None:
+            wrapper.append(f"\\caption{{{caption}}}")
+        if label is not None:
+            wrapper.append(f"\\label{{{label}}}")
+        lines = wrapper + lines + ["\\end{table}"]
+
+    return "\n".join(lines) + "\n"
+
+
+def render_longtable_shards(table: TableLines, shard_rows: int, caption: Optional[str] = None,
+                            label: Optional[str] = None) -> List[str]:
+    """Method to split a table into `longtable` environments of at most `shard_rows` rows each
+
+    Every shard repeats the header, at its start and at the top of each page it breaks onto, so shards can be included
+    one after another or on their own. The caption and label are added to the first shard. An empty table still has
+    one shard, holding just the header.
+
+    Args:
+        table: the rendered table lines
+        shard_rows: the maximum number of body rows in each shard
+        caption: the caption of the table, or None for no caption
+        label: the label of the table, or None for no label
+
+    Returns:
+        list of the `longtable` environments, in order
+    """
+    if shard_rows < 1:
+        raise ValueError(f"Invalid shard_rows: {shard_rows}. It must be a positive number.")
+
+    head = ["\\toprule"] + table.header + ["\\midrule"]
+    shards = list()
+    for start in range(0, max(len(table.rows), 1), shard_rows):
+        lines = [f"\\begin{{longtable}}{{{table.column_format}}}"]
+        if start == 0 and (caption is not None or label is not None):
+            title = (f"\\caption{{{caption}}}" if caption is not None else "") + \
+                (f"\\label{{{label}}}" if label is not None else "")
+            lines += [title + " \\\\"] + head + ["\\endfirsthead"]
+        lines += head + ["\\endhead", "\\bottomrule", "\\endfoot"]
+        lines += table.rows[start:start + shard_rows] + ["\\end{longtable}"]
+        shards.append("\n".join(lines) + "\n")
+
+    return shards
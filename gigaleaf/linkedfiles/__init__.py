@@ -1,51 +1,86 @@
-from typing import Union, List
-from pathlib import Path
-import json
-import glob
+from typing import Union, List, Optional, Iterator
+import os
 
 from gigaleaf.linkedfiles.image import ImageFile
 from gigaleaf.linkedfiles.csv import CsvFile
 from gigaleaf.linkedfiles.dataframe import DataframeFile
+from gigaleaf.context import SyncContext
 
 
-def load_linked_file(metadata_filename: str) -> Union[ImageFile, CsvFile, DataframeFile]:
-    """Helper to load a LinkedFile child instance from an metadata file absolute path
+def load_linked_file(metadata_filename: str,
+                     context: Optional[SyncContext] = None) -> Union[ImageFile, CsvFile, DataframeFile]:
+    """Helper to load a LinkedFile child instance from its entry in the metadata manifest
 
     Args:
-        metadata_filename: Absolute path to a metadata file
+        metadata_filename: The metadata filename of the linked file, e.g. `fig1_png.json`
+        context: values shared by all linked files during a sync. If omitted, a new context is created.
 
     Returns:
         LinkedFile child class instance
     """
-    if not Path(metadata_filename).is_file():
+    if context is None:
+        context = SyncContext()
+
+    data = context.manifest.get(metadata_filename)
+    if data is None:
         raise ValueError(f"Failed to load linked file: {metadata_filename}")
 
-    with open(metadata_filename, 'rt') as mf:
-        data = json.load(mf)
-
-    if data['classname'] == 'ImageFile':
-        return ImageFile(metadata_filename)
-    elif data['classname'] == 'CsvFile':
-        return CsvFile(metadata_filename)
-    elif data['classname'] == 'CsvFile':
-        return CsvFile(metadata_filename)
-    elif data['classname'] == 'DataframeFile':
-        return DataframeFile(metadata_filename)
+    return _create_linked_file(metadata_filename, data['classname'], context)
+
+
+def _create_linked_file(metadata_filename: str, classname: str,
+                        context: SyncContext) -> Union[ImageFile, CsvFile, DataframeFile]:
+    """Helper to create a LinkedFile child instance from its class name
+
+    Args:
+        metadata_filename: The metadata filename of the linked file, e.g. `fig1_png.json`
+        classname: The name of the LinkedFile child class
+        context: values shared by all linked files during a sync
+
+    Returns:
+        LinkedFile child class instance
+    """
+    if classname == 'ImageFile':
+        return ImageFile(metadata_filename, context)
+    elif classname == 'CsvFile':
+        return CsvFile(metadata_filename, context)
+    elif classname == 'DataframeFile':
+        return DataframeFile(metadata_filename, context)
     else:
-        raise ValueError(f"Unsupported LinkedFile type: {data['classname']}")
+        raise ValueError(f"Unsupported LinkedFile type: {classname}")
 
 
-def load_all_linked_files(overleaf_project_dir: str) -> List[Union[ImageFile, CsvFile, DataframeFile]]:
-    """Helper to load all LinkedFile child instances for a given Overleaf Project
+def iter_linked_files(context: Optional[SyncContext] = None) -> Iterator[Union[ImageFile, CsvFile, DataframeFile]]:
+    """Helper to lazily load every LinkedFile child instance in the manifest, sorted by metadata filename
 
     Args:
-        overleaf_project_dir:
+        context: values shared by all linked files during a sync. If omitted, one is created and shared by all files.
 
     Returns:
+        an iterator of LinkedFile child class instances
+    """
+    if context is None:
+        context = SyncContext()
+
+    for metadata_filename, data in context.manifest:
+        yield _create_linked_file(metadata_filename, data['classname'], context)
+
+
+def load_all_linked_files(overleaf_project_dir: str,
+                          context: Optional[SyncContext] = None) -> List[Union[ImageFile, CsvFile, DataframeFile]]:
+    """Helper to load all LinkedFile child instances for a given Overleaf Project
 
+    Args:
+        overleaf_project_dir: Absolute path to the Overleaf Project repository
+        context: values shared by all linked files during a sync. If omitted, one is created and shared by all files.
+
+    Returns:
+        list of LinkedFile child class instances, sorted by metadata filename so updates are deterministic
     """
-    linked_files = list()
-    for mf in glob.glob(Path(overleaf_project_dir, 'gigantum', 'metadata', '*.json').as_posix()):
-        linked_files.append(load_linked_file(mf))
+    if context is None:
+        context = SyncContext()
+
+    if os.path.abspath(overleaf_project_dir) != os.path.abspath(context.overleaf_repo_directory):
+        raise ValueError(f"Overleaf Project {overleaf_project_dir} does not match the sync context")
 
-    return linked_files
+    return list(iter_linked_files(context))
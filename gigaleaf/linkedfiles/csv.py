@@ -1,8 +1,13 @@
+from typing import Optional
 from string import Template
 from pathlib import Path
+import os
+import tempfile
 
+from gigaleaf import tracing
+from gigaleaf.csvwindow import CsvWindow, load_csv_window, write_csv_window
+from gigaleaf.latex import get_csv_table_lines, get_render_key, render_csv_tabular, render_longtable_shards
 from gigaleaf.linkedfiles.linkedfile import LinkedFile
-from gigaleaf.gigantum import Gigantum
 from gigaleaf.linkedfiles.metadata import CsvFileMetadata
 
 
@@ -30,8 +35,114 @@ class CsvFile(LinkedFile):
                                data['gigantum_version'],
                                data['classname'],
                                data['content_hash'],
+                               data.get('settings_hash'),
+                               data['hash_algorithm'],
                                data['label'],
-                               data['caption'])
+                               data['caption'],
+                               data.get('data_object'),
+                               data.get('window'),
+                               data.get('data_variant'),
+                               data.get('render', 'csvsimple'),
+                               data.get('column_format'),
+                               data.get('formats'),
+                               data.get('escape', True),
+                               data.get('shard_rows'))
+
+    def _is_cpu_bound(self) -> bool:
+        """Method indicating True if writing the subfile is CPU-bound work that should run in a separate process
+
+        Rendering the table in Python requires parsing and formatting the entire CSV file
+
+        Returns:
+            bool
+        """
+        if not isinstance(self.metadata, CsvFileMetadata):
+            raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
+
+        return self.metadata.render == 'tabular'
+
+    def _get_window(self) -> Optional[CsvWindow]:
+        """Method to get which part of the CSV file is copied
+
+        Returns:
+            CsvWindow, or None if the whole file is copied
+        """
+        if not isinstance(self.metadata, CsvFileMetadata):
+            raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
+
+        return load_csv_window(self.metadata.window)
+
+    def _update_data(self) -> bool:
+        """Method to update the file contents and metadata file, re-writing the trimmed file if the window changed
+
+        Returns:
+            True if the linked file was modified and the subfile must be re-written, False if it was unchanged
+        """
+        if not isinstance(self.metadata, CsvFileMetadata):
+            raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
+
+        window = self._get_window()
+        variant = window.key if window is not None else None
+        variant_changed = self.metadata.data_variant != variant
+        if variant_changed:
+            # Compare against nothing, so the file is copied again with the current window
+            self.metadata.content_hash = ""
+
+        modified = super()._update_data()
+        if modified and variant_changed:
+            self.write_metadata(self.context.manifest, self.metadata_filename, data_variant=variant)
+            self.metadata = self._load()
+
+        return modified
+
+    def _is_data_size(self, size: int) -> bool:
+        """Helper method to check if the copy of the file in the data directory has a given size
+
+        A trimmed copy is smaller than the original, so the sizes can't be compared. In that case the file is always
+        hashed before deciding whether it needs to be copied, so it is only trimmed again when its contents changed.
+
+        Args:
+            size: the size in bytes
+
+        Returns:
+            True if the data file exists and has the given size, or the file is trimmed
+        """
+        if self._get_window() is not None:
+            return True
+
+        return super()._is_data_size(size)
+
+    def _copy_data(self, stat: os.stat_result) -> str:
+        """Method to copy the CSV file into the data directory, keeping only the rows and columns in its window
+
+        The file is streamed once, hashing the original while the trimmed file is written.
+
+        Args:
+            stat: the result of `os.stat()` for the source file, taken before copying
+
+        Returns:
+            hex digest of the original file, computed with the algorithm configured for the sync
+        """
+        window = self._get_window()
+        if window is None:
+            return super()._copy_data(stat)
+
+        tmp_filename = self._get_tmp_filename()
+        try:
+            with tracing.span('window', file=self.metadata_filename):
+                content_hash, data_hash = write_csv_window(self.source_filename, tmp_filename, window,
+                                                           self.context.hash_algorithm, self.context.buffer_size)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        self._store_data_file(tmp_filename, data_hash)
+
+        if self.context.change_cache is not None:
+            self.context.change_cache.set_hash(self.source_filename, content_hash, stat, self.context.hash_algorithm)
+
+        return content_hash
 
     def write_subfile(self) -> None:
         """Method to write the Latex subfile
@@ -42,6 +153,11 @@ class CsvFile(LinkedFile):
         if not isinstance(self.metadata, CsvFileMetadata):
             raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
 
+        if self.metadata.shard_rows is not None:
+            self._write_sharded_subfile(self.metadata.shard_rows)
+            return
+        self._remove_shards()
+
         subfile_template = Template("""\documentclass[../../main.tex]{subfiles}
 
 % Subfile autogenerated by gigaleaf
@@ -51,7 +167,7 @@ class CsvFile(LinkedFile):
 
 \\begin{table}[ht]
 \\centering
-\\csvautotabular[respect all]{$filename}
+$table
 \\label{$label}
 {$caption}
 \\end{table}
@@ -64,12 +180,87 @@ class CsvFile(LinkedFile):
         else:
             caption = "\n"
 
-        filename = "gigantum/data/" + Path(self.metadata.gigantum_relative_path).name
+        if self.metadata.render == 'tabular':
+            table = self._get_tabular()
+        else:
+            table = f"\\csvautotabular[respect all]{{gigantum/data/{self.data_object}}}"
 
-        subfile_populated = subfile_template.substitute(filename=filename,
-                                                        gigantum_version=Gigantum.get_current_revision(),
+        subfile_populated = subfile_template.substitute(table=table,
+                                                        gigantum_version=self.context.revision,
                                                         content_hash=self.metadata.content_hash,
                                                         label=self.metadata.label,
                                                         caption=caption)
 
         Path(self.subfile_filename).write_text(subfile_populated)
+
+    def _write_sharded_subfile(self, shard_rows: int) -> None:
+        """Method to write the table as `longtable` shards, each in its own subfile, and a subfile including them all
+
+        Args:
+            shard_rows: the maximum number of rows in each shard
+
+        Returns:
+            None
+        """
+        if not isinstance(self.metadata, CsvFileMetadata):
+            raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
+
+        subfile_template = Template(r"""\documentclass[../../main.tex]{subfiles}
+
+% Subfile autogenerated by gigaleaf
+% Gigantum revision: $gigantum_version
+% Image content hash: $content_hash
+\begin{document}
+
+$shards
+\end{document}
+""")
+
+        with tracing.span('render_table', file=self.metadata_filename):
+            table = get_csv_table_lines(self.data_filename, self.metadata.column_format, self.metadata.formats,
+                                        self.metadata.escape)
+            shards = render_longtable_shards(table, shard_rows, self.metadata.caption or None,
+                                             self.metadata.label)
+        includes = self._write_shards(shards)
+
+        subfile_populated = subfile_template.substitute(gigantum_version=self.context.revision,
+                                                        content_hash=self.metadata.content_hash,
+                                                        shards="\n".join([f"\\subfile{{{i}}}" for i in includes]))
+
+        Path(self.subfile_filename).write_text(subfile_populated)
+
+    def _get_tabular(self) -> str:
+        """Method to get the table rendered as a LaTeX tabular environment
+
+        Rendered tables are cached in the untracked Overleaf directory by the content hash of the data, so each
+        version of a table is only rendered once. Only the latest version of each table is kept.
+
+        Returns:
+            the tabular environment
+        """
+        if not isinstance(self.metadata, CsvFileMetadata):
+            raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
+
+        render_key = get_render_key(self.metadata.column_format, self.metadata.formats, self.metadata.escape)
+        cache_directory = os.path.join(self.context.render_cache_directory, Path(self.metadata_filename).stem)
+        cache_filename = os.path.join(cache_directory,
+                                      f"{self.metadata.content_hash}-{self.metadata.data_variant}-{render_key}.tex")
+        if os.path.isfile(cache_filename):
+            return Path(cache_filename).read_text()
+
+        with tracing.span('render_table', file=self.metadata_filename):
+            table = render_csv_tabular(self.data_filename, self.metadata.column_format, self.metadata.formats,
+                                       self.metadata.escape)
+
+        if os.path.isdir(cache_directory):
+            for old_filename in os.listdir(cache_directory):
+                os.remove(os.path.join(cache_directory, old_filename))
+        else:
+            os.makedirs(cache_directory, exist_ok=True)
+
+        fd, tmp_filename = tempfile.mkstemp(dir=cache_directory)
+        with os.fdopen(fd, 'wt') as tf:
+            tf.write(table)
+        os.replace(tmp_filename, cache_filename)
+
+        return table
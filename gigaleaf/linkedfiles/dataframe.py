@@ -1,8 +1,10 @@
 from string import Template
 from pathlib import Path
 
+from gigaleaf import tracing
+from gigaleaf.dataframes import read_dataframe
+from gigaleaf.latex import can_render_dataframe, get_dataframe_table_lines, render_dataframe, render_longtable_shards
 from gigaleaf.linkedfiles.linkedfile import LinkedFile
-from gigaleaf.gigantum import Gigantum
 from gigaleaf.linkedfiles.metadata import DataframeFileMetadata
 
 try:
@@ -12,7 +14,7 @@ except ImportError:
 
 
 class DataframeFile(LinkedFile):
-    """A class for linking pickled pandas dataframe files"""
+    """A class for linking pandas dataframe files, either pickled or in a columnar format like Parquet"""
 
     def _should_copy_file(self) -> bool:
         """Method indicating True if when running `update()` the file is copied into Overleaf, or False if it should not
@@ -24,6 +26,16 @@ class DataframeFile(LinkedFile):
         """
         return False
 
+    def _is_cpu_bound(self) -> bool:
+        """Method indicating True if writing the subfile is CPU-bound work that should run in a separate process
+
+        Rendering a dataframe to latex requires loading and formatting the table
+
+        Returns:
+            bool
+        """
+        return True
+
     def _load(self) -> DataframeFileMetadata:
         """Method to load the metadata file into a dataclass
 
@@ -35,11 +47,23 @@ class DataframeFile(LinkedFile):
                                      data['gigantum_version'],
                                      data['classname'],
                                      data['content_hash'],
-                                     data['to_latex_kwargs'])
+                                     data.get('settings_hash'),
+                                     data['hash_algorithm'],
+                                     data['to_latex_kwargs'],
+                                     data.get('columns'),
+                                     data.get('max_rows'),
+                                     data.get('memory_map', True),
+                                     data.get('renderer', 'pandas'),
+                                     data.get('shard_rows'))
 
     def write_subfile(self) -> None:
         """Method to write the Latex subfile
 
+        Only the selected columns and rows are loaded. The peak memory used to load and render the table is recorded
+        in `render_attributes`. With the `gigaleaf` renderer, tables are rendered with `render_dataframe()` unless
+        they need a `to_latex` argument it does not support. If `shard_rows` is set, the table is split into
+        `longtable` shards, each written to its own subfile, and the subfile includes them.
+
         Returns:
             None
         """
@@ -62,16 +86,35 @@ class DataframeFile(LinkedFile):
 \end{document}
 """)
 
-        with open(Path(Gigantum.get_project_root(),
-                       self.metadata.gigantum_relative_path).absolute().as_posix(), 'rb') as f:
-            df = pandas.read_pickle(f)
-            with pd.set_option('max_colwidth', None):
-                table = df.to_latex(**self.metadata.to_latex_kwargs)
-
-        filename = "gigantum/data/" + Path(self.metadata.gigantum_relative_path).name
-
-        subfile_populated = subfile_template.substitute(filename=filename,
-                                                        gigantum_version=Gigantum.get_current_revision(),
+        shards = None
+        with tracing.measure_peak_memory() as memory:
+            df = read_dataframe(self.source_filename, self.metadata.columns, self.metadata.max_rows,
+                                self.metadata.memory_map)
+            supported = can_render_dataframe(df, self.metadata.to_latex_kwargs)
+            if self.metadata.shard_rows is not None and supported:
+                kwargs = dict(self.metadata.to_latex_kwargs)
+                caption = kwargs.pop('caption', None)
+                label = kwargs.pop('label', None)
+                shards = render_longtable_shards(get_dataframe_table_lines(df, **kwargs), self.metadata.shard_rows,
+                                                 caption, label)
+            elif self.metadata.renderer == 'gigaleaf' and supported:
+                table = render_dataframe(df, **self.metadata.to_latex_kwargs)
+            else:
+                if self.metadata.shard_rows is not None:
+                    print(f"{self.metadata.gigantum_relative_path} can't be sharded because it needs to be rendered "
+                          f"by pandas. Rendering it as a single table.")
+                with pandas.option_context('display.max_colwidth', None):
+                    table = df.to_latex(**self.metadata.to_latex_kwargs)
+            del df
+        self.render_attributes['peak_memory'] = memory.peak
+
+        if shards is not None:
+            includes = self._write_shards(shards)
+            table = "\n".join([f"\\subfile{{{i}}}" for i in includes])
+        else:
+            self._remove_shards()
+
+        subfile_populated = subfile_template.substitute(gigantum_version=self.context.revision,
                                                         content_hash=self.metadata.content_hash,
                                                         table=table)
 
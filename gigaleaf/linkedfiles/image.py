@@ -1,10 +1,18 @@
+from typing import Optional
 from string import Template
 from pathlib import Path
+import os
+import tempfile
 
+from gigaleaf import tracing
+from gigaleaf.hashing import new_hasher
+from gigaleaf.imageopt import optimize_image
 from gigaleaf.linkedfiles.linkedfile import LinkedFile
-from gigaleaf.gigantum import Gigantum
 from gigaleaf.linkedfiles.metadata import ImageFileMetadata
 
+# Suffixes of the image files that LaTeX can include with `\includegraphics`
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.pdf', '.eps')
+
 
 class ImageFile(LinkedFile):
     """A class for linking Image files"""
@@ -30,11 +38,120 @@ class ImageFile(LinkedFile):
                                  data['gigantum_version'],
                                  data['classname'],
                                  data['content_hash'],
+                                 data.get('settings_hash'),
+                                 data['hash_algorithm'],
                                  data['label'],
                                  data['width'],
                                  data['alignment'],
                                  data['caption'],
-                                 data['datawrapper'])
+                                 data.get('datawrapper'),
+                                 data.get('data_variant'),
+                                 data.get('data_object'))
+
+    def _get_data_variant(self) -> Optional[str]:
+        """Method to get the key of the image options that apply to this image
+
+        Returns:
+            the key, or None if the image is copied as it is
+        """
+        if Path(self.source_filename).suffix.lower() != '.png':
+            # Only PNG files are optimized
+            return None
+
+        return self.context.image_options.key
+
+    def _update_data(self) -> bool:
+        """Method to update the file contents and metadata file, re-writing the image if the image options changed
+
+        Returns:
+            True if the linked file was modified and the subfile must be re-written, False if it was unchanged
+        """
+        if not isinstance(self.metadata, ImageFileMetadata):
+            raise ValueError(f"Incorrect metadata type loaded: {type(self.metadata)}")
+
+        variant = self._get_data_variant()
+        variant_changed = self.metadata.data_variant != variant
+        if variant_changed:
+            # Compare against nothing, so the image is copied again with the current options
+            self.metadata.content_hash = ""
+
+        modified = super()._update_data()
+        if modified and variant_changed:
+            self.write_metadata(self.context.manifest, self.metadata_filename, data_variant=variant)
+            self.metadata = self._load()
+
+        return modified
+
+    def _is_data_size(self, size: int) -> bool:
+        """Helper method to check if the copy of the file in the data directory has a given size
+
+        An optimized copy is smaller than the original, so the sizes can't be compared. In that case the image is
+        always hashed before deciding whether it needs to be copied.
+
+        Args:
+            size: the size in bytes
+
+        Returns:
+            True if the data file exists and has the given size, or the image is optimized
+        """
+        if self._get_data_variant() is not None:
+            return True
+
+        return super()._is_data_size(size)
+
+    def _copy_data(self, stat: os.stat_result) -> str:
+        """Method to copy the image into the data directory, optimizing it first if image options are set
+
+        Optimized images are cached in the untracked Overleaf directory by the content hash of the original, so each
+        version of an image is only optimized once. Only the latest version of each image is kept. Images that can't
+        be optimized are copied unchanged.
+
+        Args:
+            stat: the result of `os.stat()` for the source file, taken before copying
+
+        Returns:
+            hex digest of the original image, computed with the algorithm configured for the sync
+        """
+        variant = self._get_data_variant()
+        if variant is None:
+            return super()._copy_data(stat)
+
+        content_hash = self._hash_file(self.source_filename, self.context.hash_algorithm)
+        cache_directory = os.path.join(self.context.image_cache_directory, Path(self.metadata_filename).stem)
+        cache_filename = os.path.join(cache_directory, f"{content_hash}-{variant}.png")
+        if not os.path.isfile(cache_filename):
+            data = Path(self.source_filename).read_bytes()
+            tracing.count('bytes_read', len(data))
+
+            # Hash what was actually read, in case the image changed since it was hashed
+            hasher = new_hasher(self.context.hash_algorithm)
+            hasher.update(data)
+            content_hash = str(hasher.hexdigest())
+            cache_filename = os.path.join(cache_directory, f"{content_hash}-{variant}.png")
+
+            with tracing.span('optimize', file=self.metadata_filename):
+                try:
+                    optimized = optimize_image(data, self.context.image_options)
+                except ValueError as err:
+                    # e.g. a truncated file, or a file that isn't a PNG despite its name. Copy it as it is.
+                    print(f"Failed to optimize {self.metadata.gigantum_relative_path}, copying it unchanged: {err}")
+                    optimized = data
+
+            if os.path.isdir(cache_directory):
+                for old_filename in os.listdir(cache_directory):
+                    os.remove(os.path.join(cache_directory, old_filename))
+            else:
+                os.makedirs(cache_directory, exist_ok=True)
+
+            fd, tmp_filename = tempfile.mkstemp(dir=cache_directory)
+            with os.fdopen(fd, 'wb') as tf:
+                tf.write(optimized)
+            os.replace(tmp_filename, cache_filename)
+
+        self._write_data_file(cache_filename)
+        tracing.count('image_bytes_saved', stat.st_size - os.path.getsize(cache_filename))
+
+        return content_hash
 
     def write_subfile(self) -> None:
         """Method to write the Latex subfile
@@ -66,8 +183,10 @@ $caption\\label{$label}
         else:
             caption = "\n"
 
-        subfile_populated = subfile_template.substitute(filename=Path(self.metadata.gigantum_relative_path).stem,
-                                                        gigantum_version=Gigantum.get_current_revision(),
+        # Relative to the graphics path, without the suffix so LaTeX can pick the graphics format
+        filename = os.path.splitext(self.data_object)[0]
+        subfile_populated = subfile_template.substitute(filename=filename,
+                                                        gigantum_version=self.context.revision,
                                                         content_hash=self.metadata.content_hash,
                                                         width=self.metadata.width,
                                                         alignment=self.metadata.alignment,
@@ -1,31 +1,56 @@
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Set, Union, Optional
+from string import Template
 from abc import ABC, abstractmethod
 from pathlib import Path
+from dataclasses import asdict, fields
+import os
 import json
 import hashlib
-import shutil
+import tempfile
 
-from gigaleaf.gigantum import Gigantum
-from gigaleaf.linkedfiles.metadata import ImageFileMetadata, LinkedFileMetadata
+from gigaleaf import tracing
+from gigaleaf.hashing import hash_file, DEFAULT_ALGORITHM, LEGACY_ALGORITHM
+from gigaleaf.context import SyncContext
+from gigaleaf.datastore import get_object_name, resolve_data_object, store_object
+from gigaleaf.manifest import Manifest
+from gigaleaf.transfer import copy_and_hash
+from gigaleaf.linkedfiles.metadata import ImageFileMetadata, LinkedFileMetadata, OPTIONAL_SETTINGS
 
 
 class LinkedFile(ABC):
     """Abstract class for Linked Files"""
-    def __init__(self, metadata_file: str) -> None:
-        self.metadata_filename = metadata_file
+    def __init__(self, metadata_filename: str, context: Optional[SyncContext] = None) -> None:
+        """Load the metadata and resolve file paths on instance creation
+
+        Args:
+            metadata_filename: the metadata filename of the linked file in the manifest, e.g. `fig1_png.json`
+            context: values shared by all linked files during a sync. If omitted, a new context is created.
+        """
+        self.metadata_filename = metadata_filename
+        self.context = context if context is not None else SyncContext()
         self.metadata = self._load()
+        # Details about the last render of the subfile, e.g. its peak memory, recorded on its `render` span
+        self.render_attributes: Dict[str, Any] = dict()
+        # Shard subfiles written or removed by the last render, so they are committed by the sync
+        self.shard_changes: List[str] = list()
+
+        # Resolve paths once, since they are used repeatedly during an update
+        self._source_filename = os.path.join(self.context.project_root, self.metadata.gigantum_relative_path)
+        self._subfile_filename = os.path.join(self.context.subfiles_directory,
+                                              self.metadata_filename.replace('.json', '.tex'))
 
     def _load_metadata(self) -> Dict[str, Any]:
-        """Method to load the metadata file from disk for the Linked File represented by this class
+        """Method to load the metadata from the manifest for the Linked File represented by this class
 
         Returns:
-            metadata file contents as a dictionary
+            metadata as a dictionary
         """
-        if not Path(self.metadata_filename).is_file():
-            raise ValueError(f"Failed to load metadata file: {self.metadata_filename}")
+        data = self.context.manifest.get(self.metadata_filename)
+        if data is None:
+            raise ValueError(f"Failed to load metadata for linked file: {self.metadata_filename}")
 
-        with open(self.metadata_filename, 'rt') as mf:
-            data: Dict[str, Any] = json.load(mf)
+        # Metadata written by older versions of gigaleaf does not record the hash algorithm
+        data.setdefault('hash_algorithm', LEGACY_ALGORITHM)
 
         return data
 
@@ -38,6 +63,17 @@ class LinkedFile(ABC):
         """
         raise NotImplementedError
 
+    @property
+    def data_object(self) -> str:
+        """The path of the linked file's data relative to the data directory
+
+        Data is stored under the digest of its contents, so linked files with identical contents share one copy.
+
+        Returns:
+            relative path, e.g. `objects/3f/3fa2...9c.png`
+        """
+        return resolve_data_object(getattr(self.metadata, 'data_object', None), self.metadata.gigantum_relative_path)
+
     @property
     def data_filename(self) -> str:
         """The absolute path to the linked file's data in the data directory
@@ -47,8 +83,7 @@ class LinkedFile(ABC):
         Returns:
             absolute path to the file
         """
-        overleaf_gigantum_path = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data')
-        return Path(overleaf_gigantum_path, Path(self.metadata.gigantum_relative_path).name).absolute().as_posix()
+        return os.path.join(self.context.data_directory, self.data_object)
 
     @property
     def subfile_filename(self) -> str:
@@ -59,10 +94,82 @@ class LinkedFile(ABC):
         Returns:
             absolute path to the subfile
         """
-        filename = Path(self.metadata_filename).name
-        filename = filename.replace('.json', '.tex')
-        overleaf_gigantum_path = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles')
-        return Path(overleaf_gigantum_path, filename).absolute().as_posix()
+        return self._subfile_filename
+
+    @property
+    def shard_directory(self) -> str:
+        """The absolute path to the directory holding the subfiles of each shard of a sharded table
+
+        Returns:
+            absolute path to the directory, e.g. `gigantum/subfiles/table_csv`
+        """
+        return os.path.splitext(self._subfile_filename)[0]
+
+    def _write_shards(self, shards: List[str]) -> List[str]:
+        """Method to write each shard of a table to its own subfile in the shard directory
+
+        Shards are numbered in order, so when a table changes only the shards whose rows changed differ from the
+        subfiles already written. Shards that are unchanged are not written again, and shards left over from a longer
+        table are removed. The subfiles written or removed are recorded in `shard_changes`.
+
+        Args:
+            shards: the LaTeX for each shard
+
+        Returns:
+            the path of each shard's subfile relative to the Overleaf project, without its extension, for `\\subfile`
+        """
+        shard_template = Template(r"""\documentclass[../../../main.tex]{subfiles}
+
+% Subfile autogenerated by gigaleaf
+\begin{document}
+
+$table
+\end{document}
+""")
+
+        self.shard_changes = list()
+        os.makedirs(self.shard_directory, exist_ok=True)
+        stem = os.path.basename(self.shard_directory)
+        includes = list()
+        filenames = set()
+        for i, shard in enumerate(shards):
+            filename = os.path.join(self.shard_directory, f"{stem}_{i + 1:04d}.tex")
+            subfile_populated = shard_template.substitute(table=shard)
+            if not os.path.isfile(filename) or Path(filename).read_text() != subfile_populated:
+                Path(filename).write_text(subfile_populated)
+                self.shard_changes.append(filename)
+
+            filenames.add(filename)
+            relative_path = os.path.relpath(filename, self.context.overleaf_repo_directory).replace(os.sep, '/')
+            includes.append(os.path.splitext(relative_path)[0])
+
+        self._remove_shards(filenames)
+        return includes
+
+    def _remove_shards(self, keep: Optional[Set[str]] = None) -> None:
+        """Method to remove the subfiles of a sharded table, e.g. when the table is no longer sharded
+
+        The removed subfiles are added to `shard_changes`.
+
+        Args:
+            keep: absolute paths of the shard subfiles to keep, or None to remove all of them
+
+        Returns:
+            None
+        """
+        if keep is None:
+            self.shard_changes = list()
+        if not os.path.isdir(self.shard_directory):
+            return
+
+        for name in sorted(os.listdir(self.shard_directory)):
+            filename = os.path.join(self.shard_directory, name)
+            if keep is None or filename not in keep:
+                os.remove(filename)
+                self.shard_changes.append(filename)
+
+        if not os.listdir(self.shard_directory):
+            os.rmdir(self.shard_directory)
 
     @staticmethod
     def get_safe_filename(relative_path: str) -> str:
@@ -106,11 +213,13 @@ class LinkedFile(ABC):
         return safe_filename + suffix_str + ".json"
 
     @classmethod
-    def link(cls, relative_path: str, **kwargs: Dict[str, Any]) -> None:
+    def link(cls, relative_path: str, context: Optional[SyncContext] = None, **kwargs: Any) -> None:
         """Method to link a file output in a Gigantum Project to an Overleaf project
 
         Args:
             relative_path: relative path to the file from the current working dir, e.g. `../output/my_fig.png`
+            context: the context to record the link in. If omitted, a new context is created and the manifest is
+                     saved immediately. Otherwise, the caller is responsible for saving the manifest and changes.
             **kwargs: args specific to each LinkedFile implementation
 
         Returns:
@@ -123,64 +232,90 @@ class LinkedFile(ABC):
                              f"directory to your file. In Jupyter, the working directory is the directory containing "
                              f"your notebook.")
 
-        metadata_filename = cls.get_metadata_filename(relative_path)
-        metadata_abs_filename = Path(Gigantum.get_overleaf_root_directory(),
-                                     'project', 'gigantum', 'metadata', metadata_filename)
+        save_manifest = context is None
+        if context is None:
+            context = SyncContext()
 
-        if metadata_abs_filename.exists() is True:
+        metadata_filename = cls.get_metadata_filename(relative_path)
+        current_metadata = context.manifest.get(metadata_filename)
+        if current_metadata is not None:
             # This is an update to the link, so get the current content hash for the file.
-            with open(metadata_abs_filename, 'rt') as mf:
-                current_metadata: Dict[str, Any] = json.load(mf)
-                content_hash = current_metadata['content_hash']
+            content_hash = current_metadata['content_hash']
+            hash_algorithm = current_metadata.get('hash_algorithm', LEGACY_ALGORITHM)
         else:
             # Set content hash to init so it is always detected as "modified" on first link
             content_hash = "init"
+            hash_algorithm = DEFAULT_ALGORITHM
 
         full_kwargs = {
-            "gigantum_relative_path": file_path.relative_to(Path(Gigantum.get_project_root()).resolve()).as_posix(),
-            "gigantum_version": Gigantum.get_current_revision(),
+            "gigantum_relative_path": file_path.relative_to(Path(context.project_root).resolve()).as_posix(),
+            "gigantum_version": context.revision,
             "classname": cls.__name__,
             "content_hash": content_hash,
-            "metadata_filename": metadata_filename}
+            "hash_algorithm": hash_algorithm}
         full_kwargs.update(kwargs)
 
-        cls.write_metadata(**full_kwargs)
+        cls.write_metadata(context.manifest, metadata_filename, **full_kwargs)
+        if save_manifest:
+            context.save_manifest()
+            context.save_changes()
+
+    @property
+    def source_filename(self) -> str:
+        """The absolute path to the linked file in the Gigantum Project
+
+        Returns:
+            absolute path to the file
+        """
+        return self._source_filename
 
-    def _hash_file(self, filename: str) -> str:
+    def _hash_file(self, filename: str, algorithm: Optional[str] = None) -> str:
         """Method to hash files for comparing contents and detecting updates
 
+        Only the file contents are hashed. Changes to the link settings are detected separately by
+        `get_settings_hash()`, so the metadata file can be updated without invalidating the content hash. If the sync
+        context has a change cache, the file is only read if its size, mtime or inode changed since it was last hashed.
+
         Args:
             filename: absolute path to the file to hash
+            algorithm: the hash algorithm to use. Defaults to the algorithm of the stored content hash.
 
         Returns:
-            md5 hash value
+            hex digest of the file contents
         """
-        # Process files in 64kb chunks
-        buffer_size = 65536  
+        if algorithm is None:
+            algorithm = self.metadata.hash_algorithm
 
-        md5 = hashlib.md5()
+        with tracing.span('hash', file=self.metadata_filename):
+            if self.context.change_cache is not None:
+                return self.context.change_cache.get_hash(filename, algorithm, self.context.buffer_size)
+            else:
+                return hash_file(filename, algorithm, self.context.buffer_size)
 
-        # Hash the file contents and metadata file together in case either change
-        file_list = [filename, self.metadata_filename]
+    def get_settings_hash(self) -> str:
+        """Method to hash the user-facing settings of the link (e.g. caption, label, width)
 
-        for f in file_list:
-            with open(f, 'rb') as fh:
-                while True:
-                    data = fh.read(buffer_size)
-                    if not data:
-                        break
-                    md5.update(data)
+        The settings are serialized canonically, so the hash is stable across syncs. Fields that describe the state of
+        the linked file rather than how it is rendered (e.g. the content hash or Gigantum revision) are excluded.
 
-        return md5.hexdigest()
+        Returns:
+            md5 hash value
+        """
+        # Where and how the data file was written is state, not a setting, like the content hash
+        excluded_fields = {f.name for f in fields(LinkedFileMetadata)} | {'data_variant', 'data_object'}
+        settings = {k: v for k, v in asdict(self.metadata).items()
+                    if k not in excluded_fields and not (k in OPTIONAL_SETTINGS and v == OPTIONAL_SETTINGS[k])}
+        return hashlib.md5(json.dumps(settings, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
 
     def _is_modified(self) -> bool:
         """Helper method to check if a file has been modified since the last time you ran .sync()
 
         Returns:
-            true if the file has changed since the last time you ran .sync(), false if it has not
+            true if the file or its settings have changed since the last time you ran .sync(), false if they have not
         """
-        if self.metadata.content_hash != self._hash_file(Path(Gigantum.get_project_root(),
-                                                         self.metadata.gigantum_relative_path).absolute().as_posix()):
+        if self.metadata.content_hash != self._hash_file(self.source_filename):
+            return True
+        elif self.metadata.settings_hash != self.get_settings_hash():
             return True
         else:
             return False
@@ -196,62 +331,235 @@ class LinkedFile(ABC):
         """
         raise NotImplementedError
 
-    def update(self) -> None:
+    def _is_cpu_bound(self) -> bool:
+        """Method indicating True if writing the subfile is CPU-bound work that should run in a separate process
+
+        Most subfiles are rendered from a short template, but some (e.g. a dataframe) require heavy computation
+
+        Returns:
+            bool
+        """
+        return False
+
+    def update(self) -> bool:
         """Method to update the file contents, latex subfile, and metadata file.
 
         Returns:
+            True if the linked file was modified and updated, False if it was unchanged
+        """
+        modified = self._update_data()
+        if modified:
+            # Latex subfile
+            try:
+                self.write_subfile()
+            except Exception:
+                self._invalidate()
+                raise
+            self.context.record_change(self.subfile_filename)
+            for filename in self.shard_changes:
+                self.context.record_change(filename)
+
+        return modified
 
+    def _update_data(self) -> bool:
+        """Method to update the file contents and metadata file, but not the latex subfile
+
+        This is split out of `update()` so the I/O-bound and CPU-bound parts of an update can be scheduled separately.
+
+        Returns:
+            True if the linked file was modified and the subfile must be re-written, False if it was unchanged
         """
-        if self._is_modified():
-            if self._should_copy_file() is True:
-                # Copy file if needed
-                shutil.copyfile(Path(Gigantum.get_project_root(), self.metadata.gigantum_relative_path),
-                                self.data_filename)
-
-            # Update commit hash in metadata
-            kwargs = {"content_hash": self._hash_file(Path(Gigantum.get_project_root(),
-                                                           self.metadata.gigantum_relative_path).absolute().as_posix()),
-                      "metadata_filename": self.metadata_filename}
-            self.write_metadata(**kwargs)
+        stat = os.stat(self.source_filename)
+        data_object = self.data_object
+
+        # Compare using the algorithm the stored hash was computed with, so links hashed with a different algorithm
+        # are not needlessly updated. New hashes are always computed with the algorithm configured for the sync.
+        algorithm = self.metadata.hash_algorithm
+        content_hash = None
+        if self.context.change_cache is not None:
+            content_hash = self.context.change_cache.get_cached_hash(self.source_filename, stat, algorithm)
+
+        copied = False
+        if content_hash is None and self._should_copy_file() is True and not self._is_data_size(stat.st_size):
+            # The file has certainly changed, so hash it while copying to only read it once
+            content_hash = self._copy_data(stat)
+            algorithm = self.context.hash_algorithm
+            copied = True
+        elif content_hash is None:
+            content_hash = self._hash_file(self.source_filename, algorithm)
+
+        settings_hash = self.get_settings_hash()
+        content_modified = self.metadata.content_hash != content_hash
+        if not content_modified and self.metadata.settings_hash == settings_hash and self.data_object == data_object:
+            return False
 
-            # Latex subfile
-            self.write_subfile()
+        if content_modified and algorithm != self.context.hash_algorithm:
+            algorithm = self.context.hash_algorithm
+            if self._should_copy_file() is False:
+                content_hash = self._hash_file(self.source_filename, algorithm)
+
+        if self._should_copy_file() is True and content_modified and not copied:
+            # Copy file if needed, recording the hash of the data that was actually copied
+            content_hash = self._copy_data(stat)
+
+        # Update hashes in metadata
+        kwargs = {"content_hash": content_hash,
+                  "hash_algorithm": algorithm,
+                  "settings_hash": settings_hash}
+        self.write_metadata(self.context.manifest, self.metadata_filename, **kwargs)
+        self.metadata = self._load()
+
+        return True
+
+    def _invalidate(self) -> None:
+        """Method to make the next sync update this linked file again, e.g. because its subfile failed to render
+
+        The new hashes are written to the manifest before the subfile is rendered. Clearing the settings hash makes the
+        link look modified, without having to copy its data again.
+
+        Returns:
+            None
+        """
+        if self.metadata_filename in self.context.manifest:
+            self.write_metadata(self.context.manifest, self.metadata_filename, settings_hash=None)
+
+    def _is_data_size(self, size: int) -> bool:
+        """Helper method to check if the copy of the file in the data directory has a given size
+
+        Args:
+            size: the size in bytes
+
+        Returns:
+            True if the data file exists and has the given size
+        """
+        try:
+            return os.stat(self.data_filename).st_size == size
+        except FileNotFoundError:
+            return False
+
+    def _copy_data(self, stat: os.stat_result) -> str:
+        """Method to copy the linked file into the data directory, hashing it in the same pass
+
+        Args:
+            stat: the result of `os.stat()` for the source file, taken before copying
+
+        Returns:
+            hex digest of the copied data, computed with the algorithm configured for the sync
+        """
+        content_hash = self._write_data_file(self.source_filename)
+
+        if self.context.change_cache is not None:
+            self.context.change_cache.set_hash(self.source_filename, content_hash, stat, self.context.hash_algorithm)
+
+        return content_hash
+
+    def _get_tmp_filename(self) -> str:
+        """Method to create an empty temporary file to write data to before it is stored
+
+        Returns:
+            absolute path to the temporary file
+        """
+        if not os.path.isdir(self.context.tmp_directory):
+            os.makedirs(self.context.tmp_directory, exist_ok=True)
+
+        fd, tmp_filename = tempfile.mkstemp(dir=self.context.tmp_directory)
+        os.close(fd)
+        return tmp_filename
+
+    def _write_data_file(self, filename: str) -> str:
+        """Method to copy a file into the data directory as this linked file's data, and hash the copy
+
+        The file is copied with the cheapest strategy the filesystem supports, e.g. a reflink clone, and then stored
+        with `_store_data_file()`.
+
+        Args:
+            filename: absolute path to the file to copy
+
+        Returns:
+            hex digest of the copied data, computed with the algorithm configured for the sync
+        """
+        tmp_filename = self._get_tmp_filename()
+        try:
+            with tracing.span('copy', file=self.metadata_filename):
+                content_hash, strategy = copy_and_hash(filename, tmp_filename, self.context.hash_algorithm,
+                                                       self.context.buffer_size, self.context.copy_strategy)
+            tracing.count(f'copy_{strategy}', 1)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+
+        self._store_data_file(tmp_filename, content_hash)
+        return content_hash
+
+    def _store_data_file(self, tmp_filename: str, digest: str) -> None:
+        """Method to move a temporary file into the data directory as this linked file's data
+
+        The data is written to a temporary file first and then moved into place under its digest, so an interrupted
+        copy never leaves a partial file in the Overleaf project. If the data directory already has an object with the
+        same digest, nothing is written. The object this linked file used before is released, and removed at the end
+        of the sync if no other linked file uses it.
+
+        Args:
+            tmp_filename: absolute path to the temporary file, from `_get_tmp_filename()`
+            digest: hex digest of the data, computed with the algorithm configured for the sync
+
+        Returns:
+            None
+        """
+        try:
+            data_object = get_object_name(digest, Path(self.source_filename).suffix)
+            written = store_object(tmp_filename, self.context.data_directory, data_object)
+        except BaseException:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise
+        if written:
+            self.context.record_change(os.path.join(self.context.data_directory, data_object))
+
+        if data_object != self.data_object:
+            self.context.release_data_object(self.data_object)
+            self.write_metadata(self.context.manifest, self.metadata_filename, data_object=data_object)
+            setattr(self.metadata, 'data_object', data_object)
 
     def unlink(self) -> None:
         """Method to unlink a file by removing its contents, subfile, and metadata from the overleaf project
 
         Returns:
-
+            None
         """
-        Path(self.metadata_filename).unlink()
-        Path(self.subfile_filename).unlink()
+        # A file that was linked but never synced has no subfile yet
+        if os.path.isfile(self.subfile_filename):
+            os.remove(self.subfile_filename)
+            self.context.record_change(self.subfile_filename)
+        self._remove_shards()
+        for filename in self.shard_changes:
+            self.context.record_change(filename)
+
+        # Only remove the link once its files are gone, so a failure above leaves it linked
+        self.context.manifest.remove(self.metadata_filename)
+        self.context.save_manifest()
         if self._should_copy_file() is True:
-            # If you inserted data in the Overleaf project, remove it.
-            Path(self.data_filename).unlink()
+            # If you inserted data in the Overleaf project, remove it unless another linked file has the same contents
+            self.context.release_data_object(self.data_object)
+            self.context.remove_released_data_objects()
+
+        # Committed by the next sync
+        self.context.save_changes()
 
     @staticmethod
-    def write_metadata(metadata_filename: str, **kwargs: Any) -> None:
-        """Method to write metadata to disk
+    def write_metadata(manifest: Manifest, metadata_filename: str, **kwargs: Any) -> None:
+        """Method to write metadata to the manifest. The manifest is written to disk when it is saved.
 
         Args:
-            metadata_filename: name of the metadata file
-            **kwargs:
+            manifest: the manifest to update
+            metadata_filename: the metadata filename of the linked file, e.g. `fig1_png.json`
+            **kwargs: the metadata fields to set. Existing fields not in `kwargs` are kept.
 
         Returns:
             None
         """
-        data = dict()
-        if Path(metadata_filename).exists():
-            # Update existing file
-            with open(metadata_filename, 'rt') as mf:
-                data = json.load(mf)
-
-        data.update(kwargs)
-
-        metadata_abs_filename = Path(Gigantum.get_overleaf_root_directory(),
-                                     'project', 'gigantum', 'metadata', metadata_filename)
-        with open(metadata_abs_filename, 'wt') as mf:
-            json.dump(data, mf)
+        manifest.update(metadata_filename, **kwargs)
 
     @abstractmethod
     def write_subfile(self) -> None:
@@ -1,6 +1,19 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 
+# Settings added after links were first created, and their default values. They are left out of the settings hash
+# while they have their default value, so existing links are not modified when gigaleaf is upgraded.
+OPTIONAL_SETTINGS: Dict[str, Any] = {'window': None,
+                                     'render': 'csvsimple',
+                                     'column_format': None,
+                                     'formats': None,
+                                     'escape': True,
+                                     'columns': None,
+                                     'max_rows': None,
+                                     'memory_map': True,
+                                     'renderer': 'pandas',
+                                     'shard_rows': None}
+
 
 @dataclass
 class LinkedFileMetadata:
@@ -8,6 +21,8 @@ class LinkedFileMetadata:
     gigantum_version: str
     classname: str
     content_hash: str
+    settings_hash: Optional[str]
+    hash_algorithm: str
 
 
 @dataclass
@@ -17,15 +32,45 @@ class ImageFileMetadata(LinkedFileMetadata):
     alignment: str
     caption: Optional[str] = None
     datawrapper: Optional[str] = None
+    # The image options the copy in the data directory was optimized with, or None if it is an exact copy
+    data_variant: Optional[str] = None
+    # Where the image is stored in the data directory, or None if it was copied by an older version of gigaleaf
+    data_object: Optional[str] = None
 
 
 @dataclass
 class CsvFileMetadata(LinkedFileMetadata):
     label: str
     caption: Optional[str] = None
+    # Where the file is stored in the data directory, or None if it was copied by an older version of gigaleaf
+    data_object: Optional[str] = None
+    # Which part of the file is copied, as the fields of a `CsvWindow`, or None to copy the whole file
+    window: Optional[Dict[str, Any]] = None
+    # The key of the window the copy in the data directory was trimmed with, or None if it is an exact copy
+    data_variant: Optional[str] = None
+    # How the table is typeset: `csvsimple` to parse the CSV file in LaTeX, or `tabular` to render it in Python
+    render: str = 'csvsimple'
+    # The tabular column specification, e.g. `lrr`, or None to pick one from the data. Only used by `tabular`.
+    column_format: Optional[str] = None
+    # Python format specifications for the numbers in each column, by column name. Only used by `tabular`.
+    formats: Optional[Dict[str, str]] = None
+    # If True, special LaTeX characters in the table are escaped. Only used by `tabular`.
+    escape: bool = True
+    # The number of rows in each `longtable` shard, or None to render a single table. Only used by `tabular`.
+    shard_rows: Optional[int] = None
 
 
 @dataclass
 class DataframeFileMetadata(LinkedFileMetadata):
     to_latex_kwargs: Dict[str, Any]
+    # The names of the columns to render, or None to render all columns
+    columns: Optional[List[str]] = None
+    # The maximum number of rows to render, or None to render all rows
+    max_rows: Optional[int] = None
+    # If True, memory-map Parquet, Feather and Arrow files instead of reading them into buffers
+    memory_map: bool = True
+    # How the table is rendered: `gigaleaf` for the vectorized renderer, or `pandas` for `DataFrame.to_latex`
+    renderer: str = 'pandas'
+    # The number of rows in each `longtable` shard, or None to render a single table
+    shard_rows: Optional[int] = None
 
@@ -0,0 +1,200 @@
+from typing import Dict, Any, Iterator, Tuple, List, Optional, Set
+import os
+import glob
+import json
+import threading
+
+
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+# Held while a manifest is merged and written, so saves from different syncs and links don't interleave
+_SAVE_LOCK = threading.Lock()
+
+
+class Manifest:
+    """The metadata of every linked file in an Overleaf Project, stored in a single JSON lines file
+
+    The manifest is stored at `gigantum/manifest.jsonl` in the Overleaf Project. Each line holds the metadata of one
+    linked file, keyed by its metadata filename (e.g. `fig1_png.json`). Lines are sorted by key, so the file diffs
+    cleanly in git.
+
+    The manifest is read once when created and written once when `save()` is called. Only the entries changed through
+    this instance are written: the file is read again when saving and the changes are merged into it, so links saved
+    by another instance in the meantime (e.g. while a background sync runs) are kept.
+
+    Projects created with older versions of gigaleaf stored one JSON file per linked file in `gigantum/metadata`. These
+    are imported when the manifest is loaded and removed when it is saved.
+    """
+    def __init__(self, overleaf_repo_directory: str) -> None:
+        """Load the manifest from disk on instance creation
+
+        Args:
+            overleaf_repo_directory: absolute path to the Overleaf Project repository
+        """
+        self.manifest_filename = os.path.join(overleaf_repo_directory, 'gigantum', MANIFEST_FILENAME)
+        self.legacy_metadata_directory = os.path.join(overleaf_repo_directory, 'gigantum', 'metadata')
+
+        self._lock = threading.Lock()
+        # The fields set on each entry since the manifest was loaded or last saved
+        self._updated: Dict[str, Dict[str, Any]] = dict()
+        # Entries added (rather than updated) and removed since the manifest was loaded or last saved
+        self._created: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._legacy_files: List[str] = list()
+        self._entries: Dict[str, Dict[str, Any]] = dict(self.iter_file(self.manifest_filename))
+        self._migrate_legacy_metadata()
+
+    @staticmethod
+    def iter_file(manifest_filename: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Method to stream the entries of a manifest file, one line at a time
+
+        Args:
+            manifest_filename: absolute path to the manifest file
+
+        Returns:
+            an iterator of (metadata filename, metadata) tuples. Nothing is yielded if the file does not exist.
+        """
+        if not os.path.isfile(manifest_filename):
+            return
+
+        with open(manifest_filename, 'rt') as mf:
+            for line in mf:
+                if not line.strip():
+                    continue
+                data: Dict[str, Any] = json.loads(line)
+                metadata_filename = data.pop('metadata_filename')
+                yield metadata_filename, data
+
+    def _migrate_legacy_metadata(self) -> None:
+        """Method to import metadata files written by older versions of gigaleaf
+
+        Returns:
+            None
+        """
+        self._legacy_files = sorted(glob.glob(os.path.join(self.legacy_metadata_directory, '*.json')))
+        for legacy_file in self._legacy_files:
+            metadata_filename = os.path.basename(legacy_file)
+            if metadata_filename not in self._entries:
+                with open(legacy_file, 'rt') as mf:
+                    self._entries[metadata_filename] = json.load(mf)
+                self._created.add(metadata_filename)
+                self._updated[metadata_filename] = dict(self._entries[metadata_filename])
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate over a snapshot of the entries, sorted by metadata filename
+
+        Returns:
+            an iterator of (metadata filename, metadata) tuples
+        """
+        with self._lock:
+            items = sorted(self._entries.items())
+
+        for metadata_filename, data in items:
+            yield metadata_filename, dict(data)
+
+    def __contains__(self, metadata_filename: object) -> bool:
+        with self._lock:
+            return metadata_filename in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, metadata_filename: str) -> Optional[Dict[str, Any]]:
+        """Method to get the metadata of a linked file
+
+        Args:
+            metadata_filename: the metadata filename of the linked file, e.g. `fig1_png.json`
+
+        Returns:
+            a copy of the metadata, or None if the linked file is not in the manifest
+        """
+        with self._lock:
+            data = self._entries.get(metadata_filename)
+            return dict(data) if data is not None else None
+
+    def update(self, metadata_filename: str, **kwargs: Any) -> None:
+        """Method to add or update the metadata of a linked file. Existing fields not in `kwargs` are kept.
+
+        Args:
+            metadata_filename: the metadata filename of the linked file, e.g. `fig1_png.json`
+            **kwargs: the metadata fields to set
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if metadata_filename not in self._entries:
+                self._entries[metadata_filename] = dict()
+                self._created.add(metadata_filename)
+            self._entries[metadata_filename].update(kwargs)
+            self._updated.setdefault(metadata_filename, dict()).update(kwargs)
+            self._removed.discard(metadata_filename)
+
+    def remove(self, metadata_filename: str) -> None:
+        """Method to remove a linked file from the manifest
+
+        Args:
+            metadata_filename: the metadata filename of the linked file, e.g. `fig1_png.json`
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if metadata_filename in self._entries:
+                del self._entries[metadata_filename]
+                self._updated.pop(metadata_filename, None)
+                self._created.discard(metadata_filename)
+                self._removed.add(metadata_filename)
+
+    def save(self) -> List[str]:
+        """Method to atomically write the changes made through this instance to disk, if there are any
+
+        The manifest file is read again and only the entries changed through this instance are replaced, updated or
+        removed, so entries saved by another instance since this one was loaded are kept. An entry that was removed
+        from the file in the meantime is not added back by an update.
+
+        Returns:
+            absolute paths of the files written or removed, which is empty if the manifest had not changed
+        """
+        with _SAVE_LOCK, self._lock:
+            if not self._updated and not self._removed and not self._legacy_files:
+                return list()
+
+            entries = dict(self.iter_file(self.manifest_filename))
+            for metadata_filename in self._removed:
+                entries.pop(metadata_filename, None)
+            for metadata_filename, fields in self._updated.items():
+                if metadata_filename in self._created:
+                    entries[metadata_filename] = dict(self._entries[metadata_filename])
+                elif metadata_filename in entries:
+                    entries[metadata_filename].update(fields)
+
+            manifest_dir = os.path.dirname(self.manifest_filename)
+            if not os.path.isdir(manifest_dir):
+                os.makedirs(manifest_dir)
+
+            tmp_file = self.manifest_filename + '.tmp'
+            with open(tmp_file, 'wt') as mf:
+                for metadata_filename, data in sorted(entries.items()):
+                    line = dict(data)
+                    line['metadata_filename'] = metadata_filename
+                    mf.write(json.dumps(line, sort_keys=True, separators=(',', ':')) + '\n')
+            os.replace(tmp_file, self.manifest_filename)
+
+            changed_files = [self.manifest_filename] + self._legacy_files
+
+            # Now that the manifest is safely written, remove metadata files from older versions of gigaleaf
+            for legacy_file in self._legacy_files:
+                if os.path.isfile(legacy_file):
+                    os.remove(legacy_file)
+            if self._legacy_files and os.path.isdir(self.legacy_metadata_directory) and \
+                    not os.listdir(self.legacy_metadata_directory):
+                os.rmdir(self.legacy_metadata_directory)
+            self._legacy_files = list()
+
+            self._entries = entries
+            self._updated = dict()
+            self._created = set()
+            self._removed = set()
+            return changed_files
@@ -1,21 +1,89 @@
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict, Sequence, Any
 from dataclasses import dataclass
 import os
 import json
+import time
 import getpass
 from pathlib import Path
 
 from gigaleaf.gigantum import Gigantum
-from gigaleaf.utils import call_subprocess
+from gigaleaf.gitbackend import GitBackend, get_git_backend
+from gigaleaf.hashing import DEFAULT_ALGORITHM, DEFAULT_BUFFER_SIZE
 from gigaleaf import __version__ as gigaleaf_version
 
 
+# How the Overleaf Project is cloned. `full` clones the whole history, `shallow` only the latest commit, and `partial`
+# the whole history but only the file contents that are checked out.
+CLONE_MODES = ('full', 'shallow', 'partial')
+
+
+def is_local_git_url(git_url: str) -> bool:
+    """Method to check if a git remote is on the local filesystem, i.e. a `file://` URL or a path
+
+    Like git, anything with a scheme (e.g. `https://`) or in the scp-like form `host:path` is a network remote.
+
+    Args:
+        git_url: the URL of the git remote
+
+    Returns:
+        True if the remote is on the local filesystem
+    """
+    if git_url.startswith('file://'):
+        return True
+    elif '://' in git_url:
+        return False
+
+    colon = git_url.find(':')
+    return colon == -1 or '/' in git_url[:colon]
+
+
+def normalize_git_url(git_url: str) -> str:
+    """Method to clean up a git remote entered by the user
+
+    Overleaf URLs are extracted from the whole git command that Overleaf displays, if that was pasted instead. Other
+    remotes, including `file://` URLs and paths to a local mirror, are used as they are. Local paths are made absolute.
+
+    Args:
+        git_url: the URL of the git remote, or a `git clone` command containing it
+
+    Returns:
+        the URL of the git remote
+    """
+    # Handle if the user passed in the link or the whole git command that Overleaf displays
+    idx = git_url.find('git.overleaf.com')
+    if idx != -1:
+        return 'https://' + git_url[idx:].split(maxsplit=1)[0]
+
+    tokens = git_url.split()
+    if tokens[:2] == ['git', 'clone']:
+        tokens = tokens[2:]
+    if len(tokens) != 1:
+        raise ValueError("Git URL is malformed. Should be like: https://git.overleaf.com/xxxxxxxxxxxxx, or a file:// "
+                         "URL or path to a local git repository")
+
+    git_url = tokens[0]
+    if is_local_git_url(git_url) and not git_url.startswith('file://'):
+        git_url = os.path.abspath(os.path.expanduser(git_url))
+        if not os.path.isdir(git_url):
+            raise ValueError(f"Local git repository does not exist: {git_url}")
+
+    return git_url
+
+
 @dataclass
 class OverleafConfig:
     """Dataclass to store overleaf configuration data"""
     git_url: str
     local_git_dir: str
     gigaleaf_version: str
+    hash_algorithm: str = DEFAULT_ALGORITHM
+    hash_buffer_size: int = DEFAULT_BUFFER_SIZE
+    clone_mode: str = 'full'
+    sparse_checkout: bool = False
+    git_backend: str = 'subprocess'
+    optimize_images: bool = False
+    image_max_dpi: Optional[int] = None
+    copy_strategy: str = 'auto'
 
 
 class Overleaf:
@@ -24,6 +92,11 @@ class Overleaf:
         self.overleaf_config_file = os.path.join(Gigantum.get_gigantum_directory(), 'overleaf.json')
         self.overleaf_repo_directory = os.path.join(Gigantum.get_overleaf_root_directory(), 'project')
         self.overleaf_credential_file = os.path.join(Gigantum.get_overleaf_root_directory(), 'credentials.json')
+        # The last-seen head of the Overleaf remote, used to skip pulls when it has not moved
+        self.remote_state_file = os.path.join(Gigantum.get_overleaf_root_directory(), 'remote_state.json')
+
+        # The git backend, created the first time it is needed
+        self._git_backend: Optional[GitBackend] = None
 
         self.config: OverleafConfig = self._load_config()
 
@@ -33,38 +106,57 @@ class Overleaf:
                 # Overleaf project does not exist locally yet, clone
                 self._clone()
 
-    def _git(self, cmd_tokens: List[str], cwd: str) -> str:
-        """Execute a subprocess call and properly benchmark and log
+    @property
+    def git(self) -> GitBackend:
+        """The backend used to run git operations on the Overleaf Project repository, selected by `git_backend` in
+        overleaf.json
+
+        Returns:
+            GitBackend
+        """
+        if self._git_backend is None:
+            self._git_backend = get_git_backend(self.config.git_backend, self.overleaf_repo_directory,
+                                                self.config.git_url, self._get_creds,
+                                                clone_mode=self.config.clone_mode,
+                                                sparse_checkout=self.config.sparse_checkout)
+        return self._git_backend
+
+    def stage(self, paths: Sequence[str]) -> None:
+        """Method to stage a set of files in the Overleaf git repository
+
+        Only the given files are examined, so unlike `git add -A` the cost does not grow with the size of the Overleaf
+        project. Files that exist are added and files that no longer exist are removed from the index.
 
         Args:
-            cmd_tokens: List of command tokens, e.g., ['ls', '-la']
-            cwd: Current working directory
+            paths: paths to files, relative to the root of the Overleaf git repository
 
         Returns:
-            Decoded stdout of called process after completing
-
-        Raises:
-            subprocess.CalledProcessError
+            None
         """
-        email, password = self._get_creds()
-        env_vars = os.environ
-        env_vars['OVERLEAF_EMAIL'] = email
-        env_vars['OVERLEAF_PASSWORD'] = password
-        env_vars['GIT_ASKPASS'] = "gigaleaf_askpass"
+        if not paths:
+            return
 
-        return call_subprocess(['git'] + cmd_tokens, cwd, check=True, shell=False, env=dict(env_vars))
+        self.git.stage(paths)
 
-    def commit(self) -> str:
-        """Method to commit changes to the Overleaf git repository
+    def commit(self, paths: Sequence[str], revision: Optional[str] = None) -> bool:
+        """Method to stage files and commit them to the Overleaf git repository
+
+        Args:
+            paths: the files to stage, relative to the root of the Overleaf git repository
+            revision: the current revision of the Gigantum Project, used in the commit message. If omitted, it is
+                      looked up.
 
         Returns:
-            the output from git commands
+            True if a commit was created, False if there was nothing to commit
         """
-        output1 = self._git(['add', '-A'], self.overleaf_repo_directory)
-        output2 = self._git(['commit', '-m', f'Updating linked Gigantum files ({Gigantum.get_current_revision()})'],
-                            self.overleaf_repo_directory)
+        if not paths:
+            return False
+        self.stage(paths)
+
+        if revision is None:
+            revision = Gigantum.get_current_revision()
 
-        return output1 + output2
+        return self.git.commit(f'Updating linked Gigantum files ({revision})')
 
     def pull(self) -> str:
         """Method to pull changes to the Overleaf git repository
@@ -72,29 +164,145 @@ class Overleaf:
         Returns:
             the output from the git command
         """
-        return self._git(['pull'], self.overleaf_repo_directory)
+        return self.git.pull()
+
+    def get_remote_head(self) -> Optional[str]:
+        """Method to get the commit the Overleaf remote's HEAD points to, without fetching anything
+
+        Returns:
+            the commit hash, or None if the remote has no commits yet
+        """
+        return self.git.get_remote_head()
+
+    def pull_if_changed(self) -> Tuple[bool, float]:
+        """Method to pull changes to the Overleaf git repository, only if the remote has moved since the last pull or
+        push
+
+        Checking the remote head is much cheaper than a pull, since nothing is fetched.
+
+        Returns:
+            a tuple of (True if the pull was skipped, estimated seconds saved by skipping it)
+        """
+        start = time.perf_counter()
+        remote_head = self.get_remote_head()
+        check_seconds = time.perf_counter() - start
+
+        state = self._load_remote_state()
+        if remote_head is not None and remote_head == state.get('remote_head'):
+            return True, max(0.0, float(state.get('pull_seconds', 0.0)) - check_seconds)
+
+        start = time.perf_counter()
+        self.pull()
+        self._save_remote_state(remote_head=remote_head, pull_seconds=time.perf_counter() - start)
+        return False, 0.0
+
+    def has_unpushed_commits(self) -> bool:
+        """Method to check if the local repository has commits that are not on the Overleaf remote, e.g. because an
+        earlier push failed
+
+        The local head is compared with the remote head recorded by the last pull or push, so nothing is fetched.
+
+        Returns:
+            True if the local head differs from the last-seen remote head, False if it doesn't or either is unknown
+        """
+        state = self._load_remote_state()
+        if 'remote_head' not in state:
+            return False
+
+        try:
+            head = self.git.get_head()
+        except (ValueError, KeyError):
+            # The repository has no commits yet
+            return False
+
+        return bool(head != state['remote_head'])
+
+    def _load_remote_state(self) -> Dict[str, Any]:
+        """Method to load the last-seen state of the Overleaf remote
+
+        Returns:
+            dictionary with the `remote_head` and `pull_seconds` (duration of the last pull), or an empty dictionary
+            if nothing was recorded for the configured remote
+        """
+        if not os.path.isfile(self.remote_state_file):
+            return dict()
+
+        with open(self.remote_state_file, 'rt') as sf:
+            state: Dict[str, Any] = json.load(sf)
+
+        if state.get('git_url') != self.config.git_url:
+            return dict()
+
+        return state
+
+    def _save_remote_state(self, **kwargs: Any) -> None:
+        """Method to update the last-seen state of the Overleaf remote
+
+        Args:
+            **kwargs: the fields to set. Existing fields not in `kwargs` are kept.
+
+        Returns:
+            None
+        """
+        state = self._load_remote_state()
+        state.update(kwargs)
+        state['git_url'] = self.config.git_url
+
+        tmp_file = self.remote_state_file + '.tmp'
+        with open(tmp_file, 'wt') as sf:
+            json.dump(state, sf)
+        os.replace(tmp_file, self.remote_state_file)
 
     def push(self) -> str:
-        """Method to pull changes to the Overleaf git repository
+        """Method to push changes to the Overleaf git repository
+
+        After a successful push the remote head is the local head, so it is recorded as the last-seen remote head.
 
         Returns:
             the output from the git command
         """
-        return self._git(['push'], self.overleaf_repo_directory)
+        output = self.git.push()
+        self._save_remote_state(remote_head=self.git.get_head())
+        return output
+
+    def _get_clone_args(self) -> List[str]:
+        """Method to get the arguments for `git clone` for the configured clone mode
+
+        Later pulls keep the clone small: a shallow clone only fetches the new commits and a partial clone only fetches
+        the contents of files that are checked out.
+
+        Returns:
+            list of command tokens
+        """
+        if self.config.clone_mode == 'full':
+            args = list()
+        elif self.config.clone_mode == 'shallow':
+            args = ['--depth', '1']
+        elif self.config.clone_mode == 'partial':
+            args = ['--filter=blob:none']
+        else:
+            raise ValueError(f"Unsupported clone mode: {self.config.clone_mode}. Supported modes are: "
+                             f"{', '.join(CLONE_MODES)}")
+
+        return args
 
     def _clone(self) -> None:
         """Method to clone the Overleaf project into the untracked section of the Gigantum Project
 
+        If `sparse_checkout` is configured, only the files in the root of the Overleaf project and the `gigantum`
+        directory managed by gigaleaf are checked out.
+
         Returns:
             the output from the git command
         """
         if os.path.isdir(self.overleaf_repo_directory):
             raise ValueError("Repository already has been cloned.")
 
+        clone_args = self._get_clone_args()
         os.makedirs(self.overleaf_repo_directory)
 
         print("Cloning Overleaf Project to output/untracked/overleaf/project")
-        output = self._git(['clone', self.config.git_url, self.overleaf_repo_directory], self.overleaf_repo_directory)
+        output = self.git.clone(clone_args, sparse_checkout=self.config.sparse_checkout)
 
         print(output)
 
@@ -116,7 +324,15 @@ class Overleaf:
 
         return OverleafConfig(git_url=config_data['overleaf_git_url'],
                               local_git_dir=self.overleaf_repo_directory,
-                              gigaleaf_version=config_data['gigaleaf_version'])
+                              gigaleaf_version=config_data['gigaleaf_version'],
+                              hash_algorithm=config_data.get('hash_algorithm', DEFAULT_ALGORITHM),
+                              hash_buffer_size=config_data.get('hash_buffer_size', DEFAULT_BUFFER_SIZE),
+                              clone_mode=config_data.get('clone_mode', 'full'),
+                              sparse_checkout=config_data.get('sparse_checkout', False),
+                              git_backend=config_data.get('git_backend', 'subprocess'),
+                              optimize_images=config_data.get('optimize_images', False),
+                              image_max_dpi=config_data.get('image_max_dpi'),
+                              copy_strategy=config_data.get('copy_strategy', 'auto'))
 
     def _init_config(self) -> None:
         """Private method to configure an overleaf integration
@@ -128,17 +344,11 @@ class Overleaf:
         intro_message = Path(Path(__file__).parent.absolute(), 'resources', 'intro_message.txt').read_text()
         print(intro_message)
 
-        project_url = input("Overleaf Git url: ").strip()
+        project_url = normalize_git_url(input("Overleaf Git url: "))
 
-        # Handle if the user passed in the link or the whole git command that Overleaf displays
-        idx = project_url.find('git.overleaf.com')
-        if idx == -1:
-            raise ValueError("Overleaf Git URL is malformed. Should be like: https://git.overleaf.com/xxxxxxxxxxxxx")
-        else:
-            project_url = 'https://' + project_url[idx:].split(maxsplit=1)[0]
-
-        # Prompt for email and password
-        self._init_creds()
+        if not is_local_git_url(project_url):
+            # Prompt for email and password
+            self._init_creds()
 
         # Write overleaf config file
         config = {"overleaf_git_url": project_url,
@@ -150,11 +360,14 @@ class Overleaf:
         Gigantum.commit_overleaf_config_file(self.overleaf_config_file)
 
     def _get_creds(self) -> Tuple[str, str]:
-        """Load the credential file. If missing, prompt the user.
+        """Load the credential file. If missing, prompt the user. Local remotes don't need credentials.
 
         Returns:
             a tuple containing the email address and password
         """
+        if is_local_git_url(self.config.git_url) and not os.path.isfile(self.overleaf_credential_file):
+            return "", ""
+
         if not os.path.isfile(self.overleaf_credential_file):
             self._init_creds()
 
@@ -199,3 +412,5 @@ class Overleaf:
 
         with open(self.overleaf_credential_file, 'wt') as cf:
             json.dump(creds, cf)
+
+        self._git_backend = None
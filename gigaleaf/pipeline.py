@@ -0,0 +1,191 @@
+from typing import List, Optional, Sequence, Callable, Any, Tuple, Dict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor, Future
+import time
+import os
+
+from gigaleaf import tracing
+from gigaleaf.linkedfiles.linkedfile import LinkedFile
+from gigaleaf.report import UpdateResult
+
+
+def _format_error(err: BaseException) -> str:
+    """Helper to format an exception raised while updating a linked file
+
+    Args:
+        err: the exception
+
+    Returns:
+        a short error message including the exception type
+    """
+    return f"{type(err).__name__}: {err}"
+
+
+def _update_data(linked_file: LinkedFile) -> bool:
+    """Helper to run the I/O-bound stage of an update (hash, copy, metadata) for a single linked file
+
+    Args:
+        linked_file: the linked file to update
+
+    Returns:
+        True if the linked file was modified
+    """
+    with tracing.span('update', file=linked_file.metadata_filename):
+        return linked_file._update_data()
+
+
+def _write_subfile(linked_file: LinkedFile) -> Tuple[float, float, Dict[str, Any], List[str]]:
+    """Helper to run the render stage of an update for a single linked file
+
+    This is a module level function so it can be pickled and sent to a process pool. The render is timed here, since
+    the tracer is not available in other processes.
+
+    Args:
+        linked_file: the linked file to render
+
+    Returns:
+        a tuple of (wall clock start time, duration in seconds, details about the render such as its peak memory,
+        shard subfiles written or removed)
+    """
+    start = time.time()
+    start_counter = time.perf_counter()
+    linked_file.write_subfile()
+    return start, time.perf_counter() - start_counter, linked_file.render_attributes, linked_file.shard_changes
+
+
+def _submit(executor: Optional[Executor], fn: Callable[[LinkedFile], Any],
+            linked_files: Sequence[LinkedFile]) -> List["Future[Any]"]:
+    """Helper to submit a stage of the update pipeline for each linked file
+
+    Args:
+        executor: the executor to run the stage on, or None to run serially in this thread
+        fn: the function to apply to each linked file
+        linked_files: the linked files to process
+
+    Returns:
+        a future for each linked file, in the same order as `linked_files`
+    """
+    futures: List["Future[Any]"] = list()
+    for lf in linked_files:
+        if executor is not None:
+            futures.append(executor.submit(fn, lf))
+        else:
+            future: "Future[Any]" = Future()
+            try:
+                future.set_result(fn(lf))
+            except Exception as err:
+                future.set_exception(err)
+            futures.append(future)
+
+    return futures
+
+
+def _collect(futures: Sequence["Future[Any]"], results: Sequence[UpdateResult]) -> List[Any]:
+    """Helper to wait for a stage of the update pipeline, collecting errors into the per-file results
+
+    Args:
+        futures: the futures returned by `_submit()`
+        results: the result for each linked file, in the same order as `futures`
+
+    Returns:
+        the return value of the stage for each linked file, or None if it raised
+    """
+    outputs: List[Any] = list()
+    for future, result in zip(futures, results):
+        try:
+            outputs.append(future.result())
+        except Exception as err:
+            result.error = _format_error(err)
+            outputs.append(None)
+
+    return outputs
+
+
+def get_default_workers() -> int:
+    """Method to get the default number of workers used to update linked files
+
+    Returns:
+        int
+    """
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def update_linked_files(linked_files: Sequence[LinkedFile], workers: Optional[int] = None) -> List[UpdateResult]:
+    """Method to update a collection of linked files in parallel
+
+    The update runs in two stages. First, the I/O-bound work (hashing, copying, writing metadata) for every file runs
+    in a thread pool. Then, subfiles for modified files are rendered. Subfiles that are CPU-bound to render (e.g. a
+    dataframe) are rendered in a process pool, while all others are rendered in the thread pool. If `workers` is 1,
+    everything runs serially in the calling thread.
+
+    Errors do not stop the update of other files. Instead they are collected in the result for each file.
+
+    Args:
+        linked_files: the linked files to update
+        workers: the maximum number of threads (and processes) to use. Defaults to `get_default_workers()`
+
+    Returns:
+        an UpdateResult for each linked file, in the same order as `linked_files`
+    """
+    if workers is None:
+        workers = get_default_workers()
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1")
+
+    results = [UpdateResult(lf.metadata_filename, type(lf).__name__) for lf in linked_files]
+    if not linked_files:
+        return results
+
+    thread_pool: Optional[ThreadPoolExecutor] = None
+    process_pool: Optional[ProcessPoolExecutor] = None
+    try:
+        if workers > 1:
+            thread_pool = ThreadPoolExecutor(max_workers=workers)
+
+        # Stage 1: hash, copy, and update metadata
+        modified = _collect(_submit(thread_pool, _update_data, linked_files), results)
+        for is_modified, result in zip(modified, results):
+            result.modified = bool(is_modified)
+
+        # Stage 2: render subfiles of modified files. CPU-bound renders run in a process pool, if there is enough of
+        # them to make it worth starting one, alongside the rest in the thread pool.
+        to_render = [(lf, r) for lf, r in zip(linked_files, results) if r.modified]
+        cpu_bound = [(lf, r) for lf, r in to_render if lf._is_cpu_bound()]
+        io_bound = [(lf, r) for lf, r in to_render if not lf._is_cpu_bound()]
+        if workers > 1 and len(cpu_bound) > 1:
+            # The linked files of a sync share one context. Resolve its revision once, before the context is copied into
+            # each process, so the processes don't each start a git subprocess to look it up.
+            for context in {id(lf.context): lf.context for lf, _ in cpu_bound}.values():
+                _ = context.revision
+            process_pool = ProcessPoolExecutor(max_workers=min(workers, os.cpu_count() or 1, len(cpu_bound)))
+        else:
+            io_bound = cpu_bound + io_bound
+            cpu_bound = list()
+
+        cpu_futures = _submit(process_pool, _write_subfile, [lf for lf, _ in cpu_bound])
+        io_futures = _submit(thread_pool, _write_subfile, [lf for lf, _ in io_bound])
+        renders = _collect(cpu_futures, [r for _, r in cpu_bound]) + _collect(io_futures, [r for _, r in io_bound])
+
+        # Subfiles rendered in a process pool can't record themselves, so record every render here. Failed renders may
+        # have partially written their subfile, so they are recorded too.
+        for (lf, _), render in zip(cpu_bound + io_bound, renders):
+            lf.context.record_change(lf.subfile_filename)
+            if render is None:
+                # The new hashes are already in the manifest, so make sure the next sync renders the subfile again
+                lf._invalidate()
+            else:
+                start, duration, attributes, shard_changes = render
+                for filename in shard_changes:
+                    lf.context.record_change(filename)
+                tracer = tracing.get_active_tracer()
+                if tracer is not None:
+                    tracer.add_span('render', start, duration, file=lf.metadata_filename, **attributes)
+                    for filename in [lf.subfile_filename] + shard_changes:
+                        if os.path.isfile(filename):
+                            tracer.count('bytes_written', os.path.getsize(filename))
+    finally:
+        if thread_pool is not None:
+            thread_pool.shutdown()
+        if process_pool is not None:
+            process_pool.shutdown()
+
+    return results
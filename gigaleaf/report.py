@@ -0,0 +1,83 @@
+from typing import Optional, List, Dict
+from dataclasses import dataclass, field
+
+from gigaleaf.tracing import Span
+
+
+@dataclass
+class UpdateResult:
+    """Dataclass to store the outcome of updating a single linked file during a sync"""
+    metadata_filename: str
+    classname: str
+    modified: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class SyncReport:
+    """Dataclass to store the outcome of a sync"""
+    results: List[UpdateResult] = field(default_factory=list)
+    committed: bool = False
+    pull_skipped: bool = False
+    # Estimated seconds saved by skipping the pull, based on the duration of the last pull
+    pull_time_saved: float = 0.0
+    # Total seconds spent in each kind of operation, e.g. `pull`, `hash`, `render` or `subprocess`
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Counters such as `bytes_read`, `bytes_written` and `image_bytes_saved`
+    counters: Dict[str, int] = field(default_factory=dict)
+    # Every timed operation, e.g. the update of each linked file
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def bytes_read(self) -> int:
+        """The number of bytes of linked files read while hashing or copying
+
+        Returns:
+            int
+        """
+        return self.counters.get('bytes_read', 0)
+
+    @property
+    def bytes_written(self) -> int:
+        """The number of bytes written to the Overleaf Project, as copied files and subfiles
+
+        Returns:
+            int
+        """
+        return self.counters.get('bytes_written', 0)
+
+    @property
+    def image_bytes_saved(self) -> int:
+        """The number of bytes saved by optimizing the images copied to the Overleaf Project
+
+        Returns:
+            int
+        """
+        return self.counters.get('image_bytes_saved', 0)
+
+    @property
+    def peak_render_memory(self) -> int:
+        """The most memory, in bytes, used to render a single subfile, as measured for dataframes
+
+        Returns:
+            int
+        """
+        return max([s.attributes.get('peak_memory', 0) for s in self.spans if s.name == 'render'], default=0)
+
+    @property
+    def modified(self) -> List[str]:
+        """The metadata filenames of all linked files that were updated during the sync
+
+        Returns:
+            list of metadata filenames
+        """
+        return [r.metadata_filename for r in self.results if r.modified and r.error is None]
+
+    @property
+    def errors(self) -> Dict[str, str]:
+        """The errors that occurred during the sync, keyed by the metadata filename of the linked file
+
+        Returns:
+            dictionary of metadata filename to error message
+        """
+        return {r.metadata_filename: r.error for r in self.results if r.error is not None}
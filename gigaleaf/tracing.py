@@ -0,0 +1,337 @@
+from typing import Any, Dict, Iterator, List, Optional
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+import json
+import logging
+import threading
+import time
+import tracemalloc
+
+try:
+    from opentelemetry import trace as otel_trace  # type: ignore
+except ImportError:
+    otel_trace = None
+
+
+@dataclass
+class Span:
+    """Dataclass to store a single timed operation"""
+    name: str
+    # Wall clock start time, in seconds since the epoch
+    start: float
+    # Duration in seconds
+    duration: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class Tracer:
+    """Class to collect the timed operations and counters of a single sync
+
+    Operations on any thread (but not in other processes) are collected while the tracer is active. Only one tracer is
+    active at a time, which matches syncs running one at a time.
+    """
+    def __init__(self) -> None:
+        self.start = time.time()
+        self.spans: List[Span] = list()
+        self.counters: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        """Context manager to time an operation
+
+        Args:
+            name: the name of the operation, e.g. `pull`
+            **attributes: extra details to record, e.g. the linked file
+
+        Returns:
+            None
+        """
+        start = time.time()
+        start_counter = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter() - start_counter, **attributes)
+
+    def add_span(self, name: str, start: float, duration: float, **attributes: Any) -> None:
+        """Method to record an operation that was timed elsewhere, e.g. in another process
+
+        Args:
+            name: the name of the operation
+            start: wall clock start time, in seconds since the epoch
+            duration: duration in seconds
+            **attributes: extra details to record
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.spans.append(Span(name, start, duration, attributes))
+
+    def count(self, name: str, value: int) -> None:
+        """Method to add to a counter, e.g. `bytes_read`
+
+        Args:
+            name: the name of the counter
+            value: the amount to add
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_timings(self) -> Dict[str, float]:
+        """Method to get the total time spent in each kind of operation
+
+        Operations running in parallel are all counted, so the total for e.g. `hash` can exceed the duration of the
+        sync.
+
+        Returns:
+            dictionary of operation name to total seconds
+        """
+        timings: Dict[str, float] = dict()
+        with self._lock:
+            for s in self.spans:
+                timings[s.name] = timings.get(s.name, 0.0) + s.duration
+        return timings
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Method to get the trace as a JSON serializable dictionary
+
+        Returns:
+            dict
+        """
+        with self._lock:
+            spans = [asdict(s) for s in self.spans]
+            counters = dict(self.counters)
+        return {"start": self.start, "timings": self.get_timings(), "counters": counters, "spans": spans}
+
+
+# The tracer of the sync that is currently running, if any
+_active_tracer: Optional[Tracer] = None
+
+
+def start_trace() -> Tracer:
+    """Method to create a tracer and make it the active tracer
+
+    Returns:
+        Tracer
+    """
+    global _active_tracer
+    _active_tracer = Tracer()
+    return _active_tracer
+
+
+def get_active_tracer() -> Optional[Tracer]:
+    """Method to get the active tracer
+
+    Returns:
+        the tracer of the sync that is currently running, or None
+    """
+    return _active_tracer
+
+
+def stop_trace() -> None:
+    """Method to stop collecting operations in the active tracer
+
+    Returns:
+        None
+    """
+    global _active_tracer
+    _active_tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Context manager to time an operation with the active tracer. Does nothing if no tracer is active.
+
+    Args:
+        name: the name of the operation, e.g. `pull`
+        **attributes: extra details to record, e.g. the linked file
+
+    Returns:
+        None
+    """
+    tracer = _active_tracer
+    if tracer is None:
+        yield
+    else:
+        with tracer.span(name, **attributes):
+            yield
+
+
+def count(name: str, value: int) -> None:
+    """Method to add to a counter of the active tracer. Does nothing if no tracer is active.
+
+    Args:
+        name: the name of the counter, e.g. `bytes_read`
+        value: the amount to add
+
+    Returns:
+        None
+    """
+    tracer = _active_tracer
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+@dataclass
+class MemoryUsage:
+    """Dataclass to store the memory used by an operation"""
+    # The most bytes in use at once, above what was in use when the operation started
+    peak: int = 0
+
+
+def _read_rss() -> Optional[Dict[str, int]]:
+    """Helper to read the current and peak resident memory of this process on Linux
+
+    Returns:
+        dictionary with `VmRSS` and `VmHWM` in bytes, or None if they are not available
+    """
+    try:
+        with open('/proc/self/status', 'rt') as f:
+            values = {line.split(':')[0]: int(line.split()[1]) * 1024 for line in f
+                      if line.startswith(('VmRSS:', 'VmHWM:'))}
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return values if len(values) == 2 else None
+
+
+def _reset_peak_rss() -> bool:
+    """Helper to reset the peak resident memory of this process to its current value, on Linux
+
+    Returns:
+        True if the peak was reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'wt') as f:
+            f.write('5')
+    except OSError:
+        return False
+
+    return _read_rss() is not None
+
+
+@contextmanager
+def measure_peak_memory() -> Iterator[MemoryUsage]:
+    """Context manager to measure the peak memory used during an operation
+
+    On Linux the peak resident memory of the process is measured, which includes memory allocated outside Python (e.g.
+    by Arrow). Elsewhere only allocations made by Python and NumPy are measured, with `tracemalloc`. Memory used on
+    other threads is included, so the result is approximate when other work runs at the same time.
+
+    Returns:
+        MemoryUsage, populated when the context exits
+    """
+    usage = MemoryUsage()
+    if _reset_peak_rss():
+        before = _read_rss()
+        try:
+            yield usage
+        finally:
+            after = _read_rss()
+            if before is not None and after is not None:
+                usage.peak = max(0, after['VmHWM'] - before['VmRSS'])
+        return
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        yield usage
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        usage.peak = max(0, peak - baseline)
+        if started:
+            tracemalloc.stop()
+
+
+class TraceHook(ABC):
+    """Abstract class for destinations of the trace of a sync"""
+    @abstractmethod
+    def emit(self, tracer: Tracer) -> None:
+        """Method called with the trace once a sync has finished, whether it succeeded or not
+
+        Args:
+            tracer: the tracer of the sync
+
+        Returns:
+            None
+        """
+        raise NotImplementedError
+
+
+class LoggingTraceHook(TraceHook):
+    """Trace hook that logs a summary of each sync, and each operation at debug level, to the `gigaleaf` logger"""
+    def __init__(self, logger: Optional[logging.Logger] = None) -> None:
+        """
+        Args:
+            logger: the logger to use. Defaults to the `gigaleaf` logger.
+        """
+        self.logger = logger if logger is not None else logging.getLogger('gigaleaf')
+
+    def emit(self, tracer: Tracer) -> None:
+        for s in tracer.spans:
+            self.logger.debug("%s took %.3fs %s", s.name, s.duration, s.attributes)
+
+        timings = ", ".join([f"{name}={seconds:.3f}s" for name, seconds in sorted(tracer.get_timings().items())])
+        counters = ", ".join([f"{name}={value}" for name, value in sorted(tracer.counters.items())])
+        self.logger.info("Sync timings: %s. Counters: %s", timings, counters)
+
+
+class JsonTraceHook(TraceHook):
+    """Trace hook that appends the full trace of each sync to a JSON lines file"""
+    def __init__(self, filename: str) -> None:
+        """
+        Args:
+            filename: absolute path to the file to append to
+        """
+        self.filename = filename
+
+    def emit(self, tracer: Tracer) -> None:
+        with open(self.filename, 'at') as tf:
+            tf.write(json.dumps(tracer.to_dict()) + '\n')
+
+
+class OpenTelemetryTraceHook(TraceHook):
+    """Trace hook that reports each sync as OpenTelemetry spans, with each operation as a child of a `gigaleaf.sync`
+    span
+
+    Requires the `opentelemetry-api` package. Spans are sent to whatever tracer provider the application configured.
+    """
+    def __init__(self) -> None:
+        if otel_trace is None:
+            raise ValueError("OpenTelemetry is not available. Install it with `pip install opentelemetry-api`.")
+        self.otel_tracer = otel_trace.get_tracer('gigaleaf')
+
+    def emit(self, tracer: Tracer) -> None:
+        end = max([s.start + s.duration for s in tracer.spans], default=tracer.start)
+        root = self.otel_tracer.start_span('gigaleaf.sync', start_time=int(tracer.start * 1e9),
+                                           attributes={f"gigaleaf.{k}": v for k, v in tracer.counters.items()})
+        context = otel_trace.set_span_in_context(root)
+        for s in tracer.spans:
+            attributes = {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in s.attributes.items()}
+            child = self.otel_tracer.start_span(f"gigaleaf.{s.name}", context=context,
+                                                start_time=int(s.start * 1e9), attributes=attributes)
+            child.end(end_time=int((s.start + s.duration) * 1e9))
+        root.end(end_time=int(end * 1e9))
+
+
+def get_default_trace_hooks() -> List[TraceHook]:
+    """Method to get the trace hooks used by default: logging, and OpenTelemetry if it is installed
+
+    Returns:
+        list of TraceHook
+    """
+    hooks: List[TraceHook] = [LoggingTraceHook()]
+    if otel_trace is not None:
+        hooks.append(OpenTelemetryTraceHook())
+    return hooks
@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional, Set, Tuple
+import errno
+import os
+import threading
+
+from gigaleaf import tracing
+from gigaleaf.hashing import hash_file, copy_and_hash_file, DEFAULT_ALGORITHM, DEFAULT_BUFFER_SIZE
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+
+
+# ioctl request to clone a file's extents on Linux, supported by e.g. btrfs, XFS and bcachefs
+FICLONE = 0x40049409
+
+# The ways a file can be copied, from cheapest to most expensive:
+#   reflink          the copy shares the original's blocks until either is modified, so no data is copied
+#   copy_file_range  the kernel copies the data, or offloads it to the filesystem or server
+#   sendfile         the kernel copies the data without passing it through Python
+#   buffered         the data is read into Python and written out again
+COPY_STRATEGIES = ('reflink', 'copy_file_range', 'sendfile', 'buffered')
+
+# Errors that mean a strategy is not supported between two filesystems, rather than that the copy failed
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EINVAL, errno.ENOSYS, errno.ENOTTY,
+                       errno.EBADF, errno.EPERM}
+
+# Strategies found not to work, keyed by the devices of the source and destination filesystems
+_unsupported: Dict[Tuple[int, int], Set[str]] = dict()
+_unsupported_lock = threading.Lock()
+
+
+def _is_available(strategy: str) -> bool:
+    """Helper to check if a strategy is implemented on this platform
+
+    Args:
+        strategy: one of `COPY_STRATEGIES`
+
+    Returns:
+        bool
+    """
+    if strategy == 'reflink':
+        return fcntl is not None and hasattr(fcntl, 'ioctl')
+    elif strategy == 'copy_file_range':
+        return hasattr(os, 'copy_file_range')
+    elif strategy == 'sendfile':
+        return hasattr(os, 'sendfile')
+    else:
+        return True
+
+
+def get_copy_strategies(src: str, dst_directory: str, preferred: str = 'auto') -> List[str]:
+    """Method to get the strategies to try, in order, to copy a file into a directory
+
+    Strategies that failed before between the same two filesystems are skipped, so each filesystem's capabilities are
+    only detected once per process.
+
+    Args:
+        src: absolute path to the file to copy
+        dst_directory: absolute path to the directory it is copied into
+        preferred: `auto` to try every strategy, or one of `COPY_STRATEGIES` to only try that one before the buffered
+                   copy
+
+    Returns:
+        list of strategy names, always ending with `buffered`
+    """
+    if preferred != 'auto' and preferred not in COPY_STRATEGIES:
+        raise ValueError(f"Unsupported copy strategy: {preferred}. Supported strategies are: auto, "
+                         f"{', '.join(COPY_STRATEGIES)}")
+
+    candidates = COPY_STRATEGIES if preferred == 'auto' else (preferred, 'buffered')
+    key = (os.stat(src).st_dev, os.stat(dst_directory).st_dev)
+    with _unsupported_lock:
+        unsupported = _unsupported.get(key, set())
+        strategies = [s for s in candidates if s not in unsupported and _is_available(s)]
+
+    if 'buffered' not in strategies:
+        strategies.append('buffered')
+    return strategies
+
+
+def _mark_unsupported(src: str, dst_directory: str, strategy: str) -> None:
+    """Helper to remember that a strategy does not work between two filesystems
+
+    Args:
+        src: absolute path to the file that was copied
+        dst_directory: absolute path to the directory it was copied into
+        strategy: the strategy that failed
+
+    Returns:
+        None
+    """
+    key = (os.stat(src).st_dev, os.stat(dst_directory).st_dev)
+    with _unsupported_lock:
+        _unsupported.setdefault(key, set()).add(strategy)
+
+
+def _kernel_copy(src: str, dst: str, strategy: str) -> int:
+    """Helper to copy a file without passing the data through Python
+
+    Args:
+        src: absolute path to the file to copy
+        dst: absolute path to write the copy to
+        strategy: `reflink`, `copy_file_range` or `sendfile`
+
+    Returns:
+        the number of bytes copied
+    """
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        size = os.fstat(fs.fileno()).st_size
+        if strategy == 'reflink':
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+            return size
+
+        offset = 0
+        while offset < size:
+            if strategy == 'copy_file_range':
+                num_bytes = os.copy_file_range(fs.fileno(), fd.fileno(), size - offset, offset, offset)
+            else:
+                os.lseek(fd.fileno(), offset, os.SEEK_SET)
+                num_bytes = os.sendfile(fd.fileno(), fs.fileno(), offset, size - offset)
+            if num_bytes == 0:
+                # Some filesystems report success without copying anything
+                raise OSError(errno.EINVAL, f"{strategy} copied no data")
+            offset += num_bytes
+
+        return offset
+
+
+def copy_and_hash(src: str, dst: str, algorithm: str = DEFAULT_ALGORITHM, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                  preferred: str = 'auto') -> Tuple[str, str]:
+    """Method to copy a file with the cheapest strategy available, and hash the copied data
+
+    The hash always describes the data that was written to `dst`. A buffered copy hashes the data as it passes
+    through. Otherwise the kernel copies the data and the copy is hashed afterwards. For a reflink this is the only
+    time the data is read, and for the other strategies it is read back from the page cache.
+
+    Args:
+        src: absolute path to the file to copy
+        dst: absolute path to write the copy to
+        algorithm: the name of the hash algorithm to use
+        buffer_size: the number of bytes to read at a time
+        preferred: `auto` to use the cheapest strategy that works, or one of `COPY_STRATEGIES`
+
+    Returns:
+        a tuple of the hex digest of the copied data and the strategy that was used
+    """
+    dst_directory = os.path.dirname(dst)
+    for strategy in get_copy_strategies(src, dst_directory, preferred):
+        if strategy == 'buffered':
+            return copy_and_hash_file(src, dst, algorithm, buffer_size), strategy
+
+        try:
+            num_bytes = _kernel_copy(src, dst, strategy)
+        except OSError as err:
+            if err.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            _mark_unsupported(src, dst_directory, strategy)
+            continue
+
+        tracing.count('bytes_written', num_bytes)
+        return hash_file(dst, algorithm, buffer_size), strategy
+
+    raise ValueError(f"Failed to copy {src}")
+
+
+def reset_detected_strategies(devices: Optional[Tuple[int, int]] = None) -> None:
+    """Method to forget which strategies were found not to work, e.g. after a filesystem is remounted
+
+    Args:
+        devices: the devices of the source and destination filesystems to forget, or None to forget all of them
+
+    Returns:
+        None
+    """
+    with _unsupported_lock:
+        if devices is None:
+            _unsupported.clear()
+        else:
+            _unsupported.pop(devices, None)
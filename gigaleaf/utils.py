@@ -1,9 +1,12 @@
 from typing import List, Optional, Dict
 import subprocess
 
+from gigaleaf import tracing
+
 
 def call_subprocess(cmd_tokens: List[str], cwd: str, check: bool = True,
-                    shell: bool = False, env: Optional[Dict[str, str]] = None) -> str:
+                    shell: bool = False, env: Optional[Dict[str, str]] = None,
+                    input_data: Optional[bytes] = None) -> str:
     """Execute a subprocess call and properly benchmark and log
 
     Args:
@@ -12,6 +15,7 @@ def call_subprocess(cmd_tokens: List[str], cwd: str, check: bool = True,
         check: Raise exception if command fails
         shell: Run as shell command (not recommended)
         env: environment variables to pass to the subprocess
+        input_data: optional bytes to write to the stdin of the subprocess
 
     Returns:
         Decoded stdout of called process after completing
@@ -20,8 +24,10 @@ def call_subprocess(cmd_tokens: List[str], cwd: str, check: bool = True,
         subprocess.CalledProcessError
     """
     try:
-        r = subprocess.run(cmd_tokens, cwd=cwd, stderr=subprocess.PIPE, stdout=subprocess.PIPE,
-                           check=check, shell=shell, env=env)
+        # Only the command name is recorded, since arguments may be long or sensitive
+        with tracing.span('subprocess', command=" ".join(cmd_tokens[:2])):
+            r = subprocess.run(cmd_tokens, cwd=cwd, stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                               check=check, shell=shell, env=env, input=input_data)
     except subprocess.CalledProcessError as err:
         raise ValueError(f"An error occurred in a subprocess call:\ncmd: {' '.join(cmd_tokens)}\n"
                          f"code: {err.returncode}\n"
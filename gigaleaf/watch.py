@@ -0,0 +1,156 @@
+from typing import Dict, Optional, Sequence, Set, Tuple
+from abc import ABC, abstractmethod
+import os
+import time
+
+try:
+    import inotify_simple  # type: ignore
+except ImportError:
+    inotify_simple = None
+
+
+# The default number of seconds between checks when polling for changes
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def get_stat_signature(filename: str) -> Optional[Tuple[int, int, int]]:
+    """Helper to get the size, modification time and inode of a file, which change whenever it is re-written
+
+    Args:
+        filename: absolute path to the file
+
+    Returns:
+        a tuple of (size, mtime in nanoseconds, inode), or None if the file does not exist
+    """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class Watcher(ABC):
+    """Abstract class to wait for changes to a set of files"""
+    def __init__(self, filenames: Sequence[str]) -> None:
+        """
+        Args:
+            filenames: absolute paths of the files to watch. They don't need to exist yet.
+        """
+        self.filenames = set(filenames)
+
+    @abstractmethod
+    def wait(self, timeout: float) -> Set[str]:
+        """Method to wait until at least one of the files changes, or the timeout expires
+
+        Args:
+            timeout: the maximum number of seconds to wait
+
+        Returns:
+            the absolute paths of the files that changed, which is empty if the timeout expired
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Method to release any resources held by the watcher
+
+        Returns:
+            None
+        """
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Watcher that periodically compares the size, modification time and inode of each file"""
+    def __init__(self, filenames: Sequence[str], poll_interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """
+        Args:
+            filenames: absolute paths of the files to watch. They don't need to exist yet.
+            poll_interval: the number of seconds between checks
+        """
+        super().__init__(filenames)
+        self.poll_interval = poll_interval
+        self._signatures = {f: get_stat_signature(f) for f in self.filenames}
+
+    def _poll(self) -> Set[str]:
+        """Method to check every file once
+
+        Returns:
+            the absolute paths of the files that changed since the last check
+        """
+        changed = set()
+        for filename in self.filenames:
+            signature = get_stat_signature(filename)
+            if signature != self._signatures[filename]:
+                self._signatures[filename] = signature
+                changed.add(filename)
+        return changed
+
+    def wait(self, timeout: float) -> Set[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            changed = self._poll()
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class InotifyWatcher(Watcher):
+    """Watcher that uses inotify to be woken up by the kernel when a file is written
+
+    The parent directories are watched rather than the files themselves, so files that are replaced by a rename (e.g.
+    by an atomic save) or that don't exist yet are still detected. Directories that don't exist when the watcher is
+    created are not watched.
+    """
+    def __init__(self, filenames: Sequence[str]) -> None:
+        """
+        Args:
+            filenames: absolute paths of the files to watch. They don't need to exist yet.
+        """
+        if inotify_simple is None:
+            raise ValueError("inotify is not available. Install it with `pip install inotify_simple`.")
+
+        super().__init__(filenames)
+        flags = inotify_simple.flags
+        # Events that mean a file has new contents or was removed
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE
+
+        self._inotify = inotify_simple.INotify()
+        self._directories: Dict[int, str] = dict()
+        for directory in sorted({os.path.dirname(f) for f in self.filenames}):
+            if os.path.isdir(directory):
+                self._directories[self._inotify.add_watch(directory, mask)] = directory
+
+    def wait(self, timeout: float) -> Set[str]:
+        # Returns early, possibly with no changes, if another file in a watched directory changes
+        changed = set()
+        for event in self._inotify.read(timeout=int(timeout * 1000)):
+            directory = self._directories.get(event.wd)
+            if directory is not None and event.name:
+                filename = os.path.join(directory, event.name)
+                if filename in self.filenames:
+                    changed.add(filename)
+        return changed
+
+    def close(self) -> None:
+        self._inotify.close()
+
+
+def create_watcher(filenames: Sequence[str], poll_interval: float = DEFAULT_POLL_INTERVAL) -> Watcher:
+    """Method to create the most efficient watcher available, using inotify if possible and polling otherwise
+
+    Args:
+        filenames: absolute paths of the files to watch
+        poll_interval: the number of seconds between checks, if polling
+
+    Returns:
+        Watcher
+    """
+    if inotify_simple is not None:
+        try:
+            return InotifyWatcher(filenames)
+        except OSError:
+            # e.g. the inotify watch limit was reached, or the filesystem does not support inotify
+            pass
+
+    return PollingWatcher(filenames, poll_interval)
@@ -11,6 +11,22 @@ from unittest.mock import patch
 
 from gigaleaf.utils import call_subprocess
 from gigaleaf.gigantum import Gigantum
+from gigaleaf.manifest import Manifest
+from gigaleaf.datastore import resolve_data_object
+
+
+def get_linked_file_metadata(metadata_filename):
+    """Helper to read the metadata of a linked file from the manifest, or None if it isn't linked"""
+    return Manifest(os.path.join(Gigantum.get_overleaf_root_directory(), 'project')).get(metadata_filename)
+
+
+def get_linked_file_data(metadata_filename):
+    """Helper to get the path to the data of a linked file in the Overleaf Project, or None if it isn't linked"""
+    data = get_linked_file_metadata(metadata_filename)
+    if data is None:
+        return None
+    return pathlib.Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
+                        resolve_data_object(data.get('data_object'), data['gigantum_relative_path']))
 
 
 @pytest.fixture
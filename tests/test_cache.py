@@ -0,0 +1,55 @@
+import os
+import time
+
+from gigaleaf.cache import ChangeCache
+from gigaleaf.hashing import hash_file
+
+
+def _write_old_file(path, contents):
+    path.write_bytes(contents)
+    old = time.time() - 100
+    os.utime(path.as_posix(), (old, old))
+
+
+class TestChangeCache:
+    def test_cached_hash(self, tmp_path):
+        data_file = tmp_path / 'data.csv'
+        _write_old_file(data_file, b'a,b\n1,2\n')
+        cache_file = tmp_path / 'cache' / 'change_cache.json'
+
+        cache = ChangeCache(cache_file.as_posix())
+        assert cache.get_hash(data_file.as_posix()) == hash_file(data_file.as_posix())
+        cache.save()
+        assert cache_file.is_file() is True
+
+        # The file is unchanged on disk, so the cached hash is returned without reading the file
+        cache.set_hash(data_file.as_posix(), 'stale')
+        cache.save()
+
+        cache = ChangeCache(cache_file.as_posix())
+        assert cache.get_hash(data_file.as_posix()) == 'stale'
+
+        # Verifying ignores the cache
+        cache = ChangeCache(cache_file.as_posix(), verify=True)
+        assert cache.get_hash(data_file.as_posix()) == hash_file(data_file.as_posix())
+
+    def test_detects_change(self, tmp_path):
+        data_file = tmp_path / 'data.csv'
+        _write_old_file(data_file, b'a,b\n1,2\n')
+
+        cache = ChangeCache((tmp_path / 'change_cache.json').as_posix())
+        first_hash = cache.get_hash(data_file.as_posix())
+
+        _write_old_file(data_file, b'a,b\n1,2\n3,4\n')
+        assert cache.get_hash(data_file.as_posix()) != first_hash
+
+    def test_recent_files_not_cached(self, tmp_path):
+        data_file = tmp_path / 'data.csv'
+        data_file.write_bytes(b'a,b\n1,2\n')
+        cache_file = tmp_path / 'change_cache.json'
+
+        cache = ChangeCache(cache_file.as_posix())
+        cache.get_hash(data_file.as_posix())
+        cache.save()
+
+        assert cache_file.is_file() is False
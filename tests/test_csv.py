@@ -1,62 +1,80 @@
 from pathlib import Path
-import json
+import os
 import shutil
+import pytest
 
 from gigaleaf import Gigaleaf
 from gigaleaf.gigantum import Gigantum
-from tests.fixtures import gigantum_project_fixture
+from gigaleaf.linkedfiles.csv import CsvFile
+from gigaleaf.utils import call_subprocess
+from tests.fixtures import gigantum_project_fixture, get_linked_file_metadata, get_linked_file_data
 
 
 class TestCsvFile:
     def test_link_csv_file_and_sync(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is False
+        assert get_linked_file_metadata('test_csv.json') is None
 
         gigaleaf.link_csv('../output/test.csv', caption="My Cool Table", label="myfig1")
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is True
+        assert get_linked_file_metadata('test_csv.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is True
+        data_file = get_linked_file_data('test_csv.json')
+        assert data_file.is_file() is True
 
         # Delete everything in untracked, reinit, and should still see the files
         shutil.rmtree(gigaleaf.overleaf.overleaf_repo_directory)
         gigaleaf = None
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is False
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is False
+        assert get_linked_file_metadata('test_csv.json') is None
+        assert data_file.is_file() is False
         gigaleaf = Gigaleaf()
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is True
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is True
+        assert get_linked_file_metadata('test_csv.json') is not None
+        assert data_file.is_file() is True
+
+    def test_failed_render_is_retried(self, gigantum_project_fixture, monkeypatch):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_csv('../output/test.csv')
+
+        write_subfile = CsvFile.write_subfile
+        calls = list()
+
+        def fail_once(self):
+            calls.append(self.metadata_filename)
+            if len(calls) == 1:
+                raise ValueError("Failed to render")
+            write_subfile(self)
+
+        monkeypatch.setattr(CsvFile, 'write_subfile', fail_once)
+        with pytest.raises(ValueError):
+            gigaleaf.sync()
+
+        subfile = Path(gigaleaf.overleaf.overleaf_repo_directory, 'gigantum', 'subfiles', 'test_csv.tex')
+        assert subfile.is_file() is False
+
+        # The data was copied, but the subfile is rendered again by the next sync
+        report = gigaleaf.sync()
+        assert report.modified == ['test_csv.json']
+        assert subfile.is_file() is True
+        assert len(calls) == 2
 
     def test_update_csv(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is False
+        assert get_linked_file_metadata('test_csv.json') is None
 
         gigaleaf.link_csv('../output/test.csv', caption="My Cool Table", label="myfig1")
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is True
+        assert get_linked_file_metadata('test_csv.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is True
+        assert get_linked_file_data('test_csv.json').is_file() is True
 
-        metadata_file = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata', 'test_csv.json')
-        with open(metadata_file, 'rt') as mf:
-            data = json.load(mf)
+        data = get_linked_file_metadata('test_csv.json')
 
         first_hash = data['content_hash']
 
@@ -66,33 +84,28 @@ class TestCsvFile:
 
         gigaleaf.sync()
 
-        with open(metadata_file, 'rt') as mf:
-            data = json.load(mf)
+        data = get_linked_file_metadata('test_csv.json')
 
         assert first_hash != data['content_hash']
 
     def test_unlink_csv(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is False
+        assert get_linked_file_metadata('test_csv.json') is None
 
         gigaleaf.link_csv('../output/test.csv', caption="My Cool Table", label="myfig1")
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is True
+        assert get_linked_file_metadata('test_csv.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is True
+        data_file = get_linked_file_data('test_csv.json')
+        assert data_file.is_file() is True
 
         gigaleaf.unlink_image('../output/test.csv')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is False
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is False
+        assert get_linked_file_metadata('test_csv.json') is None
+        assert data_file.is_file() is False
 
         gigaleaf.sync()
 
@@ -101,7 +114,116 @@ class TestCsvFile:
         gigaleaf = None
 
         gigaleaf = Gigaleaf()
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'test_csv.json').is_file() is False
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'test.csv').is_file() is False
+        assert get_linked_file_metadata('test_csv.json') is None
+        assert data_file.is_file() is False
+
+    def test_unlink_before_sync(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+        gigaleaf.sync()
+
+        # A link that was never synced has no subfile to remove
+        gigaleaf.link_csv('../output/test.csv')
+        gigaleaf.unlink_csv('../output/test.csv')
+        assert get_linked_file_metadata('test_csv.json') is None
+
+        # Nothing is left behind to commit
+        report = gigaleaf.sync()
+        assert report.modified == []
+        assert call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory) == ''
+
+    def test_csv_window(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        source = Path(Gigantum.get_project_root(), 'output', 'test.csv')
+
+        gigaleaf.link_csv('../output/test.csv', head=1, columns=['Column1'])
+        report = gigaleaf.sync()
+        assert report.modified == ['test_csv.json']
+
+        rows = source.read_text().splitlines()
+        assert get_linked_file_data('test_csv.json').read_text() == f"Column1\n{rows[1].split(',')[0]}\n"
+        assert get_linked_file_metadata('test_csv.json')['data_variant'] is not None
+
+        # The trimmed file is only regenerated when the source changes
+        report = gigaleaf.sync()
+        assert report.modified == []
+
+        test_dir = Path(__file__).parent.absolute()
+        shutil.copyfile(Path(test_dir, 'resources', 'test.csv').as_posix(), source.as_posix())
+        report = gigaleaf.sync()
+        assert report.modified == ['test_csv.json']
+        assert get_linked_file_data('test_csv.json').read_text() == "Column1\naaa\n"
+
+        # Removing the window copies the whole file again
+        gigaleaf.link_csv('../output/test.csv')
+        gigaleaf.sync()
+        assert get_linked_file_data('test_csv.json').read_bytes() == source.read_bytes()
+        assert get_linked_file_metadata('test_csv.json')['data_variant'] is None
+
+    def test_csv_shards(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        source = Path(Gigantum.get_project_root(), 'output', 'test.csv')
+        source.write_text("name,value\n" + "".join([f"row{i},{i}\n" for i in range(5)]))
+
+        gigaleaf.link_csv('../output/test.csv', caption="Sharded", render='tabular', shard_rows=2)
+        gigaleaf.sync()
+
+        subfiles_dir = Path(gigaleaf.overleaf.overleaf_repo_directory, 'gigantum', 'subfiles')
+        shards = sorted(subfiles_dir.joinpath('test_csv').iterdir())
+        assert [s.name for s in shards] == ['test_csv_0001.tex', 'test_csv_0002.tex', 'test_csv_0003.tex']
+        text = subfiles_dir.joinpath('test_csv.tex').read_text()
+        assert "\\subfile{gigantum/subfiles/test_csv/test_csv_0002}" in text
+        assert "\\caption{Sharded}" in shards[0].read_text()
+        assert "\\caption" not in shards[1].read_text()
+        assert "name & value \\\\\n\\midrule\n\\endhead" in shards[1].read_text()
+        assert "row2 & 2" in shards[1].read_text()
+        assert call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory) == ''
+
+        # Only the shards whose rows changed are rewritten
+        for shard in shards:
+            os.utime(shard, ns=(0, 0))
+        source.write_text(source.read_text().replace('row4,4', 'row4,40'))
+        gigaleaf.sync()
+        assert [s.stat().st_mtime_ns == 0 for s in shards] == [True, True, False]
+        assert "row4 & 40" in shards[2].read_text()
+
+        # Shards left over from a longer table are removed, and all of them are removed when it is no longer sharded
+        gigaleaf.link_csv('../output/test.csv', caption="Sharded", render='tabular', shard_rows=3)
+        gigaleaf.sync()
+        assert sorted([s.name for s in subfiles_dir.joinpath('test_csv').iterdir()]) == ['test_csv_0001.tex',
+                                                                                          'test_csv_0002.tex']
+        gigaleaf.link_csv('../output/test.csv', caption="Sharded", render='tabular')
+        gigaleaf.sync()
+        assert subfiles_dir.joinpath('test_csv').exists() is False
+        assert "\\begin{tabular}" in subfiles_dir.joinpath('test_csv.tex').read_text()
+        assert call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory) == ''
+
+        with pytest.raises(ValueError):
+            gigaleaf.link_csv('../output/test.csv', shard_rows=2)
+        with pytest.raises(ValueError):
+            gigaleaf.link_csv('../output/test.csv', render='tabular', shard_rows=0)
+
+    def test_csv_tabular(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        gigaleaf.link_csv('../output/test.csv', caption="My Cool Table", render='tabular', column_format='lll')
+        gigaleaf.sync()
+
+        subfile = Path(gigaleaf.overleaf.overleaf_repo_directory, 'gigantum', 'subfiles', 'test_csv.tex')
+        text = subfile.read_text()
+        assert "\\csvautotabular" not in text
+        assert "\\begin{tabular}{lll}\n\\toprule\n" in text
+        assert "\\caption{My Cool Table}" in text
+
+        # The rendered table is cached, and re-used when only the caption changes
+        cache_directory = Path(gigaleaf.overleaf.overleaf_repo_directory).parent / 'render_cache' / 'test_csv'
+        cache_files = list(cache_directory.iterdir())
+        assert len(cache_files) == 1
+        cache_files[0].write_text("cached table")
+
+        gigaleaf.link_csv('../output/test.csv', caption="Another Caption", render='tabular', column_format='lll')
+        gigaleaf.sync()
+        assert "cached table" in subfile.read_text()
+
+        with pytest.raises(ValueError):
+            gigaleaf.link_csv('../output/test.csv', render='not-a-mode')
@@ -0,0 +1,85 @@
+import csv
+import pytest
+
+from gigaleaf.csvwindow import get_csv_window, load_csv_window, write_csv_window
+from gigaleaf.hashing import hash_file
+
+
+def make_csv(path, num_rows=1000):
+    """Helper to write a CSV file with a quoted, multi-line column"""
+    lines = ['id,text,double\n'] + [f'{i},"line\nbreak {i}",{i * 2}\n' for i in range(num_rows)]
+    path.write_text(''.join(lines))
+    return path
+
+
+def read_ids(path):
+    """Helper to read the header and the ids of the rows in a CSV file"""
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    return rows[0], [int(r[0]) for r in rows[1:]]
+
+
+class TestCsvWindow:
+    def test_head_and_tail(self, tmp_path):
+        src = make_csv(tmp_path / 'src.csv')
+        dst = tmp_path / 'dst.csv'
+
+        content_hash, data_hash = write_csv_window(src.as_posix(), dst.as_posix(), get_csv_window(head=3, tail=2),
+                                                   buffer_size=256)
+        assert content_hash == hash_file(src.as_posix())
+        assert data_hash == hash_file(dst.as_posix())
+        assert read_ids(dst) == (['id', 'text', 'double'], [0, 1, 2, 998, 999])
+
+    def test_sample(self, tmp_path):
+        src = make_csv(tmp_path / 'src.csv')
+        first = tmp_path / 'first.csv'
+        second = tmp_path / 'second.csv'
+
+        write_csv_window(src.as_posix(), first.as_posix(), get_csv_window(head=1, sample=10))
+        write_csv_window(src.as_posix(), second.as_posix(), get_csv_window(head=1, sample=10))
+
+        _, ids = read_ids(first)
+        assert len(ids) == 11
+        assert ids == sorted(ids)
+        assert ids[0] == 0
+        # The same rows are sampled every time
+        assert first.read_bytes() == second.read_bytes()
+
+    def test_sample_excludes_tail(self, tmp_path):
+        src = make_csv(tmp_path / 'src.csv', num_rows=10)
+        dst = tmp_path / 'dst.csv'
+
+        # Rows in the tail are not sampled too, so every requested row is copied
+        write_csv_window(src.as_posix(), dst.as_posix(), get_csv_window(tail=5, sample=5))
+        assert read_ids(dst)[1] == list(range(10))
+
+        write_csv_window(src.as_posix(), dst.as_posix(), get_csv_window(head=2, tail=2, sample=4))
+        _, ids = read_ids(dst)
+        assert len(ids) == 8
+        assert ids[:2] == [0, 1]
+        assert ids[-2:] == [8, 9]
+
+    def test_columns_and_max_bytes(self, tmp_path):
+        src = make_csv(tmp_path / 'src.csv')
+        dst = tmp_path / 'dst.csv'
+
+        write_csv_window(src.as_posix(), dst.as_posix(), get_csv_window(columns=['double', 'id'], max_bytes=50))
+        data = dst.read_text()
+        assert len(data.encode()) <= 50
+        assert data.startswith('double,id\n0,0\n2,1\n')
+
+        with pytest.raises(ValueError):
+            write_csv_window(src.as_posix(), dst.as_posix(), get_csv_window(columns=['missing']))
+
+    def test_options(self):
+        assert get_csv_window() is None
+        assert load_csv_window(None) is None
+        assert get_csv_window(head=5).key != get_csv_window(head=6).key
+        assert load_csv_window({'head': 5, 'columns': ['a']}) == get_csv_window(head=5, columns=['a'])
+
+        with pytest.raises(ValueError):
+            get_csv_window(head=-1)
+        with pytest.raises(ValueError):
+            get_csv_window(max_bytes=0)
+        with pytest.raises(ValueError):
+            get_csv_window(columns=[])
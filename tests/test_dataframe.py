@@ -1,23 +1,23 @@
 from pathlib import Path
 import json
 import shutil
+import pytest
 
 from gigaleaf import Gigaleaf
 from gigaleaf.gigantum import Gigantum
-from tests.fixtures import gigantum_project_fixture
+from gigaleaf.utils import call_subprocess
+from tests.fixtures import gigantum_project_fixture, get_linked_file_metadata
 
 
 class TestDataframeFile:
     def test_link_csv_file_and_sync(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is False
+        assert get_linked_file_metadata('table_pkl.json') is None
 
         gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={"index": False, "caption": "My table"})
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is True
+        assert get_linked_file_metadata('table_pkl.json') is not None
 
         gigaleaf.sync()
 
@@ -28,26 +28,22 @@ class TestDataframeFile:
         shutil.rmtree(gigaleaf.overleaf.overleaf_repo_directory)
         gigaleaf = None
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is False
+        assert get_linked_file_metadata('table_pkl.json') is None
         assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles',
                     'table_pkl.tex').is_file() is False
         gigaleaf = Gigaleaf()
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is True
+        assert get_linked_file_metadata('table_pkl.json') is not None
         assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles',
                     'table_pkl.tex').is_file() is True
 
     def test_unlink_csv(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is False
+        assert get_linked_file_metadata('table_pkl.json') is None
 
         gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={"index": False, "caption": "My table"})
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is True
+        assert get_linked_file_metadata('table_pkl.json') is not None
 
         gigaleaf.sync()
 
@@ -56,8 +52,7 @@ class TestDataframeFile:
 
         gigaleaf.unlink_dataframe('../output/table.pkl')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is False
+        assert get_linked_file_metadata('table_pkl.json') is None
         assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles',
                     'table_pkl.tex').is_file() is False
 
@@ -68,7 +63,103 @@ class TestDataframeFile:
         gigaleaf = None
 
         gigaleaf = Gigaleaf()
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'table_pkl.json').is_file() is False
+        assert get_linked_file_metadata('table_pkl.json') is None
         assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles',
                     'table_pkl.tex').is_file() is False
+
+    def test_columns_and_max_rows(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={"index": False}, columns=['y'], max_rows=2)
+        report = gigaleaf.sync()
+        assert report.peak_render_memory > 0
+
+        subfile = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles', 'table_pkl.tex')
+        table = subfile.read_text()
+        assert 'y' in table
+        assert '0.951057' in table
+        assert '0.587785' not in table
+        assert 'x' not in table.split('\\toprule')[1]
+
+    def test_pickle_with_other_suffix(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        # Dataframes pickled to a file with any other suffix are still read as pickles
+        shutil.copyfile('../output/table.pkl', '../output/table.p')
+
+        gigaleaf.link_dataframe('../output/table.p', to_latex_kwargs={"index": False})
+        report = gigaleaf.sync()
+        assert report.modified == ['table_p.json']
+
+        subfile = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles', 'table_p.tex')
+        assert '0.951057' in subfile.read_text()
+
+    def test_renderer(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        subfile = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles', 'table_pkl.tex')
+
+        # Tables are rendered with to_latex unless gigaleaf's renderer is picked
+        gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={"index": False, "float_format": "%.3f"})
+        gigaleaf.sync()
+        pandas_table = subfile.read_text()
+
+        gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={"index": False, "float_format": "%.3f"},
+                                renderer='gigaleaf')
+        report = gigaleaf.sync()
+        assert report.modified == ['table_pkl.json']
+        assert subfile.read_text() == pandas_table
+        assert '0.951' in pandas_table
+
+        with pytest.raises(ValueError):
+            gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={}, renderer='fast')
+
+    def test_shards(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={"index": False, "caption": "My table",
+                                                                        "label": "tab:table"},
+                                renderer='gigaleaf', shard_rows=2)
+        gigaleaf.link_csv('../output/test.csv', render='tabular', shard_rows=2)
+        report = gigaleaf.sync(workers=2)
+        assert report.modified == ['table_pkl.json', 'test_csv.json']
+
+        subfiles_dir = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles')
+        shards = sorted(subfiles_dir.joinpath('table_pkl').iterdir())
+        assert len(shards) > 1
+        assert "\\caption{My table}\\label{tab:table} \\\\" in shards[0].read_text()
+        assert all(["\\endhead" in s.read_text() for s in shards])
+        text = subfiles_dir.joinpath('table_pkl.tex').read_text()
+        assert "\\subfile{gigantum/subfiles/table_pkl/table_pkl_0001}" in text
+        assert call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory) == ''
+
+        gigaleaf.unlink_dataframe('../output/table.pkl')
+        assert subfiles_dir.joinpath('table_pkl').exists() is False
+        gigaleaf.sync()
+        assert call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory) == ''
+
+        with pytest.raises(ValueError):
+            gigaleaf.link_dataframe('../output/table.pkl', to_latex_kwargs={}, shard_rows=2)
+
+    def test_columnar_sources(self, gigantum_project_fixture):
+        pyarrow = pytest.importorskip('pyarrow')
+        import pyarrow.feather
+        import pandas
+
+        output_dir = Path(Gigantum.get_project_root(), 'output')
+        df = pandas.read_pickle(Path(output_dir, 'table.pkl'))
+        df.to_parquet(Path(output_dir, 'table.parquet'), row_group_size=2)
+        pyarrow.feather.write_feather(df, Path(output_dir, 'table.feather').as_posix(), chunksize=2)
+
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_dataframe('../output/table.parquet', to_latex_kwargs={"index": False}, columns=['y'],
+                                max_rows=3)
+        gigaleaf.link_dataframe('../output/table.feather', to_latex_kwargs={"index": False}, max_rows=1)
+        report = gigaleaf.sync()
+        assert sorted(report.modified) == ['table_feather.json', 'table_parquet.json']
+
+        subfiles_dir = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles')
+        table = subfiles_dir.joinpath('table_parquet.tex').read_text()
+        assert '0.587785' in table
+        assert '-0.587785' not in table
+        table = subfiles_dir.joinpath('table_feather.tex').read_text()
+        assert 'x & y' in table
+        assert '0.200000' not in table
@@ -1,11 +1,20 @@
 import pytest
 from pathlib import Path
+from concurrent.futures import CancelledError
+import asyncio
 import json
+import os
+import threading
+import time
 import shutil
 
 from gigaleaf import Gigaleaf
 from gigaleaf.gigantum import Gigantum
-from tests.fixtures import gigantum_project_fixture
+from gigaleaf.linkedfiles.csv import CsvFile
+from gigaleaf.overleaf import Overleaf
+from gigaleaf.utils import call_subprocess
+from gigaleaf.tracing import JsonTraceHook
+from tests.fixtures import gigantum_project_fixture, get_linked_file_metadata, get_linked_file_data
 
 
 class TestGigaleaf:
@@ -24,16 +33,12 @@ class TestGigaleaf:
     def test_link_image_with_defaults(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
 
         gigaleaf.link_image('../output/fig1.png')
 
-        metadata_file = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata', 'fig1_png.json')
-        assert metadata_file.is_file() is True
-
-        with open(metadata_file, 'rt') as mf:
-            data = json.load(mf)
+        data = get_linked_file_metadata('fig1_png.json')
+        assert data is not None
 
         assert data['gigantum_relative_path'] == 'output/fig1.png'
         assert data['gigantum_version'] != 'init'
@@ -48,54 +53,43 @@ class TestGigaleaf:
     def test_link_image_and_sync(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
 
         gigaleaf.link_image('../output/fig1.png', caption="My figure", label='fig111', alignment='right',
                             width='0.3\\textwidth')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is True
+        assert get_linked_file_metadata('fig1_png.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is True
+        data_file = get_linked_file_data('fig1_png.json')
+        assert data_file.is_file() is True
 
         # Delete everything in untracked, reinit, and should still see the files
         shutil.rmtree(gigaleaf.overleaf.overleaf_repo_directory)
         gigaleaf = None
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
+        assert data_file.is_file() is False
         gigaleaf = Gigaleaf()
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is True
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is True
+        assert get_linked_file_metadata('fig1_png.json') is not None
+        assert data_file.is_file() is True
 
     def test_update_image(self, gigantum_project_fixture):
 
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
 
         gigaleaf.link_image('../output/fig1.png', width='0.8\\textwidth')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is True
+        assert get_linked_file_metadata('fig1_png.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is True
+        assert get_linked_file_data('fig1_png.json').is_file() is True
 
-        metadata_file = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata', 'fig1_png.json')
-        with open(metadata_file, 'rt') as mf:
-            data = json.load(mf)
+        data = get_linked_file_metadata('fig1_png.json')
 
         first_hash = data['content_hash']
 
@@ -105,34 +99,408 @@ class TestGigaleaf:
 
         gigaleaf.sync()
 
-        metadata_file = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata', 'fig1_png.json')
-        with open(metadata_file, 'rt') as mf:
-            data = json.load(mf)
+        data = get_linked_file_metadata('fig1_png.json')
 
         assert first_hash != data['content_hash']
 
+    def test_optimize_images(self, gigantum_project_fixture):
+        config_file = Path(gigantum_project_fixture, '.gigantum', 'overleaf.json')
+        config = json.loads(config_file.read_text())
+        config['optimize_images'] = True
+        config_file.write_text(json.dumps(config))
+
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+        report = gigaleaf.sync()
+
+        source_file = Path(gigantum_project_fixture, 'output', 'fig1.png')
+        data_file = get_linked_file_data('fig1_png.json')
+        assert report.image_bytes_saved > 0
+        assert report.image_bytes_saved == source_file.stat().st_size - data_file.stat().st_size
+        assert data_file.read_bytes().startswith(b"\x89PNG")
+        assert get_linked_file_metadata('fig1_png.json')['data_variant'] is not None
+
+        # The image is only optimized once
+        report = gigaleaf.sync()
+        assert report.modified == []
+        assert 'optimize' not in report.timings
+
+        # Turning optimization off copies the original again, and removes the optimized copy
+        config['optimize_images'] = False
+        config_file.write_text(json.dumps(config))
+        gigaleaf = Gigaleaf()
+        report = gigaleaf.sync()
+        assert report.modified == ['fig1_png.json']
+        assert get_linked_file_data('fig1_png.json').read_bytes() == source_file.read_bytes()
+        assert get_linked_file_metadata('fig1_png.json')['data_variant'] is None
+        assert data_file.is_file() is False
+
+    def test_optimize_invalid_image(self, gigantum_project_fixture):
+        config_file = Path(gigantum_project_fixture, '.gigantum', 'overleaf.json')
+        config = json.loads(config_file.read_text())
+        config['optimize_images'] = True
+        config_file.write_text(json.dumps(config))
+
+        # A file that isn't a PNG despite its name is copied as it is
+        source_file = Path(gigantum_project_fixture, 'output', 'fig2.png')
+        source_file.write_bytes(b"GIF89a" + bytes(range(256)))
+
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig2.png')
+        report = gigaleaf.sync()
+        assert report.modified == ['fig2_png.json']
+        assert report.image_bytes_saved == 0
+        assert get_linked_file_data('fig2_png.json').read_bytes() == source_file.read_bytes()
+
+    def test_identical_files_are_stored_once(self, gigantum_project_fixture):
+        shutil.copyfile(Path(gigantum_project_fixture, 'output', 'fig1.png'),
+                        Path(gigantum_project_fixture, 'output', 'figure2.png'))
+
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+        gigaleaf.link_image('../output/figure2.png')
+        gigaleaf.sync()
+
+        data_file = get_linked_file_data('fig1_png.json')
+        assert data_file == get_linked_file_data('figure2_png.json')
+        assert data_file.is_file() is True
+        assert data_file.name.endswith('.png')
+
+        subfile = Path(gigaleaf.overleaf.overleaf_repo_directory, 'gigantum', 'subfiles', 'figure2_png.tex')
+        assert f"{{{data_file.parent.parent.name}/{data_file.parent.name}/{data_file.stem}}}" in subfile.read_text()
+
+        # The data is kept while any linked file uses it
+        gigaleaf.unlink_image('../output/figure2.png')
+        assert data_file.is_file() is True
+        gigaleaf.unlink_image('../output/fig1.png')
+        assert data_file.is_file() is False
+        gigaleaf.sync()
+
+        git_status = call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory)
+        assert git_status.strip() == ""
+
+    def test_link_many(self, gigantum_project_fixture, monkeypatch):
+        sweep_dir = Path(gigantum_project_fixture, 'output', 'sweep')
+        sweep_dir.mkdir()
+        for i in range(5):
+            shutil.copyfile(Path(gigantum_project_fixture, 'output', 'fig1.png'), Path(sweep_dir, f"sweep{i}.png"))
+            # Files modified in the last few seconds are not cached
+            os.utime(Path(sweep_dir, f"sweep{i}.png"), (time.time() - 60, time.time() - 60))
+
+        revisions = list()
+        get_current_revision = Gigantum.get_current_revision
+
+        def count_revisions():
+            revisions.append(get_current_revision())
+            return revisions[-1]
+
+        gigaleaf = Gigaleaf()
+        monkeypatch.setattr(Gigantum, 'get_current_revision', count_revisions)
+
+        # Nothing is linked if any path is invalid
+        with pytest.raises(ValueError):
+            gigaleaf.link_many(['../output/sweep/sweep0.png', '../output/sweep/missing.png', '../output/test.txt'])
+        assert get_linked_file_metadata('sweep0_png.json') is None
+        with pytest.raises(ValueError):
+            gigaleaf.link_many('../output/sweep/*.png', label='fig:sweep')
+
+        metadata_filenames = gigaleaf.link_many('../output/sweep/*.png', hash_files=True, caption="Sweep")
+        assert metadata_filenames == [f"sweep{i}_png.json" for i in range(5)]
+        assert len(revisions) == 1
+        assert get_linked_file_metadata('sweep3_png.json')['caption'] == "Sweep"
+        assert get_linked_file_metadata('sweep3_png.json')['label'] == "fig:sweep3"
+
+        cache = json.loads(Path(Gigantum.get_overleaf_root_directory(), 'change_cache.json').read_text())
+        assert Path(sweep_dir, 'sweep3.png').as_posix() in cache['entries']
+
+        report = gigaleaf.sync()
+        assert report.modified == metadata_filenames
+
+    def test_link_many_mixed_types(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        # Settings are checked against each file type before anything is linked: a dataframe needs to_latex_kwargs,
+        # and only images have a width
+        with pytest.raises(ValueError, match='table.pkl'):
+            gigaleaf.link_many('../output/*')
+        with pytest.raises(ValueError, match='test.csv'):
+            gigaleaf.link_many('../output/*', to_latex_kwargs={}, width="0.3\\textwidth")
+        assert get_linked_file_metadata('fig1_png.json') is None
+        assert get_linked_file_metadata('test_csv.json') is None
+
+        metadata_filenames = gigaleaf.link_many(['../output/fig1.png', '../output/test.csv'], caption="Results")
+        assert metadata_filenames == ['fig1_png.json', 'test_csv.json']
+        assert get_linked_file_metadata('test_csv.json')['caption'] == "Results"
+
+    def test_batch(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        # Links are only saved if the batch finishes
+        with pytest.raises(RuntimeError):
+            with gigaleaf.batch():
+                gigaleaf.link_image('../output/fig1.png')
+                raise RuntimeError("Failed")
+        assert get_linked_file_metadata('fig1_png.json') is None
+
+        with gigaleaf.batch():
+            gigaleaf.link_image('../output/fig1.png')
+            gigaleaf.link_csv('../output/test.csv')
+            assert get_linked_file_metadata('fig1_png.json') is None
+
+            with pytest.raises(ValueError):
+                gigaleaf.sync()
+            with pytest.raises(ValueError):
+                gigaleaf.unlink_image('../output/fig1.png')
+
+        assert get_linked_file_metadata('fig1_png.json') is not None
+        assert get_linked_file_metadata('test_csv.json') is not None
+        report = gigaleaf.sync()
+        assert report.modified == ['fig1_png.json', 'test_csv.json']
+
+    def test_sync_report(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        gigaleaf.link_image('../output/fig1.png')
+        gigaleaf.link_csv('../output/test.csv')
+
+        report = gigaleaf.sync(workers=1)
+
+        assert len(report.results) == 2
+        assert [r.metadata_filename for r in report.results] == ['fig1_png.json', 'test_csv.json']
+        assert [r.classname for r in report.results] == ['ImageFile', 'CsvFile']
+        assert len(report.modified) == 2
+        assert report.errors == {}
+
+        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles',
+                    'fig1_png.tex').is_file() is True
+        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'subfiles',
+                    'test_csv.tex').is_file() is True
+
+    def test_noop_sync(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        gigaleaf.link_image('../output/fig1.png', caption="My figure")
+        report = gigaleaf.sync()
+        assert len(report.modified) == 1
+        assert report.committed is True
+
+        manifest_file = Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'manifest.jsonl')
+        first_manifest = manifest_file.read_text()
+        first_metadata = get_linked_file_metadata('fig1_png.json')
+
+        # Nothing changed, so nothing should be updated
+        report = gigaleaf.sync()
+        assert report.modified == []
+        assert report.committed is False
+        assert report.pull_skipped is True
+        assert report.pull_time_saved >= 0
+        assert manifest_file.read_text() == first_manifest
+
+        # Changing a setting updates the link without changing the content hash
+        gigaleaf.link_image('../output/fig1.png', caption="My new caption")
+        report = gigaleaf.sync()
+        assert len(report.modified) == 1
+
+        data = get_linked_file_metadata('fig1_png.json')
+        assert data['content_hash'] == first_metadata['content_hash']
+        assert data['settings_hash'] != first_metadata['settings_hash']
+
+    def test_failed_push_is_retried(self, gigantum_project_fixture, monkeypatch):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+
+        push = Overleaf.push
+
+        def failing_push(self):
+            raise ValueError("Failed to push")
+
+        monkeypatch.setattr(Overleaf, 'push', failing_push)
+        with pytest.raises(ValueError):
+            gigaleaf.sync()
+        assert gigaleaf.overleaf.get_remote_head() != gigaleaf.overleaf.git.get_head()
+
+        # Nothing changed since, but the commit left behind is still pushed
+        monkeypatch.setattr(Overleaf, 'push', push)
+        report = gigaleaf.sync()
+        assert report.committed is False
+        assert report.pull_skipped is True
+        assert gigaleaf.overleaf.get_remote_head() == gigaleaf.overleaf.git.get_head()
+
+        # Once pushed, there is nothing left to push
+        report = gigaleaf.sync()
+        assert 'push' not in report.timings
+
+    def test_sync_timings(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        trace_file = Path(gigantum_project_fixture, 'output', 'untracked', 'trace.jsonl')
+        gigaleaf.add_trace_hook(JsonTraceHook(trace_file.as_posix()))
+
+        gigaleaf.link_image('../output/fig1.png')
+        gigaleaf.link_csv('../output/test.csv')
+        report = gigaleaf.sync()
+
+        # New files are hashed when they are copied
+        for phase in ['sync', 'pull', 'load', 'update', 'copy', 'render', 'save', 'commit', 'push', 'subprocess']:
+            assert phase in report.timings
+        assert report.bytes_read == report.bytes_written - sum([Path(gigaleaf.overleaf.overleaf_repo_directory,
+                                                                     'gigantum', 'subfiles', f).stat().st_size
+                                                                for f in ['fig1_png.tex', 'test_csv.tex']])
+        assert sorted([s.attributes['file'] for s in report.spans if s.name == 'update']) == ['fig1_png.json',
+                                                                                            'test_csv.json']
+        assert sum([v for k, v in report.counters.items() if k.startswith('copy_')]) == 2
+
+        # A file that was touched but not changed is only hashed
+        first_counters = report.counters
+        os.utime(Path(gigantum_project_fixture, 'output', 'test.csv'), (1, 1))
+        report = gigaleaf.sync()
+        assert 'hash' in report.timings
+        assert 'commit' not in report.timings
+        assert report.bytes_read >= Path(gigantum_project_fixture, 'output', 'test.csv').stat().st_size
+        assert report.bytes_written == 0
+
+        traces = [json.loads(line) for line in trace_file.read_text().splitlines()]
+        assert len(traces) == 2
+        assert traces[0]['counters'] == first_counters
+
+    def test_sync_in_background(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+
+        handle = gigaleaf.sync(block=False)
+        # A second sync that starts while the first is running or waiting is shared by any further calls
+        second_handle = gigaleaf.sync(block=False)
+        assert gigaleaf.sync(block=False) is second_handle
+
+        report = handle.result()
+        assert handle.status == 'done'
+        assert report.modified == ['fig1_png.json']
+
+        second_handle.result()
+        assert second_handle.done() is True
+
+        # A handle that already finished can't be cancelled
+        assert handle.cancel() is False
+
+    def test_link_during_background_sync(self, gigantum_project_fixture, monkeypatch):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_csv('../output/test.csv')
+
+        # Hold the sync in the middle of rendering the CSV subfile
+        rendering = threading.Event()
+        release = threading.Event()
+        write_subfile = CsvFile.write_subfile
+
+        def slow_write_subfile(self):
+            rendering.set()
+            release.wait(timeout=30)
+            write_subfile(self)
+
+        monkeypatch.setattr(CsvFile, 'write_subfile', slow_write_subfile)
+        handle = gigaleaf.sync(block=False)
+        assert rendering.wait(timeout=30) is True
+
+        gigaleaf.link_image('../output/fig1.png')
+        assert get_linked_file_metadata('fig1_png.json') is not None
+
+        release.set()
+        report = handle.result()
+        assert report.modified == ['test_csv.json']
+
+        # The link made while the sync ran is kept, and updated by the next sync
+        assert get_linked_file_metadata('fig1_png.json') is not None
+        assert get_linked_file_metadata('test_csv.json')['content_hash'] != "init"
+        report = gigaleaf.sync()
+        assert report.modified == ['fig1_png.json']
+
+    def test_cancel_pending_sync(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+
+        first_handle = gigaleaf.sync(block=False)
+        second_handle = gigaleaf.sync(block=False)
+        assert second_handle.cancel() is True
+        with pytest.raises(CancelledError):
+            second_handle.result()
+        assert second_handle.status == 'cancelled'
+
+        # Cancelling does not stop the next sync from committing the changes
+        if first_handle is not second_handle:
+            first_handle.result()
+        report = gigaleaf.sync()
+        assert report.errors == {}
+        assert get_linked_file_metadata('fig1_png.json')['content_hash'] != "init"
+
+    def test_sync_async(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_image('../output/fig1.png')
+
+        report = asyncio.run(gigaleaf.sync_async())
+        assert report.modified == ['fig1_png.json']
+
+    def test_watch(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+        gigaleaf.link_csv('../output/test.csv')
+        gigaleaf.link_image('../output/fig1.png')
+        gigaleaf.sync()
+
+        reports = list()
+        stop_event = threading.Event()
+        watch_thread = threading.Thread(target=gigaleaf.watch,
+                                        kwargs={"debounce": 0.5, "poll_interval": 0.1, "stop_event": stop_event,
+                                                "callback": reports.append})
+        watch_thread.start()
+        time.sleep(0.5)
+
+        # A burst of writes is synced once, and only the changed file is updated
+        for idx in range(3):
+            with open(Path(gigantum_project_fixture, 'output', 'test.csv'), 'at') as tf:
+                tf.write(f"{idx},{idx},{idx}\n")
+            time.sleep(0.1)
+
+        for _ in range(100):
+            if reports:
+                break
+            time.sleep(0.1)
+        stop_event.set()
+        watch_thread.join()
+
+        assert len(reports) == 1
+        assert [r.metadata_filename for r in reports[0].results] == ['test_csv.json']
+        assert reports[0].modified == ['test_csv.json']
+        assert reports[0].committed is True
+
+    def test_sync_only_commits_linked_files(self, gigantum_project_fixture):
+        gigaleaf = Gigaleaf()
+
+        # An uncommitted change made by the user in the Overleaf Project should be left alone
+        user_file = Path(gigaleaf.overleaf.overleaf_repo_directory, 'notes.tex')
+        user_file.write_text("My notes")
+
+        gigaleaf.link_image('../output/fig1.png')
+        report = gigaleaf.sync()
+        assert report.committed is True
+
+        git_status = call_subprocess(['git', 'status', '--porcelain'], gigaleaf.overleaf.overleaf_repo_directory)
+        assert git_status.strip() == "?? notes.tex"
+
     def test_unlink_image(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
 
         gigaleaf.link_image('../output/fig1.png')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is True
+        assert get_linked_file_metadata('fig1_png.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is True
+        data_file = get_linked_file_data('fig1_png.json')
+        assert data_file.is_file() is True
 
         gigaleaf.unlink_image('../output/fig1.png')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
+        assert data_file.is_file() is False
 
         gigaleaf.sync()
 
@@ -141,26 +509,21 @@ class TestGigaleaf:
         gigaleaf = None
 
         gigaleaf = Gigaleaf()
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
+        assert data_file.is_file() is False
 
     def test_delete_project_link(self, gigantum_project_fixture):
         gigaleaf = Gigaleaf()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is False
+        assert get_linked_file_metadata('fig1_png.json') is None
 
         gigaleaf.link_image('../output/fig1.png')
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'metadata',
-                    'fig1_png.json').is_file() is True
+        assert get_linked_file_metadata('fig1_png.json') is not None
 
         gigaleaf.sync()
 
-        assert Path(Gigantum.get_overleaf_root_directory(), 'project', 'gigantum', 'data',
-                    'fig1.png').is_file() is True
+        assert get_linked_file_data('fig1_png.json').is_file() is True
 
         gigaleaf.delete()
 
@@ -0,0 +1,22 @@
+import os
+
+from gigaleaf.gigantum import Gigantum, DEFAULT_PROJECT_ROOT, PROJECT_ROOT_ENV_VAR
+
+
+class TestGigantum:
+    def test_project_root(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(PROJECT_ROOT_ENV_VAR, raising=False)
+        assert Gigantum.get_project_root() == DEFAULT_PROJECT_ROOT
+
+        monkeypatch.setenv(PROJECT_ROOT_ENV_VAR, tmp_path.as_posix())
+        assert Gigantum.get_project_root() == tmp_path.as_posix()
+        assert Gigantum.get_overleaf_root_directory() == os.path.join(tmp_path, 'output/untracked/overleaf')
+
+        # An explicitly set root takes precedence over the environment variable
+        other_root = tmp_path / 'other'
+        try:
+            Gigantum.set_project_root(other_root.as_posix())
+            assert Gigantum.get_project_root() == other_root.as_posix()
+        finally:
+            Gigantum.set_project_root(None)
+        assert Gigantum.get_project_root() == tmp_path.as_posix()
@@ -0,0 +1,39 @@
+import os
+import hashlib
+import pytest
+
+from gigaleaf.hashing import hash_file, copy_and_hash_file, get_hash_algorithms, resolve_hash_algorithm, \
+    DEFAULT_ALGORITHM
+
+
+class TestHashing:
+    def test_hash_file(self, tmp_path):
+        data_file = tmp_path / 'data.bin'
+        data_file.write_bytes(os.urandom(100000))
+
+        assert hash_file(data_file.as_posix(), 'md5', buffer_size=4096) == \
+            hashlib.md5(data_file.read_bytes()).hexdigest()
+        assert hash_file(data_file.as_posix(), 'blake2b') == \
+            hashlib.blake2b(data_file.read_bytes(), digest_size=32).hexdigest()
+
+        for algorithm in get_hash_algorithms():
+            assert hash_file(data_file.as_posix(), algorithm, buffer_size=1000) == \
+                hash_file(data_file.as_posix(), algorithm)
+
+    def test_copy_and_hash_file(self, tmp_path):
+        src = tmp_path / 'src.bin'
+        src.write_bytes(os.urandom(200000))
+        dst = tmp_path / 'dst.bin'
+
+        assert copy_and_hash_file(src.as_posix(), dst.as_posix(), buffer_size=4096) == hash_file(src.as_posix())
+        assert dst.read_bytes() == src.read_bytes()
+
+    def test_unsupported_algorithm(self, tmp_path):
+        data_file = tmp_path / 'data.bin'
+        data_file.write_bytes(b'data')
+
+        with pytest.raises(ValueError):
+            hash_file(data_file.as_posix(), 'not-an-algorithm')
+
+        assert resolve_hash_algorithm('not-an-algorithm') == DEFAULT_ALGORITHM
+        assert resolve_hash_algorithm('md5') == 'md5'
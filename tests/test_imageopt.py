@@ -0,0 +1,67 @@
+import zlib
+import pytest
+
+from gigaleaf.imageopt import ImageOptions, get_image_options, read_png_chunks, write_png_chunks, recompress_png, \
+    downsample_png, optimize_image
+
+
+def make_png(width=64, height=64, text=b"Software\x00matplotlib"):
+    """Helper to build a poorly compressed RGB PNG with a text chunk"""
+    rows = [b"\x00" + bytes([(x * y) % 256 for x in range(width * 3)]) for y in range(height)]
+    header = width.to_bytes(4, 'big') + height.to_bytes(4, 'big') + bytes([8, 2, 0, 0, 0])
+    return write_png_chunks([(b"IHDR", header), (b"tEXt", text),
+                             (b"IDAT", zlib.compress(b"".join(rows), 1)), (b"IEND", b"")])
+
+
+def get_pixels(data):
+    return zlib.decompress(b"".join([d for t, d in read_png_chunks(data) if t == b"IDAT"]))
+
+
+class TestImageOptimization:
+    def test_recompress_png(self):
+        original = make_png()
+        optimized = recompress_png(original)
+
+        assert len(optimized) < len(original)
+        assert get_pixels(optimized) == get_pixels(original)
+        assert [t for t, _ in read_png_chunks(optimized)] == [b"IHDR", b"IDAT", b"IEND"]
+
+        # Metadata can be kept
+        assert b"tEXt" in [t for t, _ in read_png_chunks(recompress_png(original, strip_metadata=False))]
+
+        # Already optimized files are returned as they are
+        assert recompress_png(optimized) == optimized
+
+    def test_invalid_png(self):
+        with pytest.raises(ValueError):
+            recompress_png(b"GIF89a")
+        with pytest.raises(ValueError):
+            recompress_png(make_png()[:100])
+
+        header = (64).to_bytes(4, 'big') * 2 + bytes([8, 2, 0, 0, 0])
+        with pytest.raises(ValueError):
+            recompress_png(write_png_chunks([(b"IHDR", header), (b"IEND", b"")]))
+        with pytest.raises(ValueError):
+            recompress_png(write_png_chunks([(b"IHDR", header), (b"IDAT", b"not zlib"), (b"IEND", b"")]))
+
+    def test_image_options(self):
+        assert ImageOptions().key is None
+        assert ImageOptions(optimize=True).key != ImageOptions(optimize=True, max_dpi=150).key
+        assert optimize_image(make_png(), ImageOptions()) == make_png()
+
+        with pytest.raises(ValueError):
+            get_image_options(max_dpi=0)
+
+    def test_downsample_png(self):
+        image_module = pytest.importorskip('PIL.Image')
+        import io
+
+        output = io.BytesIO()
+        image_module.new('RGB', (600, 300), (10, 20, 30)).save(output, format='PNG', dpi=(300, 300))
+        downsampled = downsample_png(output.getvalue(), 150)
+        with image_module.open(io.BytesIO(downsampled)) as img:
+            assert img.size == (300, 150)
+            assert round(img.info['dpi'][0]) == 150
+
+        # Images at or below the maximum resolution are not changed
+        assert downsample_png(downsampled, 150) == downsampled
@@ -0,0 +1,110 @@
+import pytest
+
+from gigaleaf.latex import escape_latex, render_tabular, get_render_key, render_dataframe, can_render_dataframe, \
+    render_longtable_shards, TableLines
+
+
+class TestLatex:
+    def test_escape_latex(self):
+        assert escape_latex("a_b & 50% of $10 #1") == r"a\_b \& 50\% of \$10 \#1"
+        assert escape_latex("{x}~^\\") == r"\{x\}\textasciitilde{}\textasciicircum{}\textbackslash{}"
+        assert escape_latex("two\nlines") == "two lines"
+
+    def test_render_tabular(self):
+        rows = [['name', 'count', 'p_value'],
+                ['a_1', '10', '0.012345'],
+                ['b', '2000', 'n/a'],
+                ['c', '3']]
+        table = render_tabular(rows, formats={'count': ',d', 'p_value': '.3f'})
+
+        assert table.splitlines() == [r"\begin{tabular}{lrl}",
+                                      r"\toprule",
+                                      r"name & count & p\_value \\",
+                                      r"\midrule",
+                                      r"a\_1 & 10 & 0.012 \\",
+                                      r"b & 2,000 & n/a \\",
+                                      r"c & 3 &  \\",
+                                      r"\bottomrule",
+                                      r"\end{tabular}"]
+
+        table = render_tabular(rows, column_format='lcc', escape=False)
+        assert table.startswith(r"\begin{tabular}{lcc}")
+        assert r"a_1 & 10 & 0.012345 \\" in table
+
+    def test_render_key(self):
+        assert get_render_key(None, None, True) == get_render_key(None, None, True)
+        assert get_render_key(None, None, True) != get_render_key('lr', None, True)
+        assert get_render_key(None, {'a': '.2f'}, True) != get_render_key(None, None, True)
+
+    def test_render_dataframe(self):
+        pandas = pytest.importorskip('pandas')
+        df = pandas.DataFrame({'a': [1, 2, 3],
+                               'b': [0.5, float('nan'), 2.25],
+                               'c': ['x&y', None, 'z_1^2'],
+                               'd': [True, False, True],
+                               'e': pandas.array([1, None, 3], dtype='Int64')},
+                              index=pandas.Index(['r1', 'r2', 'r3'], name='idx'))
+
+        for kwargs in [{},
+                       {'index': False},
+                       {'float_format': '%.2f', 'na_rep': '--'},
+                       {'columns': ['c', 'a'], 'escape': True},
+                       {'header': False},
+                       {'header': ['A', 'B', 'C', 'D', 'E'], 'column_format': 'lrrlrr'},
+                       {'caption': 'My table', 'label': 'tab:my-table'}]:
+            assert can_render_dataframe(df, kwargs) is True
+            assert render_dataframe(df, **kwargs) == df.to_latex(**kwargs)
+
+        assert can_render_dataframe(df, {'longtable': True}) is False
+        assert can_render_dataframe(df.set_index('a', append=True), {}) is False
+
+    def test_render_dataframe_mixed_values(self):
+        pandas = pytest.importorskip('pandas')
+        # Numbers in object columns are formatted as floats, and float_format is not applied to the index
+        df = pandas.DataFrame({'a': pandas.Series([2.5, 'x_y', 3, None, True], dtype=object),
+                               'b': [0.125, 1.0, 2.5, 3.75, 5.0]},
+                              index=[0.5, 1.123456789, 2.0, 3.0, 4.0])
+
+        for kwargs in [{}, {'float_format': '%.2f'}, {'float_format': lambda v: f"{v:.1f}", 'escape': True}]:
+            assert can_render_dataframe(df, kwargs) is True
+            assert render_dataframe(df, **kwargs) == df.to_latex(**kwargs)
+
+    def test_render_dataframe_floats(self):
+        pandas = pytest.importorskip('pandas')
+        numpy = pytest.importorskip('numpy')
+        # Floats are formatted for the whole column at once, which must round exactly like `%`, including at ties
+        rng = numpy.random.default_rng(0)
+        values = numpy.concatenate([rng.normal(size=1000) * 10.0 ** rng.integers(-8, 12, 1000),
+                                    rng.integers(-1000, 1000, 1000) / 8,
+                                    [0.0, -0.0, -0.001, 0.125, 2.5, 1.005, 9.995, 2.0 ** 53, 1e300, -1e20,
+                                     float('inf'), float('-inf'), float('nan')]])
+        df = pandas.DataFrame({'a': values, 'b': numpy.clip(values[::-1], -1e30, 1e30).astype(numpy.float32)})
+
+        for kwargs in [{}, {'float_format': '%.2f'}, {'float_format': '%.0f'}, {'float_format': '%.3e'}]:
+            assert render_dataframe(df, **kwargs) == df.to_latex(**kwargs)
+
+    def test_render_longtable_shards(self):
+        table = TableLines('lr', [r"a & b \\"], [f"{i} & {i * 2} \\\\" for i in range(5)])
+        shards = render_longtable_shards(table, 2, caption="My table", label="tab:my-table")
+
+        assert len(shards) == 3
+        assert shards[0].splitlines()[:7] == [r"\begin{longtable}{lr}",
+                                              r"\caption{My table}\label{tab:my-table} \\",
+                                              r"\toprule",
+                                              r"a & b \\",
+                                              r"\midrule",
+                                              r"\endfirsthead",
+                                              r"\toprule"]
+        assert shards[2].splitlines() == [r"\begin{longtable}{lr}",
+                                          r"\toprule",
+                                          r"a & b \\",
+                                          r"\midrule",
+                                          r"\endhead",
+                                          r"\bottomrule",
+                                          r"\endfoot",
+                                          r"4 & 8 \\",
+                                          r"\end{longtable}"]
+
+        assert len(render_longtable_shards(TableLines('l', [], []), 10)) == 1
+        with pytest.raises(ValueError):
+            render_longtable_shards(table, 0)
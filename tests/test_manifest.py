@@ -0,0 +1,66 @@
+import json
+
+from gigaleaf.manifest import Manifest
+
+
+class TestManifest:
+    def test_save_and_load(self, tmp_path):
+        manifest = Manifest(tmp_path.as_posix())
+        assert len(manifest) == 0
+
+        manifest.update('b_png.json', classname='ImageFile', caption=None)
+        manifest.update('a_csv.json', classname='CsvFile', caption="My table")
+        manifest.update('b_png.json', caption="My figure")
+        manifest.save()
+
+        manifest_file = tmp_path / 'gigantum' / 'manifest.jsonl'
+        lines = manifest_file.read_text().splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])['metadata_filename'] == 'a_csv.json'
+
+        manifest = Manifest(tmp_path.as_posix())
+        assert 'b_png.json' in manifest
+        assert manifest.get('b_png.json') == {'classname': 'ImageFile', 'caption': "My figure"}
+        assert [name for name, _ in manifest] == ['a_csv.json', 'b_png.json']
+        assert [name for name, _ in Manifest.iter_file(manifest_file.as_posix())] == ['a_csv.json', 'b_png.json']
+
+        manifest.remove('a_csv.json')
+        manifest.save()
+        assert Manifest(tmp_path.as_posix()).get('a_csv.json') is None
+
+    def test_save_merges_changes(self, tmp_path):
+        manifest = Manifest(tmp_path.as_posix())
+        manifest.update('a_csv.json', classname='CsvFile', content_hash='init')
+        manifest.update('b_png.json', classname='ImageFile', content_hash='init')
+        manifest.save()
+
+        # Two instances loaded at the same time, e.g. a sync and a link made while it runs
+        first = Manifest(tmp_path.as_posix())
+        second = Manifest(tmp_path.as_posix())
+        first.update('a_csv.json', content_hash='abc')
+        second.update('a_csv.json', caption="My table")
+        second.update('c_png.json', classname='ImageFile', content_hash='init')
+        second.remove('b_png.json')
+        second.save()
+        first.update('b_png.json', content_hash='def')
+        first.save()
+
+        manifest = Manifest(tmp_path.as_posix())
+        assert manifest.get('a_csv.json') == {'classname': 'CsvFile', 'content_hash': 'abc', 'caption': "My table"}
+        # An update does not add back an entry that was removed in the meantime
+        assert manifest.get('b_png.json') is None
+        assert manifest.get('c_png.json') == {'classname': 'ImageFile', 'content_hash': 'init'}
+
+    def test_migrate_legacy_metadata(self, tmp_path):
+        metadata_dir = tmp_path / 'gigantum' / 'metadata'
+        metadata_dir.mkdir(parents=True)
+        (metadata_dir / 'fig1_png.json').write_text(json.dumps({'classname': 'ImageFile', 'content_hash': 'abc'}))
+
+        manifest = Manifest(tmp_path.as_posix())
+        assert manifest.get('fig1_png.json') == {'classname': 'ImageFile', 'content_hash': 'abc'}
+
+        # Legacy files are only removed once the manifest has been written
+        assert (metadata_dir / 'fig1_png.json').is_file() is True
+        manifest.save()
+        assert metadata_dir.is_dir() is False
+        assert Manifest(tmp_path.as_posix()).get('fig1_png.json') == {'classname': 'ImageFile', 'content_hash': 'abc'}
@@ -1,12 +1,120 @@
+import pytest
 import os
+import json
 
-from gigaleaf.overleaf import Overleaf
+from gigaleaf.overleaf import Overleaf, normalize_git_url, is_local_git_url
+from gigaleaf.utils import call_subprocess
 from tests.fixtures import gigantum_project_fixture
 
 
 class TestOverleaf:
+    def test_normalize_git_url(self, tmp_path):
+        overleaf_url = 'https://git.overleaf.com/abcdef0123456789abcdef01'
+        assert normalize_git_url(overleaf_url) == overleaf_url
+        assert normalize_git_url(f'git clone {overleaf_url}') == overleaf_url
+        assert normalize_git_url('git@example.com:paper.git') == 'git@example.com:paper.git'
+        assert normalize_git_url(f'file://{tmp_path}') == f'file://{tmp_path}'
+        assert normalize_git_url(f' {tmp_path} ') == tmp_path.as_posix()
+
+        with pytest.raises(ValueError):
+            normalize_git_url((tmp_path / 'missing.git').as_posix())
+        with pytest.raises(ValueError):
+            normalize_git_url('')
+
+        assert is_local_git_url(f'file://{tmp_path}') is True
+        assert is_local_git_url(tmp_path.as_posix()) is True
+        assert is_local_git_url('./mirror:v2') is True
+        assert is_local_git_url(overleaf_url) is False
+        assert is_local_git_url('git@example.com:paper.git') is False
+
+    def test_local_remote_without_credentials(self, gigantum_project_fixture):
+        # A local mirror of the Overleaf Project, which needs no credentials
+        mirror = os.path.join(os.path.dirname(gigantum_project_fixture), 'mirror.git')
+        call_subprocess(['git', 'init', '--bare', mirror], gigantum_project_fixture)
+        seed = os.path.join(os.path.dirname(gigantum_project_fixture), 'mirror-seed')
+        call_subprocess(['git', 'clone', mirror, seed], gigantum_project_fixture)
+        with open(os.path.join(seed, 'main.tex'), 'wt') as f:
+            f.write('\\documentclass{article}\n')
+        call_subprocess(['git', 'add', 'main.tex'], seed)
+        call_subprocess(['git', 'commit', '-m', 'init'], seed)
+        call_subprocess(['git', 'push', 'origin', 'HEAD'], seed)
+
+        config_file = os.path.join(gigantum_project_fixture, '.gigantum', 'overleaf.json')
+        with open(config_file, 'rt') as cf:
+            config = json.load(cf)
+        config['overleaf_git_url'] = f'file://{mirror}'
+        with open(config_file, 'wt') as cf:
+            json.dump(config, cf)
+        os.remove(os.path.join(gigantum_project_fixture, 'output', 'untracked', 'overleaf', 'credentials.json'))
+
+        overleaf = Overleaf()
+        assert os.path.isfile(os.path.join(overleaf.overleaf_repo_directory, 'main.tex'))
+        overleaf.pull()
+        assert overleaf.get_remote_head() == overleaf.git.get_head()
+
     def test_load_and_clone(self, gigantum_project_fixture):
         overleaf = Overleaf()
 
         assert os.path.isdir(overleaf.overleaf_repo_directory)
         assert os.path.isfile(os.path.join(overleaf.overleaf_repo_directory, 'main.tex'))
+
+    def test_pull_if_changed(self, gigantum_project_fixture):
+        overleaf = Overleaf()
+
+        # Nothing has been recorded about the remote yet, so it must pull
+        skipped, _ = overleaf.pull_if_changed()
+        assert skipped is False
+
+        # The remote has not moved since the last pull
+        skipped, time_saved = overleaf.pull_if_changed()
+        assert skipped is True
+        assert time_saved >= 0
+
+        # A different remote head means there is something to pull
+        overleaf._save_remote_state(remote_head="0" * 40)
+        skipped, _ = overleaf.pull_if_changed()
+        assert skipped is False
+
+    def test_sparse_shallow_clone(self, gigantum_project_fixture):
+        config_file = os.path.join(gigantum_project_fixture, '.gigantum', 'overleaf.json')
+        with open(config_file, 'rt') as cf:
+            config = json.load(cf)
+        config['clone_mode'] = 'shallow'
+        config['sparse_checkout'] = True
+        with open(config_file, 'wt') as cf:
+            json.dump(config, cf)
+
+        overleaf = Overleaf()
+
+        assert overleaf.config.clone_mode == 'shallow'
+        assert os.path.isfile(os.path.join(overleaf.overleaf_repo_directory, 'main.tex'))
+        sparse_dirs = call_subprocess(['git', 'sparse-checkout', 'list'], overleaf.overleaf_repo_directory)
+        assert sparse_dirs.split() == ['gigantum']
+
+    def test_invalid_clone_mode(self, gigantum_project_fixture):
+        config_file = os.path.join(gigantum_project_fixture, '.gigantum', 'overleaf.json')
+        with open(config_file, 'rt') as cf:
+            config = json.load(cf)
+        config['clone_mode'] = 'tiny'
+        with open(config_file, 'wt') as cf:
+            json.dump(config, cf)
+
+        with pytest.raises(ValueError):
+            Overleaf()
+
+    def test_dulwich_backend(self, gigantum_project_fixture):
+        pytest.importorskip('dulwich')
+        config_file = os.path.join(gigantum_project_fixture, '.gigantum', 'overleaf.json')
+        with open(config_file, 'rt') as cf:
+            config = json.load(cf)
+        config['git_backend'] = 'dulwich'
+        with open(config_file, 'wt') as cf:
+            json.dump(config, cf)
+
+        overleaf = Overleaf()
+        assert type(overleaf.git).__name__ == 'DulwichGitBackend'
+
+        # Pulling and committing nothing should work without starting a git process
+        overleaf.pull()
+        assert overleaf.git.get_head() == overleaf.get_remote_head()
+        assert overleaf.commit(['main.tex'], revision='abc') is False
@@ -0,0 +1,59 @@
+import os
+import errno
+import pytest
+
+from gigaleaf import transfer
+from gigaleaf.hashing import hash_file
+from gigaleaf.transfer import copy_and_hash, get_copy_strategies, reset_detected_strategies, COPY_STRATEGIES
+
+
+class TestTransfer:
+    def test_copy_and_hash(self, tmp_path):
+        src = tmp_path / 'src.bin'
+        src.write_bytes(os.urandom(300000))
+
+        for preferred in ('auto',) + COPY_STRATEGIES:
+            dst = tmp_path / f'{preferred}.bin'
+            content_hash, strategy = copy_and_hash(src.as_posix(), dst.as_posix(), buffer_size=4096,
+                                                   preferred=preferred)
+
+            assert strategy in COPY_STRATEGIES
+            assert dst.read_bytes() == src.read_bytes()
+            assert content_hash == hash_file(src.as_posix())
+
+        reset_detected_strategies()
+
+    def test_unsupported_strategy_detected_once(self, tmp_path, monkeypatch):
+        src = tmp_path / 'src.bin'
+        src.write_bytes(b'data' * 1000)
+        reset_detected_strategies()
+
+        attempts = list()
+
+        def unsupported_kernel_copy(src_filename, dst_filename, strategy):
+            attempts.append(strategy)
+            raise OSError(errno.EXDEV, "Not supported")
+
+        monkeypatch.setattr(transfer, '_kernel_copy', unsupported_kernel_copy)
+
+        content_hash, strategy = copy_and_hash(src.as_posix(), (tmp_path / 'dst1.bin').as_posix())
+        assert strategy == 'buffered'
+        assert content_hash == hash_file(src.as_posix())
+        assert len(attempts) > 0
+
+        # The failed strategies are not tried again on the same filesystem
+        attempts.clear()
+        _, strategy = copy_and_hash(src.as_posix(), (tmp_path / 'dst2.bin').as_posix())
+        assert strategy == 'buffered'
+        assert attempts == []
+        assert get_copy_strategies(src.as_posix(), tmp_path.as_posix()) == ['buffered']
+
+        reset_detected_strategies()
+        assert len(get_copy_strategies(src.as_posix(), tmp_path.as_posix())) > 1
+
+    def test_invalid_strategy(self, tmp_path):
+        src = tmp_path / 'src.bin'
+        src.write_bytes(b'data')
+
+        with pytest.raises(ValueError):
+            get_copy_strategies(src.as_posix(), tmp_path.as_posix(), 'not-a-strategy')